@@ -0,0 +1,309 @@
+# coding=utf8
+## Copyright (c) 2020 Arseniy Kuznetsov
+## Copyright (c) 2024 Martti Anttila
+##
+## This program is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License
+## as published by the Free Software Foundation; either version 2
+## of the License, or (at your option) any later version.
+##
+## This program is distributed in the hope that it will be useful,
+## but WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+## GNU General Public License for more details.
+
+''' Offline benchmark of the collectors of the CollectorRegistry, fed from RouterOS REST fixtures
+
+    python -m benchmark.collector_benchmark [--collectors dhcp,route] [--size route=1000000,wifi_clients=5000]
+        [--rounds 3] [--output results.json] [--compare baseline.json] [--route-summary]
+
+    Fixtures are generated at the sizes of benchmark.fixtures.DEFAULT_SIZES, or read from a file:
+    python -m benchmark.collector_benchmark --write-fixtures fixtures.json
+    python -m benchmark.collector_benchmark --fixtures fixtures.json
+
+    Record the fixtures from a router of the exporter config:
+    python -m benchmark.collector_benchmark --router <name> --cfg-file config/config.yml --write-fixtures router.json
+
+    per collector: records returned by the fixtures, series produced, best load time (set_metrics and the
+    snapshot render included), peak and retained memory of a load (tracemalloc) and the memory blocks
+    a load leaves allocated, the fields load_data adds to the responses included
+'''
+
+import gc
+import json
+import platform
+import subprocess
+import sys
+import tracemalloc
+
+from argparse import ArgumentParser
+from datetime import datetime, timezone
+from time import perf_counter
+
+from benchmark.fixtures import DEFAULT_SIZES, RESPONSES, select
+from cli.config import config_handler, ConfigEntry, ConfigKeys
+from collector.metric_store import MetricStore
+from flow.collector_registry import CollectorRegistry
+from flow.label_dictionary import LabelDictionary
+from flow.response_cache import copy_response
+from flow.router_rest_api import request_key
+
+class GeneratedResponses:
+    ''' Responses of benchmark.fixtures, tables of the given size
+    '''
+    def __init__(self, size: int):
+        self.size = size
+
+    def get(self, path, params):
+        generate = RESPONSES.get(path)
+        return generate(self.size) if generate else []
+
+    def post(self, path, command, data):
+        generate = RESPONSES.get(f'{path}/{command}')
+        return generate(self.size) if generate else []
+
+class RecordedResponses:
+    ''' Responses of a fixture file: {GET path or POST path/command: response}
+    '''
+    def __init__(self, responses: dict):
+        self.responses = responses
+
+    def get(self, path, params):
+        return self.responses.get(path, [])
+
+    def post(self, path, command, data):
+        return self.responses.get(f'{path}/{command}', [])
+
+class RouterResponses:
+    ''' Responses of a router, whole records so the fixtures do not depend on the proplists of this version
+    '''
+    def __init__(self, rest_api):
+        self.rest_api = rest_api
+
+    def get(self, path, params):
+        return self.rest_api.get(path, params)
+
+    def post(self, path, command, data):
+        return self.rest_api.post(path, command, data)
+
+class FixtureRestAPI:
+    ''' RouterRestAPI stand-in answering from a response source
+
+        Each request goes to the source once, later loads get copies prepared before they start,
+        filtered by the request parameters and the .proplist the way the router does it
+    '''
+    def __init__(self, source):
+        self.source = source
+        self.recorded: dict[str, object] = {}
+        self.filtered: dict[str, object] = {}
+        self.prepared: dict[str, object] = {}
+        # Responses handed out in this load, kept so that freeing them does not count against the load
+        self.handed: list[object] = []
+        self.records = 0
+
+    def prepare(self):
+        self.prepared = {key: copy_response(response) for key, response in self.filtered.items()}
+        self.handed = []
+        self.records = 0
+
+    def get(self, path, params = {}, proplist: str | None = None):
+        params = dict(params)
+        proplist = params.pop('.proplist', None) or proplist
+        key = f'GET {path} {request_key(params)} {proplist}'
+        response = self.prepared.pop(key, None)
+        if response is None:
+            if path not in self.recorded:
+                self.recorded[path] = self.source.get(path, params) or []
+            self.filtered[key] = select(self.recorded[path], params, proplist)
+            response = copy_response(self.filtered[key])
+        self.records += len(response) if isinstance(response, list) else 1
+        self.handed.append(response)
+        return response
+
+    def get_stream(self, path, params = {}, proplist: str | None = None):
+        return iter(self.get(path, params, proplist))
+
+    def post(self, path, command, data):
+        key = f'{path}/{command}'
+        if key not in self.recorded:
+            self.recorded[key] = self.source.post(path, command, data) or []
+        ids = str(data.get('.id', '')).split(',')
+        response = copy_response(self.recorded[key][:len(ids)])
+        self.handed.append(response)
+        return response
+
+    def end_cycle(self):
+        pass
+
+class FixtureRouterEntry:
+    ''' RouterEntry stand-in for the collectors load
+    '''
+    def __init__(self, router_name: str, source, config_entry: ConfigEntry.RouterConfigEntry | None = None):
+        self.router_name = router_name
+        self.config_entry = config_entry
+        self.router_id = {
+            ConfigKeys.ROUTERBOARD_NAME: router_name,
+            ConfigKeys.ROUTERBOARD_ADDRESS: '192.0.2.1'
+        }
+        self.rest_api = FixtureRestAPI(source)
+        self.label_dictionary = LabelDictionary()
+
+    def end_cycle(self):
+        self.rest_api.end_cycle()
+        self.label_dictionary.end_cycle()
+
+def series_count(collector) -> int:
+    stores = [s for s in vars(collector).values() if isinstance(s, MetricStore)]
+    return sum(family.count for store in stores for family, _, _ in store.metrics)
+
+def router_config(options: dict[str, bool]) -> ConfigEntry.RouterConfigEntry:
+    ''' Router config entry of the defaults, with the given options
+    '''
+    entry = {key: False for key in ConfigKeys.ROUTER_BOOLEAN_KEYS}
+    entry.update({key: None for key in ConfigKeys.ROUTER_STR_KEYS | ConfigKeys.ROUTER_INT_KEYS})
+    entry.update({key: [] for key in ConfigKeys.ROUTER_LIST_KEYS})
+    entry.update(options)
+    return ConfigEntry.RouterConfigEntry(**entry)
+
+def run_collector(key: str, source, rounds: int, config_entry: ConfigEntry.RouterConfigEntry) -> tuple[dict, FixtureRouterEntry]:
+    entry = FixtureRouterEntry(f'bench-{key}', source, config_entry)
+    collector = CollectorRegistry.collector_mapping[key](entry.router_id)
+    collector.use_label_dictionary(entry.label_dictionary)
+
+    def load() -> float:
+        entry.rest_api.prepare()
+        start = perf_counter()
+        collector.load(entry)
+        elapsed = perf_counter() - start
+        entry.end_cycle()
+        return elapsed
+
+    # First load fetches the fixtures and warms up the proplists, plans, label dictionary and vendor lookups
+    load()
+    best = min(load() for _ in range(rounds))
+    records = entry.rest_api.records
+
+    # Memory of one more load, tracemalloc slows the allocations down so it is not timed
+    entry.rest_api.prepare()
+    gc.collect()
+    tracemalloc.start()
+    collector.load(entry)
+    entry.end_cycle()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    entry.rest_api.prepare()
+    gc.collect()
+    blocks = sys.getallocatedblocks()
+    collector.load(entry)
+    entry.end_cycle()
+    gc.collect()
+    blocks = sys.getallocatedblocks() - blocks
+
+    return {
+        'collector': collector.name,
+        'records': records,
+        'series': series_count(collector),
+        'seconds': best,
+        'records_per_second': records / best if best else 0,
+        'peak_bytes': peak,
+        'retained_bytes': retained,
+        'allocated_blocks': blocks,
+    }, entry
+
+def parse_sizes(arg: str) -> dict[str, int]:
+    sizes = {}
+    for item in filter(None, arg.split(',')):
+        key, _, size = item.partition('=')
+        sizes[key.strip()] = int(size)
+    return sizes
+
+def version() -> str:
+    try:
+        return subprocess.run(['git', 'describe', '--always', '--dirty'], capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return ''
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    ''' Prints the change against the baseline results, returns the collectors slower than threshold
+    '''
+    print(f'\nagainst {baseline.get("version") or "baseline"}:')
+    regressions = []
+    for key, result in results['results'].items():
+        base = baseline['results'].get(key)
+        if not base or not base['records_per_second']:
+            continue
+        speed = result['records_per_second'] / base['records_per_second'] - 1
+        memory = result['peak_bytes'] / base['peak_bytes'] - 1 if base['peak_bytes'] else 0
+        flag = ''
+        if speed < -threshold:
+            flag = '  REGRESSION'
+            regressions.append(key)
+        print(f'{key:>22}: records/s {speed:+7.1%}, peak memory {memory:+7.1%}{flag}')
+    return regressions
+
+def main():
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument('--collectors', default='', help='comma separated collector keys, default all')
+    parser.add_argument('--size', default='', help='table sizes of generated fixtures, e.g. route=1000000,dhcp=10000')
+    parser.add_argument('--rounds', type=int, default=3)
+    parser.add_argument('--fixtures', default='', help='fixture file to read instead of generating the fixtures')
+    parser.add_argument('--router', default='', help='record the fixtures from this router of the exporter config')
+    parser.add_argument('--cfg-file', default='config/config.yml')
+    parser.add_argument('--write-fixtures', default='', help='write the fixtures used to this file')
+    parser.add_argument('--output', default='', help='write the results as JSON to this file')
+    parser.add_argument('--compare', default='', help='results file of an earlier run to compare with')
+    parser.add_argument('--threshold', type=float, default=0.1, help='records/s drop reported as a regression')
+    parser.add_argument('--route-summary', action='store_true', help='load the route collectors in summary mode')
+    args = parser.parse_args()
+
+    keys = [k for k in args.collectors.split(',') if k] or list(CollectorRegistry.collector_mapping)
+    unknown = [k for k in keys if k not in CollectorRegistry.collector_mapping]
+    if unknown:
+        parser.error(f'unknown collectors: {", ".join(unknown)}')
+    sizes = {**DEFAULT_SIZES, **parse_sizes(args.size)}
+    config_entry = router_config({ConfigKeys.ROUTE_SUMMARY_KEY: args.route_summary})
+
+    if args.fixtures:
+        with open(args.fixtures) as f:
+            recorded = RecordedResponses(json.load(f))
+        # Keep the garbage collector from walking the fixtures of all the collectors on every collection
+        gc.freeze()
+        source = lambda key: recorded
+    elif args.router:
+        from flow.router_entry import RouterEntry
+        config_handler(args.cfg_file)
+        router = RouterResponses(RouterEntry(args.router).rest_api)
+        source = lambda key: router
+    else:
+        source = lambda key: GeneratedResponses(sizes.get(key, 100))
+
+    results = {
+        'version': version(),
+        'python': platform.python_version(),
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'rounds': args.rounds,
+        'results': {},
+    }
+    fixtures = {}
+    print(f'{"collector":>22} {"records":>9} {"series":>9} {"ms":>9} {"records/s":>11} {"peak MB":>8} {"retained MB":>11} {"blocks":>7}')
+    for key in keys:
+        result, entry = run_collector(key, source(key), args.rounds, config_entry)
+        results['results'][key] = result
+        fixtures.update(entry.rest_api.recorded)
+        print(f'{key:>22} {result["records"]:>9,} {result["series"]:>9,} {result["seconds"] * 1000:>9.2f} {result["records_per_second"]:>11,.0f}'
+              f' {result["peak_bytes"] / 1e6:>8.2f} {result["retained_bytes"] / 1e6:>11.2f} {result["allocated_blocks"]:>7,}')
+
+    if args.write_fixtures:
+        with open(args.write_fixtures, 'w') as f:
+            json.dump(fixtures, f)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            if compare(results, json.load(f), args.threshold):
+                return 1
+
+if __name__ == '__main__':
+    sys.exit(main())
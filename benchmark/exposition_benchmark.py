@@ -0,0 +1,69 @@
+# coding=utf8
+## Copyright (c) 2020 Arseniy Kuznetsov
+## Copyright (c) 2024 Martti Anttila
+##
+## This program is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License
+## as published by the Free Software Foundation; either version 2
+## of the License, or (at your option) any later version.
+##
+## This program is distributed in the hope that it will be useful,
+## but WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+## GNU General Public License for more details.
+
+''' Scrape latency of per-scrape rendering against the pre-rendered snapshots
+
+    python -m benchmark.exposition_benchmark [--routers 20] [--records 1000] [--rounds 5]
+'''
+
+import gzip
+
+from argparse import ArgumentParser
+from prometheus_client.exposition import generate_latest
+from time import perf_counter
+
+from benchmark.fixtures import dhcp_leases, routes
+from collector.dhcp_collector import DHCPCollector
+from collector.route_collector import RouteCollector
+from flow.exposition import Snapshot, SnapshotRegistry
+
+def best_of(rounds: int, func) -> float:
+    best = float('inf')
+    for _ in range(rounds):
+        start = perf_counter()
+        func()
+        best = min(best, perf_counter() - start)
+    return best
+
+def main():
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument('--routers', type=int, default=20)
+    parser.add_argument('--records', type=int, default=1000)
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+
+    registry = SnapshotRegistry()
+    dhcp = dhcp_leases(args.records)
+    route = routes(args.records)
+    for i in range(args.routers):
+        router_id = {'routerboard_name': f'bench{i}', 'routerboard_address': f'192.0.2.{i}'}
+        for collector, records in ((DHCPCollector(router_id), dhcp), (RouteCollector(router_id), route)):
+            collector.metric_store.set_metrics([dict(r) for r in records])
+            collector.snapshot = Snapshot(collector.render())
+            registry.register(collector)
+
+    size = len(registry.render())
+    print(f'{args.routers} routers, {2 * args.records} records each, {size:,} bytes')
+
+    cases = [
+        ('per scrape', lambda: generate_latest(registry)),
+        ('per scrape, gzip', lambda: gzip.compress(generate_latest(registry))),
+        ('snapshot', lambda: registry.render()),
+        ('snapshot, gzip', lambda: registry.render(gzip=True)),
+    ]
+    for name, func in cases:
+        print(f'{name:>17}: {best_of(args.rounds, func) * 1000:,.1f} ms')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,569 @@
+# coding=utf8
+## Copyright (c) 2020 Arseniy Kuznetsov
+## Copyright (c) 2024 Martti Anttila
+##
+## This program is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License
+## as published by the Free Software Foundation; either version 2
+## of the License, or (at your option) any later version.
+##
+## This program is distributed in the hope that it will be useful,
+## but WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+## GNU General Public License for more details.
+
+''' Synthetic RouterOS REST responses, shaped like the real tables
+'''
+
+# A handful of real OUIs so the vendor lookup has something to find
+OUIS = [0x001A2B, 0x3C2EFF, 0xB827EB, 0xDCA632, 0x00155D, 0x48A98A, 0xF09FC2, 0x2CC81B]
+
+def mac_address(i: int) -> str:
+    value = (OUIS[i % len(OUIS)] << 24) | (i & 0xFFFFFF)
+    return ':'.join(f'{(value >> shift) & 0xFF:02X}' for shift in range(40, -1, -8))
+
+def ipv4_address(i: int, base: int = 10) -> str:
+    return f'{base}.{(i >> 16) & 0xFF}.{(i >> 8) & 0xFF}.{i & 0xFF}'
+
+def dhcp_leases(count: int) -> list[dict[str, str]]:
+    return [{
+        '.id': f'*{i + 1:X}',
+        'address': ipv4_address(i),
+        'active-address': ipv4_address(i),
+        'mac-address': mac_address(i),
+        'active-mac-address': mac_address(i),
+        'client-id': f'1:{mac_address(i).lower()}',
+        'host-name': f'host-{i}',
+        'server': f'lan{i % 4}',
+        'active-server': f'lan{i % 4}',
+        'status': 'bound',
+        'dynamic': 'true' if i % 5 else 'false',
+        'blocked': 'false',
+        'disabled': 'false',
+        'radius': 'false',
+        'comment': f'device {i}' if i % 7 == 0 else '',
+        'address-lists': '',
+        'class-id': 'android-dhcp-13' if i % 3 == 0 else '',
+        'expires-after': f'{i % 10}m{i % 60}s',
+        'last-seen': f'{i % 60}s',
+        'age': f'{i % 24}h{i % 60}m',
+    } for i in range(count)]
+
+def routes(count: int) -> list[dict[str, str]]:
+    records = []
+    for i in range(count):
+        bgp = i % 10 != 0
+        records.append({
+            '.id': f'*{i + 1:X}',
+            'dst-address': f'{ipv4_address(i, 1 + (i >> 24) % 223)}/{16 + i % 9}',
+            'gateway': ipv4_address(i % 4, 192),
+            'immediate-gw': f'{ipv4_address(i % 4, 192)}%ether{i % 4 + 1}',
+            'distance': '20' if bgp else '1',
+            'scope': '40' if bgp else '30',
+            'target-scope': '10',
+            'routing-table': 'main',
+            'belongs-to': 'bgp-IP-192.0.2.1' if bgp else 'static',
+            'active': 'true' if i % 3 else 'false',
+            'dynamic': 'true' if bgp else 'false',
+            'static': 'false' if bgp else 'true',
+            'bgp': 'true' if bgp else 'false',
+            'ospf': 'false',
+            'connect': 'false',
+            'inactive': 'false' if i % 3 else 'true',
+            'disabled': 'false',
+            'bgp.as-path': f'{64512 + i % 100},{65000 + i % 7}',
+            'bgp.communities': '',
+            'bgp.local-pref': '100',
+            'bgp.origin': 'igp',
+            'comment': '',
+        })
+    return records
+
+def ipv6_address(i: int, prefix: str = '2001:db8') -> str:
+    return f'{prefix}:{(i >> 16) & 0xFFFF:x}:{i & 0xFFFF:x}::{i % 251 + 1:x}'
+
+def interfaces(count: int) -> list[dict[str, str]]:
+    return [{
+        '.id': f'*{i + 1:X}',
+        'name': f'ether{i + 1}' if i % 4 else f'vlan{i}',
+        'type': 'ether' if i % 4 else 'vlan',
+        'comment': f'uplink {i}' if i % 9 == 0 else '',
+        'mtu': '1500',
+        'mac-address': mac_address(i),
+        'running': 'true' if i % 10 else 'false',
+        'disabled': 'false',
+        'rx-byte': str(i * 1_000_003), 'tx-byte': str(i * 700_001),
+        'rx-packet': str(i * 1_003), 'tx-packet': str(i * 701),
+        'rx-error': '0', 'tx-error': str(i % 3), 'rx-drop': str(i % 5), 'tx-drop': '0',
+        'link-downs': str(i % 4),
+    } for i in range(count)]
+
+def ethernet_monitor(count: int) -> list[dict[str, str]]:
+    records = [{
+        'name': f'ether{i + 1}',
+        'status': 'link-ok',
+        'rate': ('10Gbps', '1Gbps', '100Mbps', '2.5Gbps')[i % 4],
+        'full-duplex': 'true',
+    } for i in range(count)]
+    # Only SFP ports report a temperature
+    for i in range(0, count, 4):
+        records[i]['sfp-temperature'] = str(40 + i % 20)
+    return records
+
+def firewall_rules(count: int) -> list[dict[str, str]]:
+    chains = ('input', 'forward', 'output', 'prerouting')
+    actions = ('accept', 'drop', 'jump', 'mark-connection', 'fasttrack-connection')
+    return [{
+        '.id': f'*{i + 1:X}',
+        'chain': chains[i % len(chains)],
+        'action': actions[i % len(actions)],
+        'comment': f'rule {i}',
+        'bytes': str(i * 15_001),
+        'packets': str(i * 11),
+        'disabled': 'false' if i % 20 else 'true',
+        'dynamic': 'false',
+        'invalid': 'false',
+    } for i in range(count)]
+
+def ipv6_neighbors(count: int) -> list[dict[str, str]]:
+    return [{
+        '.id': f'*{i + 1:X}',
+        'address': ipv6_address(i, 'fe80'),
+        'interface': f'bridge{i % 2}',
+        'mac-address': mac_address(i),
+        'status': 'reachable',
+        'router': 'true' if i == 0 else 'false',
+    } for i in range(count)]
+
+def ipv6_routes(count: int) -> list[dict[str, str]]:
+    return [{
+        '.id': f'*{i + 1:X}',
+        'dst-address': f'{ipv6_address(i)}/{48 + i % 17}',
+        'gateway': 'fe80::1%ether1',
+        'distance': '20' if i % 10 else '1',
+        'active': 'true' if i % 3 else 'false',
+        'dynamic': 'true' if i % 10 else 'false',
+        'bgp': 'true' if i % 10 else 'false',
+        'ospf': 'false',
+        'connect': 'false',
+        'disabled': 'false',
+        'comment': '',
+    } for i in range(count)]
+
+def wifi_clients(count: int) -> list[dict[str, str]]:
+    rates = ('6000000', '144400000', '433300000', '866600000', '1200000000')
+    return [{
+        '.id': f'*{i + 1:X}',
+        'interface': f'wifi{i % 2 + 1}',
+        'ssid': 'bench' if i % 3 else 'bench-guest',
+        'mac-address': mac_address(i),
+        'tx-rate': rates[i % len(rates)],
+        'rx-rate': rates[(i + 2) % len(rates)],
+        'rx-signal': str(-40 - i % 45),
+        'signal': str(-40 - i % 45),
+        'uptime': f'{i % 24}h{i % 60}m{i % 60}s',
+        'bytes': f'{i * 1_000_003},{i * 90_001}',
+    } for i in range(count)]
+
+def wifi_interfaces(count: int) -> list[dict[str, str]]:
+    return [{
+        '.id': f'*{i + 1:X}',
+        'name': f'wifi{i + 1}',
+        'comment': '',
+        'configuration': f'cfg{i % 2}',
+        'configuration.mode': 'ap',
+        'configuration.ssid': 'bench',
+        'mac-address': mac_address(i),
+        'master': 'true',
+        'disabled': 'false',
+    } for i in range(count)]
+
+def wifi_monitor(count: int) -> list[dict[str, str]]:
+    return [{
+        'state': 'running-ap',
+        'channel': ('5180/ax/Ceee', '2412/ax')[i % 2],
+        'tx-power': '20',
+        'registered-peers': str(i * 7 % 40),
+        'authorized-peers': str(i * 7 % 40),
+    } for i in range(count)]
+
+def remote_caps(count: int) -> list[dict[str, str]]:
+    return [{
+        '.id': f'*{i + 1:X}',
+        'identity': f'cap-{i}',
+        'version': '7.16.1',
+        'base-mac': mac_address(i),
+        'board': 'cAP ax',
+    } for i in range(count)]
+
+def poe_ports(count: int) -> list[dict[str, str]]:
+    return [{
+        '.id': f'*{i + 1:X}',
+        'name': f'ether{i + 1}',
+        'comment': '',
+        'poe-out': 'auto-on',
+        'poe-priority': str(i % 10),
+        'poe-voltage': 'auto',
+        'running': 'true',
+        'disabled': 'false',
+    } for i in range(count)]
+
+def poe_monitor(count: int) -> list[dict[str, str]]:
+    return [{
+        'poe-out-status': 'powered-on' if i % 3 else 'waiting-for-load',
+        'poe-out-voltage': '53.1',
+        'poe-out-current': str(100 + i),
+        'poe-out-power': f'{5 + i % 10}.3',
+    } for i in range(count)]
+
+def lte_interfaces(count: int) -> list[dict[str, str]]:
+    return [{'.id': f'*{i + 1:X}', 'name': f'lte{i + 1}', 'comment': '', 'running': 'true'} for i in range(count)]
+
+def lte_monitor(count: int) -> list[dict[str, str]]:
+    return [{
+        'current-operator': 'Operator',
+        'data-class': 'LTE',
+        'status': 'connected',
+        'rsrp': str(-90 - i % 20), 'rsrq': str(-10 - i % 5), 'rssi': str(-60 - i % 20), 'sinr': str(10 + i % 10),
+        'session-uptime': f'{i % 7}d{i % 24}h{i % 60}m',
+    } for i in range(count)]
+
+def pool_used(count: int) -> list[dict[str, str]]:
+    return [{'.id': f'*{i + 1:X}', 'pool': f'pool{i % 4}', 'address': ipv4_address(i, 172), 'owner': mac_address(i), 'info': f'lan{i % 4}'} for i in range(count)]
+
+def netwatch(count: int) -> list[dict[str, str]]:
+    return [{
+        '.id': f'*{i + 1:X}',
+        'name': f'nw{i}',
+        'host': ipv4_address(i, 198),
+        'comment': '',
+        'type': 'icmp',
+        'interval': '10s',
+        'timeout': '1s',
+        'status': 'up' if i % 8 else 'down',
+        'since': f'2024-10-{i % 28 + 1:02} {i % 24:02}:{i % 60:02}:00',
+        'loss-count': str(i % 3), 'response-count': '10', 'sent-count': '10', 'loss-percent': str(i % 3 * 10),
+        'rtt-avg': f'{i % 40}ms{(i * 37) % 1000}us', 'rtt-jitter': f'{(i * 13) % 1000}us', 'rtt-max': f'{i % 40 + 2}ms',
+        'rtt-min': f'{i % 40}ms', 'rtt-stdev': f'{(i * 7) % 1000}us',
+        'disabled': 'false',
+    } for i in range(count)]
+
+def active_users(count: int) -> list[dict[str, str]]:
+    return [{
+        '.id': f'*{i + 1:X}',
+        'name': f'user{i % 10}',
+        'address': ipv4_address(i % 50, 192),
+        'via': ('winbox', 'ssh', 'api', 'web')[i % 4],
+        'group': 'full',
+        'when': f'2024-10-{i % 28 + 1:02} {i % 24:02}:{i % 60:02}:00',
+    } for i in range(count)]
+
+def simple_queues(count: int) -> list[dict[str, str]]:
+    return [{
+        '.id': f'*{i + 1:X}',
+        'name': f'queue-{i}',
+        'target': f'{ipv4_address(i)}/32',
+        'parent': 'none',
+        'packet-marks': '',
+        'limit-at': '0/0',
+        'max-limit': '10000000/50000000',
+        'priority': '8/8',
+        'bytes': f'{i * 1_001}/{i * 9_001}',
+        'packets': f'{i * 3}/{i * 7}',
+        'queued-bytes': '0/0',
+        'queued-packets': '0/0',
+        'dropped': f'{i % 5}/{i % 7}',
+        'rate': f'{i * 10}/{i * 90}',
+        'packet-rate': f'{i % 10}/{i % 90}',
+        'disabled': 'false',
+    } for i in range(count)]
+
+def queue_tree(count: int) -> list[dict[str, str]]:
+    return [{
+        '.id': f'*{i + 1:X}',
+        'name': f'tree-{i}',
+        'parent': 'global' if i % 10 == 0 else f'tree-{i - i % 10}',
+        'packet-mark': f'mark-{i}',
+        'limit-at': '0',
+        'max-limit': '100M',
+        'priority': str(i % 8 + 1),
+        'rate': str(i * 1000),
+        'bytes': str(i * 10_007),
+        'queued-bytes': '0',
+        'dropped': str(i % 11),
+        'disabled': 'false',
+    } for i in range(count)]
+
+def bgp_sessions(count: int) -> list[dict[str, str]]:
+    return [{
+        '.id': f'*{i + 1:X}',
+        'name': f'peer{i}-1',
+        'remote.address': ipv4_address(i, 203),
+        'remote.as': str(64512 + i),
+        'local.as': '65000',
+        'remote.afi': 'ip',
+        'local.afi': 'ip',
+        'prefix-count': str(i * 1000 % 900_000),
+        'local.messages': str(i * 17), 'local.bytes': str(i * 1_700),
+        'remote.messages': str(i * 19), 'remote.bytes': str(i * 1_900),
+        'established': 'true' if i % 5 else 'false',
+        'uptime': f'{i % 5}w{i % 7}d{i % 24}h{i % 60}m{i % 60}s{i % 1000}ms',
+    } for i in range(count)]
+
+def arp_entries(count: int) -> list[dict[str, str]]:
+    return [{
+        '.id': f'*{i + 1:X}',
+        'address': ipv4_address(i),
+        'mac-address': mac_address(i),
+        'interface': f'bridge{i % 2}',
+        'status': 'reachable' if i % 3 else 'stale',
+        'dynamic': 'true',
+    } for i in range(count)]
+
+def wireguard_interfaces(count: int) -> list[dict[str, str]]:
+    return [{'.id': f'*{i + 1:X}', 'name': f'wg{i}', 'mtu': '1420', 'listen-port': str(13231 + i), 'public-key': f'{i:043d}=', 'comment': '', 'running': 'true'} for i in range(count)]
+
+def wireguard_peers(count: int) -> list[dict[str, str]]:
+    return [{
+        '.id': f'*{i + 1:X}',
+        'name': f'peer{i}',
+        'interface': f'wg{i % 2}',
+        'public-key': f'{i:043d}=',
+        'endpoint-address': ipv4_address(i, 100),
+        'endpoint-port': '13231',
+        'current-endpoint-address': ipv4_address(i, 100),
+        'current-endpoint-port': str(30000 + i % 20000),
+        'allowed-address': f'{ipv4_address(i, 10)}/32',
+        'comment': '',
+        'tx': str(i * 5_003), 'rx': str(i * 7_001),
+        'last-handshake': f'{i % 3}m{i % 60}s',
+        'disabled': 'false',
+    } for i in range(count)]
+
+def kid_control_devices(count: int) -> list[dict[str, str]]:
+    return [{
+        '.id': f'*{i + 1:X}',
+        'name': f'device-{i}',
+        'user': f'kid{i % 5}' if i % 4 else '',
+        'mac-address': mac_address(i),
+        'ip-address': ipv4_address(i),
+        'bytes-down': str(i * 10_007), 'bytes-up': str(i * 1_003),
+        'rate-down': f'{i % 100}.{i % 10}kbps', 'rate-up': f'{i % 50}kbps',
+        'idle-time': f'{i % 60}m{i % 60}s',
+        'blocked': 'false', 'limited': 'false', 'inactive': 'false',
+        'disabled': 'false',
+    } for i in range(count)]
+
+def bridge_hosts(count: int) -> list[dict[str, str]]:
+    return [{
+        '.id': f'*{i + 1:X}',
+        'mac-address': mac_address(i),
+        'vid': str(i % 4 + 1),
+        'bridge': 'bridge',
+        'interface': f'ether{i % 24 + 1}',
+        'on-interface': f'ether{i % 24 + 1}',
+        'local': 'false',
+    } for i in range(count)]
+
+def containers(count: int) -> list[dict[str, str]]:
+    return [{
+        '.id': f'*{i + 1:X}',
+        'name': f'container-{i}',
+        'tag': f'library/app{i}:latest',
+        'os': 'linux',
+        'arch': 'arm64',
+        'interface': f'veth{i}',
+        'root-dir': f'disk1/containers/{i}',
+        'status': 'running' if i % 4 else 'stopped',
+        'comment': '',
+    } for i in range(count)]
+
+def zerotier_interfaces(count: int) -> list[dict[str, str]]:
+    return [{
+        '.id': f'*{i + 1:X}', 'instance': 'zt1', 'mac-address': mac_address(i), 'mtu': '2800', 'name': f'zerotier{i + 1}',
+        'network': f'{i:016x}', 'network-name': f'net{i}', 'status': 'OK', 'allow-default': 'false', 'allow-managed': 'true',
+        'allow-global': 'false', 'bridge': 'false', 'type': 'PRIVATE', 'running': 'true', 'disabled': 'false',
+    } for i in range(count)]
+
+def zerotier_peers(count: int) -> list[dict[str, str]]:
+    return [{
+        '.id': f'*{i + 1:X}', 'zt-address': f'{i:010x}', 'instance': 'zt1', 'bonded': 'false', 'role': 'LEAF' if i % 10 else 'PLANET',
+        'path': f'active,preferred,{ipv4_address(i, 100)}/9993,recvd:{i % 60}s', 'latency': f'{i % 300}ms',
+    } for i in range(count)]
+
+def zerotier_members(count: int) -> list[dict[str, str]]:
+    return [{
+        '.id': f'*{i + 1:X}', 'authorized': 'true', 'comment': '', 'inactive': 'false', 'ip-address': ipv4_address(i, 10),
+        'name': f'member-{i}', 'network': 'net0', 'zt-address': f'{i:010x}', 'last-seen': f'{i % 60}s', 'disabled': 'false',
+    } for i in range(count)]
+
+def packages(count: int) -> list[dict[str, str]]:
+    names = ['routeros', 'container', 'wifi-qcom', 'zerotier', 'iot', 'gps', 'lora', 'ups', 'calea', 'rose-storage', 'user-manager', 'dude']
+    return [{'.id': f'*{i + 1:X}', 'name': names[i % len(names)] + (f'-{i}' if i >= len(names) else ''), 'version': '7.16.1',
+             'build-time': '2024-10-10 10:11:12', 'disabled': 'false'} for i in range(count)]
+
+def health(count: int) -> list[dict[str, str]]:
+    sensors = [('voltage', '24.1', 'V'), ('temperature', '41', 'C'), ('cpu-temperature', '52', 'C'), ('switch-temperature', '48', 'C'),
+               ('fan1-speed', '4200', 'RPM'), ('fan2-speed', '4150', 'RPM'), ('power-consumption', '18.2', 'W')]
+    return [{'.id': f'*{i + 1:X}', 'name': name, 'value': value, 'type': unit} for i, (name, value, unit) in enumerate(sensors[:count])]
+
+def system_resource(_: int = 1) -> dict[str, str]:
+    return {
+        'uptime': '3w2d11h4m25s', 'version': '7.16.1 (stable)', 'build-time': '2024-10-10 10:11:12', 'cpu': 'ARM64',
+        'cpu-count': '4', 'cpu-frequency': '1800', 'cpu-load': '7', 'free-memory': '812838912', 'total-memory': '1073741824',
+        'free-hdd-space': '90112000', 'total-hdd-space': '134217728', 'write-sect-total': '2215104', 'bad-blocks': '0%',
+        'architecture-name': 'arm64', 'board-name': 'RB5009UG+S+', 'platform': 'MikroTik',
+    }
+
+def identity(_: int = 1) -> dict[str, str]:
+    return {'name': 'bench'}
+
+def cloud(_: int = 1) -> dict[str, str]:
+    return {'public-address': '198.51.100.7', 'public-address-ipv6': '2001:db8::7', 'dns-name': 'abcdef0123.sn.mynetname.net', 'status': 'updated'}
+
+# RouterOS responses by request, GET path or POST path/command: table generator of a size
+RESPONSES = {
+    'system/package': packages,
+    'ip/dhcp-server/lease': dhcp_leases,
+    'system/resource': system_resource,
+    'system/health': health,
+    'ip/pool/used': pool_used,
+    'interface': interfaces,
+    'system/identity': identity,
+    'interface/ether': interfaces,
+    'interface/ether/monitor': ethernet_monitor,
+    'interface/lte': lte_interfaces,
+    'interface/lte/monitor': lte_monitor,
+    'ip/firewall/filter': firewall_rules,
+    'ip/firewall/mangle': firewall_rules,
+    'ip/firewall/raw': firewall_rules,
+    'ipv6/firewall/filter': firewall_rules,
+    'ipv6/firewall/mangle': firewall_rules,
+    'ipv6/firewall/raw': firewall_rules,
+    'ipv6/neighbor': ipv6_neighbors,
+    'ip/route': routes,
+    'ipv6/route': ipv6_routes,
+    'interface/wifi/capsman/remote-cap': remote_caps,
+    'interface/wifi': wifi_interfaces,
+    'interface/wifi/monitor': wifi_monitor,
+    'interface/wifi/registration-table': wifi_clients,
+    'interface/ethernet/poe': poe_ports,
+    'interface/ethernet/poe/monitor': poe_monitor,
+    'ip/cloud': cloud,
+    'tool/netwatch': netwatch,
+    'user/active': active_users,
+    'queue/simple': simple_queues,
+    'queue/tree': queue_tree,
+    'routing/bgp/session': bgp_sessions,
+    'ip/arp': arp_entries,
+    'interface/wireguard': wireguard_interfaces,
+    'interface/wireguard/peers': wireguard_peers,
+    'ip/kid-control/device': kid_control_devices,
+    'interface/bridge/host': bridge_hosts,
+    'container': containers,
+    'zerotier/peer': zerotier_peers,
+    'zerotier/interface': zerotier_interfaces,
+    'zerotier/controller/member': zerotier_members,
+}
+
+# Table size per collector key of the CollectorRegistry
+DEFAULT_SIZES = {
+    'installed_packages': 12,
+    'dhcp': 10000,
+    'system_resource': 1,
+    'health': 7,
+    'pool': 1000,
+    'interface': 48,
+    'identity': 1,
+    'interface_monitor': 48,
+    'lte': 2,
+    'firewall_filter': 500,
+    'firewall_mangle': 200,
+    'firewall_raw': 100,
+    'ipv6_firewall_filter': 200,
+    'ipv6_firewall_mangle': 50,
+    'ipv6_firewall_raw': 50,
+    'ipv6_neighbor': 2000,
+    'route': 100000,
+    'ipv6_route': 20000,
+    'capsman': 50,
+    'wifi': 4,
+    'wifi_clients': 5000,
+    'poe': 24,
+    'public_ip': 1,
+    'netwatch': 200,
+    'user': 50,
+    'queue_simple': 2000,
+    'queue_tree': 500,
+    'bgp': 20,
+    'arp': 5000,
+    'wireguard': 4,
+    'wireguard_peers': 500,
+    'kid_control_devices': 500,
+    'bridge_hosts': 5000,
+    'containers': 10,
+    'zerotier_peers': 200,
+    'zerotier': 2,
+    'zerotier_controller': 500,
+}
+
+# RouterOS requests of the collectors, by collector key of the CollectorRegistry
+COLLECTOR_PATHS = {
+    'installed_packages': ['system/package'],
+    'dhcp': ['ip/dhcp-server/lease'],
+    'system_resource': ['system/resource'],
+    'health': ['system/health'],
+    'pool': ['ip/pool/used'],
+    'interface': ['interface'],
+    'identity': ['system/identity'],
+    'interface_monitor': ['interface/ether', 'interface/ether/monitor'],
+    'lte': ['interface/lte', 'interface/lte/monitor'],
+    'firewall_filter': ['ip/firewall/filter'],
+    'firewall_mangle': ['ip/firewall/mangle'],
+    'firewall_raw': ['ip/firewall/raw'],
+    'ipv6_firewall_filter': ['ipv6/firewall/filter'],
+    'ipv6_firewall_mangle': ['ipv6/firewall/mangle'],
+    'ipv6_firewall_raw': ['ipv6/firewall/raw'],
+    'ipv6_neighbor': ['ipv6/neighbor'],
+    'route': ['ip/route'],
+    'ipv6_route': ['ipv6/route'],
+    'capsman': ['interface/wifi/capsman/remote-cap'],
+    'wifi': ['interface/wifi', 'interface/wifi/monitor'],
+    'wifi_clients': ['interface/wifi/registration-table'],
+    'poe': ['interface/ethernet/poe', 'interface/ethernet/poe/monitor'],
+    'public_ip': ['ip/cloud'],
+    'netwatch': ['tool/netwatch'],
+    'user': ['user/active'],
+    'queue_simple': ['queue/simple'],
+    'queue_tree': ['queue/tree'],
+    'bgp': ['routing/bgp/session'],
+    'arp': ['ip/arp'],
+    'wireguard': ['interface/wireguard'],
+    'wireguard_peers': ['interface/wireguard/peers'],
+    'kid_control_devices': ['ip/kid-control/device'],
+    'bridge_hosts': ['interface/bridge/host'],
+    'containers': ['container'],
+    'zerotier_peers': ['zerotier/peer'],
+    'zerotier': ['zerotier/interface'],
+    'zerotier_controller': ['zerotier/controller/member'],
+}
+
+def response_sizes(sizes: dict[str, int]) -> dict[str, int]:
+    ''' Table size per request from the sizes per collector key
+    '''
+    return {path: sizes.get(key, 1) for key, paths in COLLECTOR_PATHS.items() for path in paths}
+
+def select(response, params: dict, proplist: str | None):
+    ''' Records matching the query parameters, with the .proplist properties only, the way the router filters them
+    '''
+    if isinstance(response, dict):
+        response = [response]
+        single = True
+    else:
+        single = False
+
+    records = [r for r in response if all(str(r.get(k, '')) in str(v).split(',') for k, v in params.items())]
+    if proplist:
+        properties = set(proplist.split(','))
+        records = [{k: v for k, v in r.items() if k in properties} for r in records]
+    return (records[0] if records else {}) if single else records
@@ -0,0 +1,73 @@
+# coding=utf8
+## Copyright (c) 2020 Arseniy Kuznetsov
+## Copyright (c) 2024 Martti Anttila
+##
+## This program is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License
+## as published by the Free Software Foundation; either version 2
+## of the License, or (at your option) any later version.
+##
+## This program is distributed in the hope that it will be useful,
+## but WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+## GNU General Public License for more details.
+
+''' Eager and streaming decoding of a route table response into the RouteCollector store
+
+    python -m benchmark.json_stream_benchmark [--records 200000] [--rounds 3]
+
+    eager: the body decoded to text and parsed whole before set_metrics, like RouterRestAPI.get
+    stream: the records decoded from the body chunks one at a time into set_metrics
+    peak: highest memory use during the load above the memory held before it, the body excluded
+'''
+
+import gc
+import json
+import tracemalloc
+
+from argparse import ArgumentParser
+from time import perf_counter
+
+from benchmark.fixtures import routes
+from collector.route_collector import RouteCollector
+from utils.json_stream import iter_chunks, iter_records
+
+ROUTER_ID = {'routerboard_name': 'bench', 'routerboard_address': '192.0.2.1'}
+
+def eager(body: bytes):
+    return json.loads(body.decode('latin1'), strict=False)
+
+def stream(body: bytes):
+    return iter_records(iter_chunks(body), 'latin1', strict=False)
+
+def main():
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument('--records', type=int, default=200000)
+    parser.add_argument('--rounds', type=int, default=3)
+    args = parser.parse_args()
+
+    body = json.dumps(routes(args.records)).encode('latin1')
+    print(f'{args.records} routes, {len(body) / 1e6:.1f} MB body')
+
+    for name, decode in (('eager', eager), ('stream', stream)):
+        store = RouteCollector(ROUTER_ID).route_store
+
+        def load():
+            store.clear_metrics()
+            store.set_metrics(decode(body))
+
+        best = float('inf')
+        for _ in range(args.rounds):
+            start = perf_counter()
+            load()
+            best = min(best, perf_counter() - start)
+
+        gc.collect()
+        tracemalloc.start()
+        load()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f'{name:>6}: {best * 1000:,.0f} ms, peak {peak / 1e6:.1f} MB')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+# coding=utf8
+## Copyright (c) 2020 Arseniy Kuznetsov
+## Copyright (c) 2024 Martti Anttila
+##
+## This program is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License
+## as published by the Free Software Foundation; either version 2
+## of the License, or (at your option) any later version.
+##
+## This program is distributed in the hope that it will be useful,
+## but WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+## GNU General Public License for more details.
+
+''' MAC vendor lookup time and startup memory: mac_vendor_lookup against the OUI index
+
+    python -m benchmark.mac_vendor_benchmark [--macs 10000]
+'''
+
+import os
+import tempfile
+import tracemalloc
+
+from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+
+from mac_vendor_lookup import MacLookup, VendorNotFoundError
+
+from benchmark.fixtures import mac_address
+from utils.mac_vendor import MacVendorResolver, OUIIndex, vendor_list_path
+
+def measure_load(load):
+    tracemalloc.start()
+    start = perf_counter()
+    result = load()
+    elapsed = perf_counter() - start
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, elapsed, memory
+
+def per_lookup(lookup, macs: list[str]) -> float:
+    start = perf_counter()
+    for mac in macs:
+        lookup(mac)
+    return (perf_counter() - start) / len(macs)
+
+def main():
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument('--macs', type=int, default=10000)
+    args = parser.parse_args()
+
+    macs = [mac_address(i) for i in range(args.macs)]
+    index_path = os.path.join(tempfile.mkdtemp(), 'oui.idx')
+    OUIIndex.from_files([vendor_list_path()]).write(index_path)
+
+    # The exporter ran MacLookup on a thread of its own, its asyncio loop can not run in the collector threads
+    thread = ThreadPoolExecutor(max_workers=1)
+    def mac_lookup(mac):
+        try:
+            return thread.submit(lookup.lookup, mac).result()
+        except VendorNotFoundError:
+            return ''
+
+    lookup, elapsed, memory = measure_load(lambda: thread.submit(lambda: (m := MacLookup(), m.load_vendors())[0]).result())
+    print(f'{"mac_vendor_lookup":>18}: load {elapsed * 1000:6.1f} ms, {memory / 1e6:5.2f} MB, lookup {per_lookup(mac_lookup, macs) * 1e6:6.2f} us')
+
+    cases = [
+        ('index from list', lambda: OUIIndex.from_files([vendor_list_path()])),
+        ('index file (mmap)', lambda: OUIIndex.load(index_path)),
+    ]
+    for name, load in cases:
+        index, elapsed, memory = measure_load(load)
+        print(f'{name:>18}: load {elapsed * 1000:6.1f} ms, {memory / 1e6:5.2f} MB, lookup {per_lookup(index.lookup, macs) * 1e6:6.2f} us')
+
+    resolver = MacVendorResolver(index_path)
+    per_lookup(resolver.lookup, macs)
+    print(f'{"memoized":>18}: lookup {per_lookup(resolver.lookup, macs) * 1e6:6.2f} us')
+
+    os.unlink(index_path)
+
+if __name__ == '__main__':
+    main()
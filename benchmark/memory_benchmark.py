@@ -0,0 +1,70 @@
+# coding=utf8
+## Copyright (c) 2020 Arseniy Kuznetsov
+## Copyright (c) 2024 Martti Anttila
+##
+## This program is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License
+## as published by the Free Software Foundation; either version 2
+## of the License, or (at your option) any later version.
+##
+## This program is distributed in the hope that it will be useful,
+## but WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+## GNU General Public License for more details.
+
+''' Steady state memory of a load cycle: set_metrics and rendering of unchanged DHCP and route tables
+
+    python -m benchmark.memory_benchmark [--records 25000] [--cycles 3]
+
+    retained: memory allocated during the cycle that is still held after it, the snapshots included
+    peak: highest memory use during the cycle, above the memory held before it
+'''
+
+import gc
+import resource
+import tracemalloc
+
+from argparse import ArgumentParser
+from time import perf_counter
+
+from benchmark.fixtures import dhcp_leases, routes
+from collector.dhcp_collector import DHCPCollector
+from collector.route_collector import RouteCollector
+from flow.exposition import Snapshot
+
+ROUTER_ID = {'routerboard_name': 'bench', 'routerboard_address': '192.0.2.1'}
+
+def main():
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument('--records', type=int, default=25000)
+    parser.add_argument('--cycles', type=int, default=3)
+    args = parser.parse_args()
+
+    cases = [(DHCPCollector(ROUTER_ID), dhcp_leases(args.records)), (RouteCollector(ROUTER_ID), routes(args.records))]
+
+    def cycle():
+        for collector, records in cases:
+            batch = [dict(r) for r in records]
+            collector.metric_store.clear_metrics()
+            collector.metric_store.set_metrics(batch)
+            collector.snapshot = Snapshot(collector.render())
+
+    # Warm up, later cycles see the same series
+    cycle()
+    snapshots = sum(len(c.snapshot.text) for c, _ in cases)
+    print(f'{2 * args.records} records, {snapshots / 1e6:.1f} MB of snapshots')
+
+    for i in range(args.cycles):
+        gc.collect()
+        tracemalloc.start()
+        start = perf_counter()
+        cycle()
+        elapsed = perf_counter() - start
+        retained, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f'cycle {i + 1}: {elapsed * 1000:,.0f} ms, retained {retained / 1e6:.1f} MB, peak {peak / 1e6:.1f} MB')
+
+    print(f'max rss: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+# coding=utf8
+## Copyright (c) 2020 Arseniy Kuznetsov
+## Copyright (c) 2024 Martti Anttila
+##
+## This program is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License
+## as published by the Free Software Foundation; either version 2
+## of the License, or (at your option) any later version.
+##
+## This program is distributed in the hope that it will be useful,
+## but WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+## GNU General Public License for more details.
+
+''' MetricStore.set_metrics throughput on large DHCP and route tables
+
+    python -m benchmark.metric_store_benchmark [--records 10000] [--rounds 5]
+'''
+
+from argparse import ArgumentParser
+from time import perf_counter
+
+from benchmark.fixtures import dhcp_leases, routes
+from collector.dhcp_collector import DHCPCollector
+from collector.route_collector import RouteCollector
+
+ROUTER_ID = {'routerboard_name': 'bench', 'routerboard_address': '192.0.2.1'}
+
+def records_per_second(collector, records, rounds: int) -> float:
+    store = collector.metric_store
+    # First round warms up the vendor lookup and any per-store caches
+    store.clear_metrics()
+    store.set_metrics([dict(r) for r in records])
+
+    best = float('inf')
+    for _ in range(rounds):
+        batch = [dict(r) for r in records]
+        store.clear_metrics()
+        start = perf_counter()
+        store.set_metrics(batch)
+        best = min(best, perf_counter() - start)
+
+    return len(records) / best
+
+def main():
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument('--records', type=int, default=10000)
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+
+    cases = [
+        ('dhcp', DHCPCollector(ROUTER_ID), dhcp_leases(args.records)),
+        ('route', RouteCollector(ROUTER_ID), routes(args.records)),
+    ]
+    for name, collector, records in cases:
+        rate = records_per_second(collector, records, args.rounds)
+        print(f'{name:>6}: {len(records)} records, {rate:,.0f} records/s')
+
+if __name__ == '__main__':
+    main()
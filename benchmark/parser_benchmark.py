@@ -0,0 +1,70 @@
+# coding=utf8
+## Copyright (c) 2020 Arseniy Kuznetsov
+## Copyright (c) 2024 Martti Anttila
+##
+## This program is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License
+## as published by the Free Software Foundation; either version 2
+## of the License, or (at your option) any later version.
+##
+## This program is distributed in the hope that it will be useful,
+## but WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+## GNU General Public License for more details.
+
+''' Value parser time per value: DHCP expires-after, netwatch RTTs and wifi rates
+
+    python -m benchmark.parser_benchmark [--values 25000] [--rounds 5]
+
+    regex: the DURATION_RGX / RATES_RGX parse, scanner: the hand written duration scanner,
+    memoized: the parser module functions, column: parse_column over the whole column
+'''
+
+from argparse import ArgumentParser
+from time import perf_counter
+
+from benchmark.fixtures import dhcp_leases
+from utils.parsers import match_duration, parse_column, parse_rates, parse_timedelta, scan_duration
+
+WIFI_RATES = ['6Mbps', '24Mbps', '54Mbps', '144.4Mbps-20MHz/2S', '300Mbps-40MHz/2S/SGI', '433.3Mbps-80MHz/1S/SGI',
+              '866.6Mbps-80MHz/2S/SGI', '1.2Gbps-80MHz/2S', '1.7Gbps-160MHz/2S/SGI', '2.4Gbps-160MHz/2S']
+
+def netwatch_rtts(count: int) -> list[str]:
+    return [f'{i % 40}ms{(i * 37) % 1000}us' if i % 4 else f'{i % 90}ms' for i in range(count)]
+
+def per_value(parse, values: list[str], rounds: int) -> float:
+    best = float('inf')
+    for _ in range(rounds):
+        start = perf_counter()
+        for v in values:
+            parse(v)
+        best = min(best, perf_counter() - start)
+    return best / len(values)
+
+def per_value_column(parse, values: list[str], rounds: int) -> float:
+    best = float('inf')
+    for _ in range(rounds):
+        start = perf_counter()
+        parse_column(values, parse)
+        best = min(best, perf_counter() - start)
+    return best / len(values)
+
+def main():
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument('--values', type=int, default=25000)
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+
+    columns = [
+        ('dhcp expires-after', [r['expires-after'] for r in dhcp_leases(args.values)], [('regex', match_duration), ('scanner', scan_duration), ('memoized', parse_timedelta)]),
+        ('netwatch rtt', netwatch_rtts(args.values), [('regex', match_duration), ('scanner', scan_duration), ('memoized', parse_timedelta)]),
+        ('wifi rate', [WIFI_RATES[i % len(WIFI_RATES)] for i in range(args.values)], [('regex', parse_rates.__wrapped__), ('memoized', parse_rates)]),
+    ]
+    for name, values, parsers in columns:
+        print(f'{name}: {len(values)} values, {len(set(values))} distinct')
+        for parser_name, parse in parsers:
+            print(f'{parser_name:>10}: {per_value(parse, values, args.rounds) * 1e9:7.0f} ns')
+        print(f'{"column":>10}: {per_value_column(parsers[-1][1], values, args.rounds) * 1e9:7.0f} ns')
+
+if __name__ == '__main__':
+    main()
@@ -14,6 +14,7 @@
 
 import yaml
 import logging
+import socket
 
 from collections import namedtuple
 
@@ -46,9 +47,44 @@ class ConfigKeys:
     SYSTEM_INTERVAL_KEY = 'system_interval'
 
     EXPORTER_INC_DIV = 'delay_inc_div'
+    INITIAL_DELAY_KEY = 'initial_delay_on_failure'
+    MAX_DELAY_KEY = 'max_delay_on_failure'
     EXPORTER_ADDR = 'export_address'
     EXPORTER_PORT = 'export_port'
 
+    MAX_WORKERS_KEY = 'max_workers'
+    OUI_INDEX_KEY = 'oui_index'
+    ASYNC_MODE_KEY = 'async_mode'
+    WORKER_PROCESSES_KEY = 'worker_processes'
+    ON_DEMAND_KEY = 'on_demand'
+    ON_DEMAND_DEADLINE_KEY = 'on_demand_deadline'
+    SHARD_INDEX_KEY = 'shard_index'
+    SHARD_COUNT_KEY = 'shard_count'
+    SHARD_MEMBER_KEY = 'shard_member'
+    SHARD_MEMBERS_KEY = 'shard_members'
+    REMOTE_WRITE_URL_KEY = 'remote_write_url'
+    REMOTE_WRITE_USERNAME_KEY = 'remote_write_username'
+    REMOTE_WRITE_PASSWORD_KEY = 'remote_write_password'
+    REMOTE_WRITE_MAX_SENDS_KEY = 'remote_write_max_sends'
+    REMOTE_WRITE_BATCH_SIZE_KEY = 'remote_write_batch_size'
+    REMOTE_WRITE_FLUSH_INTERVAL_KEY = 'remote_write_flush_interval'
+    REMOTE_WRITE_QUEUE_SIZE_KEY = 'remote_write_queue_size'
+    REMOTE_WRITE_TIMEOUT_KEY = 'remote_write_timeout'
+    REMOTE_WRITE_SPILL_DIR_KEY = 'remote_write_spill_dir'
+    REMOTE_WRITE_SPILL_SIZE_KEY = 'remote_write_spill_size'
+    MAX_WORKERS_PER_ROUTER_KEY = 'max_workers_per_router'
+    RESPONSE_CACHE_TTL_KEY = 'response_cache_ttl'
+    LABEL_DICTIONARY_SIZE_KEY = 'label_dictionary_size'
+    LABEL_DICTIONARY_CYCLES_KEY = 'label_dictionary_cycles'
+    ADAPTIVE_POLLING_KEY = 'adaptive_polling'
+    ADAPTIVE_MIN_INTERVAL_KEY = 'adaptive_min_interval'
+    ADAPTIVE_MAX_INTERVAL_KEY = 'adaptive_max_interval'
+    ADAPTIVE_VOLATILE_METRICS_KEY = 'adaptive_volatile_metrics'
+    PROBE_INTERVAL_KEY = 'probe_interval'
+    ROUTE_SUMMARY_KEY = 'route_summary'
+    ROUTE_COUNT_ONLY_KEY = 'route_count_only'
+    ROUTE_DETAIL_PREFIXES_KEY = 'route_detail_prefixes'
+
     # Base router id labels
     ROUTERBOARD_NAME = 'routerboard_name'
     ROUTERBOARD_ADDRESS = 'routerboard_address'
@@ -59,22 +95,48 @@ class ConfigKeys:
     DEFAULT_SLOW_POLLING_INTERVAL = 60
     DEFAULT_EXPORT_PORT = 49090
     DEFAULT_SOCKET_TIMEOUT = 2
-    DEFAULT_INITIAL_DELAY = 120
+    DEFAULT_INITIAL_DELAY = 30
     DEFAULT_MAX_DELAY = 900
     DEFAULT_INC_DIV = 5
     DEFAULT_CHECK_FOR_UPDATES_CHANNEL = ['stable']
     DEFAULT_SYSTEM_INTERVAL = 3600
     DEFAULT_EXPORT_ADDRESS = '::'
+    DEFAULT_MAX_WORKERS = 16
+    DEFAULT_WORKER_PROCESSES = 1
+    DEFAULT_ON_DEMAND_DEADLINE = 8
+    DEFAULT_SHARD_INDEX = 0
+    DEFAULT_SHARD_COUNT = 1
+    DEFAULT_REMOTE_WRITE_URL = ''
+    DEFAULT_REMOTE_WRITE_MAX_SENDS = 4
+    DEFAULT_REMOTE_WRITE_BATCH_SIZE = 2000
+    DEFAULT_REMOTE_WRITE_FLUSH_INTERVAL = 1
+    DEFAULT_REMOTE_WRITE_QUEUE_SIZE = 100
+    DEFAULT_REMOTE_WRITE_TIMEOUT = 30
+    DEFAULT_REMOTE_WRITE_SPILL_DIR = ''
+    DEFAULT_REMOTE_WRITE_SPILL_SIZE = 1024
+    DEFAULT_OUI_INDEX = ''
+    DEFAULT_MAX_WORKERS_PER_ROUTER = 2
+    DEFAULT_RESPONSE_CACHE_TTL = 0
+    DEFAULT_LABEL_DICTIONARY_SIZE = 500000
+    DEFAULT_LABEL_DICTIONARY_CYCLES = 10
+    DEFAULT_ADAPTIVE_MIN_INTERVAL = 0
+    DEFAULT_ADAPTIVE_MAX_INTERVAL = 600
+    DEFAULT_PROBE_INTERVAL = 0
 
     ROUTER_STR_KEYS = {HOST_KEY, USER_KEY, PASSWD_KEY}
-    ROUTER_BOOLEAN_KEYS = {ENABLED_KEY, SSL_KEY, NO_SSL_CERTIFICATE, SSL_CERTIFICATE_VERIFY}
-    ROUTER_INT_KEYS = {POLLING_INTERVAL_KEY, SLOW_POLLING_INTERVAL_KEY, PORT_KEY, SOCKET_TIMEOUT}
-    ROUTER_LIST_KEYS = {FAST_POLLING_KEYS, SLOW_POLLING_KEYS}
-
-    SYSTEM_STR_KEYS = {EXPORTER_ADDR}
-    SYSTEM_BOOLEAN_KEYS = {CHECK_FOR_UPDATES_KEY}
-    SYSTEM_INT_KEYS = {EXPORTER_PORT, EXPORTER_INC_DIV, SYSTEM_INTERVAL_KEY}
-    SYSTEM_LIST_KEYS = {CHECK_FOR_UPDATES_CHANNEL_KEY}
+    ROUTER_BOOLEAN_KEYS = {ENABLED_KEY, SSL_KEY, NO_SSL_CERTIFICATE, SSL_CERTIFICATE_VERIFY, ADAPTIVE_POLLING_KEY, ROUTE_SUMMARY_KEY, ROUTE_COUNT_ONLY_KEY}
+    ROUTER_INT_KEYS = {POLLING_INTERVAL_KEY, SLOW_POLLING_INTERVAL_KEY, PORT_KEY, SOCKET_TIMEOUT, MAX_WORKERS_PER_ROUTER_KEY, RESPONSE_CACHE_TTL_KEY,
+                       LABEL_DICTIONARY_SIZE_KEY, LABEL_DICTIONARY_CYCLES_KEY, ADAPTIVE_MIN_INTERVAL_KEY, ADAPTIVE_MAX_INTERVAL_KEY,
+                       PROBE_INTERVAL_KEY}
+    ROUTER_LIST_KEYS = {FAST_POLLING_KEYS, SLOW_POLLING_KEYS, ROUTE_DETAIL_PREFIXES_KEY, ADAPTIVE_VOLATILE_METRICS_KEY}
+
+    SYSTEM_STR_KEYS = {EXPORTER_ADDR, OUI_INDEX_KEY, SHARD_MEMBER_KEY, REMOTE_WRITE_URL_KEY, REMOTE_WRITE_USERNAME_KEY, REMOTE_WRITE_PASSWORD_KEY,
+                       REMOTE_WRITE_SPILL_DIR_KEY}
+    SYSTEM_BOOLEAN_KEYS = {CHECK_FOR_UPDATES_KEY, ASYNC_MODE_KEY, ON_DEMAND_KEY}
+    SYSTEM_INT_KEYS = {EXPORTER_PORT, EXPORTER_INC_DIV, INITIAL_DELAY_KEY, MAX_DELAY_KEY, SYSTEM_INTERVAL_KEY, MAX_WORKERS_KEY, WORKER_PROCESSES_KEY,
+                       SHARD_INDEX_KEY, SHARD_COUNT_KEY, ON_DEMAND_DEADLINE_KEY, REMOTE_WRITE_MAX_SENDS_KEY, REMOTE_WRITE_BATCH_SIZE_KEY,
+                       REMOTE_WRITE_FLUSH_INTERVAL_KEY, REMOTE_WRITE_QUEUE_SIZE_KEY, REMOTE_WRITE_TIMEOUT_KEY, REMOTE_WRITE_SPILL_SIZE_KEY}
+    SYSTEM_LIST_KEYS = {CHECK_FOR_UPDATES_CHANNEL_KEY, SHARD_MEMBERS_KEY}
 
     # mtik_exporter config entry name
     SYSTEM_CONFIG_ENTRY_NAME = 'system'
@@ -103,6 +165,11 @@ class SystemConfigHandler:
         entry_reader = self._config_entry_reader(entry_name)
         return ConfigEntry.RouterConfigEntry(**entry_reader) if entry_reader else None
 
+    def override_system_entry(self, key, value):
+        ''' Sets a system entry given on the command line, over the config file
+        '''
+        self.system_config[key] = value
+
     def system_entry(self):
         ''' mtik_exporter internal config entry
         '''
@@ -166,10 +233,37 @@ class SystemConfigHandler:
             ConfigKeys.SLOW_POLLING_INTERVAL_KEY: ConfigKeys.DEFAULT_SLOW_POLLING_INTERVAL,
             ConfigKeys.SOCKET_TIMEOUT: ConfigKeys.DEFAULT_SOCKET_TIMEOUT,
             ConfigKeys.EXPORTER_INC_DIV: ConfigKeys.DEFAULT_INC_DIV,
+            ConfigKeys.INITIAL_DELAY_KEY: ConfigKeys.DEFAULT_INITIAL_DELAY,
+            ConfigKeys.MAX_DELAY_KEY: ConfigKeys.DEFAULT_MAX_DELAY,
             ConfigKeys.CHECK_FOR_UPDATES_CHANNEL_KEY: ConfigKeys.DEFAULT_CHECK_FOR_UPDATES_CHANNEL,
             ConfigKeys.SYSTEM_INTERVAL_KEY: ConfigKeys.DEFAULT_SYSTEM_INTERVAL,
             ConfigKeys.EXPORTER_ADDR: ConfigKeys.DEFAULT_EXPORT_ADDRESS,
             ConfigKeys.EXPORTER_PORT: ConfigKeys.DEFAULT_EXPORT_PORT,
+            ConfigKeys.MAX_WORKERS_KEY: ConfigKeys.DEFAULT_MAX_WORKERS,
+            ConfigKeys.WORKER_PROCESSES_KEY: ConfigKeys.DEFAULT_WORKER_PROCESSES,
+            ConfigKeys.ON_DEMAND_DEADLINE_KEY: ConfigKeys.DEFAULT_ON_DEMAND_DEADLINE,
+            ConfigKeys.SHARD_INDEX_KEY: ConfigKeys.DEFAULT_SHARD_INDEX,
+            ConfigKeys.SHARD_COUNT_KEY: ConfigKeys.DEFAULT_SHARD_COUNT,
+            ConfigKeys.SHARD_MEMBER_KEY: socket.gethostname(),
+            ConfigKeys.SHARD_MEMBERS_KEY: [],
+            ConfigKeys.REMOTE_WRITE_URL_KEY: ConfigKeys.DEFAULT_REMOTE_WRITE_URL,
+            ConfigKeys.REMOTE_WRITE_USERNAME_KEY: '',
+            ConfigKeys.REMOTE_WRITE_PASSWORD_KEY: '',
+            ConfigKeys.REMOTE_WRITE_MAX_SENDS_KEY: ConfigKeys.DEFAULT_REMOTE_WRITE_MAX_SENDS,
+            ConfigKeys.REMOTE_WRITE_BATCH_SIZE_KEY: ConfigKeys.DEFAULT_REMOTE_WRITE_BATCH_SIZE,
+            ConfigKeys.REMOTE_WRITE_FLUSH_INTERVAL_KEY: ConfigKeys.DEFAULT_REMOTE_WRITE_FLUSH_INTERVAL,
+            ConfigKeys.REMOTE_WRITE_QUEUE_SIZE_KEY: ConfigKeys.DEFAULT_REMOTE_WRITE_QUEUE_SIZE,
+            ConfigKeys.REMOTE_WRITE_TIMEOUT_KEY: ConfigKeys.DEFAULT_REMOTE_WRITE_TIMEOUT,
+            ConfigKeys.REMOTE_WRITE_SPILL_DIR_KEY: ConfigKeys.DEFAULT_REMOTE_WRITE_SPILL_DIR,
+            ConfigKeys.REMOTE_WRITE_SPILL_SIZE_KEY: ConfigKeys.DEFAULT_REMOTE_WRITE_SPILL_SIZE,
+            ConfigKeys.OUI_INDEX_KEY: ConfigKeys.DEFAULT_OUI_INDEX,
+            ConfigKeys.MAX_WORKERS_PER_ROUTER_KEY: ConfigKeys.DEFAULT_MAX_WORKERS_PER_ROUTER,
+            ConfigKeys.RESPONSE_CACHE_TTL_KEY: ConfigKeys.DEFAULT_RESPONSE_CACHE_TTL,
+            ConfigKeys.LABEL_DICTIONARY_SIZE_KEY: ConfigKeys.DEFAULT_LABEL_DICTIONARY_SIZE,
+            ConfigKeys.LABEL_DICTIONARY_CYCLES_KEY: ConfigKeys.DEFAULT_LABEL_DICTIONARY_CYCLES,
+            ConfigKeys.ADAPTIVE_MIN_INTERVAL_KEY: ConfigKeys.DEFAULT_ADAPTIVE_MIN_INTERVAL,
+            ConfigKeys.ADAPTIVE_MAX_INTERVAL_KEY: ConfigKeys.DEFAULT_ADAPTIVE_MAX_INTERVAL,
+            ConfigKeys.PROBE_INTERVAL_KEY: ConfigKeys.DEFAULT_PROBE_INTERVAL,
         }.get(key)
 
 
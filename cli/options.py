@@ -16,7 +16,7 @@
 import os
 import logging
 from argparse import ArgumentParser
-from cli.config import config_handler
+from cli.config import config_handler, ConfigKeys
 
 class OptionsParser:
     ''' Base mtik_exporter Options Parser
@@ -50,6 +50,12 @@ Selected metrics info can be printed on the command line. For more information,
         logging.basicConfig(format='%(levelname)s %(message)s', level=namespace.loglevel)
         config_handler(namespace.cfg_file)
 
+        # The instances of a sharded fleet share the config file, each gets its shard on the command line
+        if namespace.shard_index is not None:
+            config_handler.override_system_entry(ConfigKeys.SHARD_INDEX_KEY, namespace.shard_index)
+        if namespace.shard_member is not None:
+            config_handler.override_system_entry(ConfigKeys.SHARD_MEMBER_KEY, namespace.shard_member)
+
     def parse_global_options(self, parser):
         ''' Parses global options
         '''
@@ -64,6 +70,12 @@ Selected metrics info can be printed on the command line. For more information,
         parser.add_argument('--verbose', dest = 'loglevel',
                     const = logging.INFO, action = 'store_const',
                     help = "More Verbose output")
+        parser.add_argument('--shard-index', dest = 'shard_index',
+                    type = int, default = None,
+                    help = 'Shard of this instance, 0 to shard_count - 1 (optional)')
+        parser.add_argument('--shard-member', dest = 'shard_member',
+                    default = None,
+                    help = 'Shard of this instance, one of shard_members, defaults to the host name (optional)')
 
 
     # Internal helpers
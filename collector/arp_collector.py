@@ -25,11 +25,12 @@ class ARPCollector(LoadingCollector):
         self.metric_store = MetricStore(
             router_id,
             ['mac_address', 'mac_vendor', 'address', 'interface', 'status', 'dynamic'],
-            resolve_mac_vendor = True)
+            resolve_mac_vendor = True,
+            intern_labels = True)
 
         # Metrics
         self.metric_store.create_info_metric('arp_entry', 'ARP Entry Info')
 
     def load_data(self, router_entry: 'RouterEntry'):
-        arp_records = router_entry.rest_api.get('ip/arp', 'status=stale,reachable')
+        arp_records = router_entry.rest_api.get('ip/arp', {'status': 'stale,reachable'}, self.metric_store.proplist())
         self.metric_store.set_metrics(arp_records)
\ No newline at end of file
@@ -22,6 +22,8 @@ if TYPE_CHECKING:
 
 class BGPCollector(LoadingCollector):
     '''BGP collector'''
+    volatile_metrics = frozenset({'bgp_uptime', 'bgp_remote_messages', 'bgp_local_messages'})
+
     def __init__(self, router_id: dict[str, str]):
         self.name = 'BGPCollector'
         self.metric_store = MetricStore(
@@ -25,12 +25,12 @@ class BridgeHostCollector(LoadingCollector):
         self.metric_store = MetricStore(
             router_id,
             ['mac_address', 'mac_vendor', 'vid', 'bridge', 'interface', 'on_interface'],
-            ['prefix_count', 'local_messages', 'local_bytes', 'remote_messages', 'remote_bytes', 'established', 'uptime'],
-            resolve_mac_vendor = True)
+            resolve_mac_vendor = True,
+            intern_labels = True)
 
         # Metrics
         self.metric_store.create_info_metric('bridge_host', 'Wireguard Interfaces')
 
     def load_data(self, router_entry: 'RouterEntry'):
-        bridge_host_records = router_entry.rest_api.get('interface/bridge/host', {'local': 'false'})
+        bridge_host_records = router_entry.rest_api.get('interface/bridge/host', {'local': 'false'}, self.metric_store.proplist())
         self.metric_store.set_metrics(bridge_host_records)
\ No newline at end of file
@@ -0,0 +1,108 @@
+# coding=utf8
+## Copyright (c) 2020 Arseniy Kuznetsov
+## Copyright (c) 2024 Martti Anttila
+##
+## This program is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License
+## as published by the Free Software Foundation; either version 2
+## of the License, or (at your option) any later version.
+##
+## This program is distributed in the hope that it will be useful,
+## but WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+## GNU General Public License for more details.
+
+import asyncio
+import logging
+
+from collections.abc import Callable
+from time import time
+
+from collector.metric_store import MetricStore, LoadingCollector
+from flow.router_rest_api import http_status
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from flow.router_entry import RouterEntry
+
+# Statuses of a REST path that does not exist on the router
+MISSING_PATH_STATUSES = {400, 404}
+
+class CapabilityProbe(LoadingCollector):
+    ''' Finds the optional REST paths of the router
+
+        The installed packages are read every load, the paths are probed on the first load,
+        when the packages change (upgrades, package installs) and every probe_interval
+    '''
+    def __init__(self, router_id: dict[str, str], paths: list[str], probe_interval: int, apply: Callable[[dict[str, bool]], None]):
+        self.name = 'CapabilityProbe'
+        self.paths = paths
+        self.probe_interval = probe_interval
+        self.apply = apply
+        self.packages: tuple[str, ...] | None = None
+        self.next_probe: float = 0
+        self.supported: dict[str, bool] = {}
+
+        self.metric_store = MetricStore(router_id, ['path'], ['supported'])
+        self.metric_store.create_gauge_metric('rest_path_supported', 'Optional REST path found on the router, collectors reading it run only when found', 'supported')
+
+    def load_data(self, router_entry: 'RouterEntry'):
+        package_records = router_entry.rest_api.get('system/package', proplist='name,version,disabled')
+        packages = installed_packages(package_records)
+        if self.probe_due(router_entry, packages):
+            self.update(packages, {path: self.probe(router_entry, path) for path in self.paths})
+        self.set_metrics()
+
+    async def load_data_async(self, router_entry: 'RouterEntry'):
+        ''' The paths are probed concurrently, instead of one load_data replay each
+        '''
+        package_records = await router_entry.rest_api.get('system/package', proplist='name,version,disabled')
+        packages = installed_packages(package_records)
+        if self.probe_due(router_entry, packages):
+            found = await asyncio.gather(*(self.probe_async(router_entry, path) for path in self.paths))
+            self.update(packages, dict(zip(self.paths, found)))
+        self.set_metrics()
+
+    def probe_due(self, router_entry: 'RouterEntry', packages: tuple[str, ...]) -> bool:
+        if packages == self.packages and time() < self.next_probe:
+            return False
+        if self.packages is not None and packages != self.packages:
+            logging.info('%s: Installed packages changed, probing the REST paths', router_entry.router_name)
+        return True
+
+    def update(self, packages: tuple[str, ...], supported: dict[str, bool]):
+        self.packages = packages
+        self.next_probe = time() + self.probe_interval
+        if supported != self.supported:
+            self.supported = supported
+            self.apply(supported)
+
+    def set_metrics(self):
+        self.metric_store.set_metrics([{'path': path, 'supported': int(found)} for path, found in self.supported.items()])
+
+    def probe(self, router_entry: 'RouterEntry', path: str) -> bool:
+        # The path may still be backing off after failing for a collector
+        router_entry.rest_api.reset_backoff(path)
+        try:
+            router_entry.rest_api.get(path, proplist='.id')
+            return True
+        except Exception as exc:
+            return probe_failed(exc)
+
+    async def probe_async(self, router_entry: 'RouterEntry', path: str) -> bool:
+        router_entry.rest_api.reset_backoff(path)
+        try:
+            await router_entry.rest_api.get(path, proplist='.id')
+            return True
+        except Exception as exc:
+            return probe_failed(exc)
+
+def installed_packages(package_records: list[dict]) -> tuple[str, ...]:
+    return tuple(sorted(f'{p.get("name")} {p.get("version")}' for p in package_records if p.get('disabled') != 'true'))
+
+def probe_failed(exc: Exception) -> bool:
+    ''' False for a path missing on the router, other failures are raised
+    '''
+    if http_status(exc) in MISSING_PATH_STATUSES:
+        return False
+    raise exc
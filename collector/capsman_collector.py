@@ -22,6 +22,7 @@ if TYPE_CHECKING:
 class CapsmanCollector(LoadingCollector):
     ''' CAPsMAN Metrics collector
     '''
+    probe_path = 'interface/wifi/capsman/remote-cap'
     def __init__(self, router_id: dict[str, str]):
         self.name = 'CapsmanCollector'
         self.metric_store = MetricStore(router_id, ['identity', 'version', 'base_mac', 'board', 'base_mac'])
@@ -30,5 +31,5 @@ class CapsmanCollector(LoadingCollector):
         self.metric_store.create_info_metric('capsman_remote_caps', 'CAPsMAN remote caps')
 
     def load_data(self, router_entry: 'RouterEntry'):
-        recs = router_entry.rest_api.get('interface/wifi/capsman/remote-cap')
+        recs = router_entry.rest_api.get('interface/wifi/capsman/remote-cap', proplist=self.metric_store.proplist())
         self.metric_store.set_metrics(recs)
@@ -20,6 +20,7 @@ if TYPE_CHECKING:
 
 class ContainerCollector(LoadingCollector):
     '''Container collector'''
+    probe_path = 'container'
     def __init__(self, router_id: dict[str, str]):
         self.name = 'ContainerCollector'
         self.metric_store = MetricStore(
@@ -23,6 +23,7 @@ if TYPE_CHECKING:
 class DHCPCollector(LoadingCollector):
     ''' DHCP Metrics collector
     '''
+    volatile_metrics = frozenset({'dhcp_lease_expiry', 'dhcp_lease_last_seen'})
 
     def __init__(self, router_id: dict[str, str]):
         self.name = 'DHCPCollector'
@@ -34,7 +35,8 @@ class DHCPCollector(LoadingCollector):
                 'expires_after': parse_timedelta,
                 'last_seen': parse_timedelta
             },
-            True)
+            True,
+            intern_labels = True)
 
         # Metrics
         self.metric_store.create_info_metric('dhcp_lease', 'DHCP Active Leases')
@@ -42,5 +44,5 @@ class DHCPCollector(LoadingCollector):
         self.metric_store.create_gauge_metric('dhcp_lease_last_seen', 'DHCP Active Lease Last Seen', 'last_seen', ['mac_address', 'comment', 'client_id'])
 
     def load_data(self, router_entry: 'RouterEntry'):
-        dhcp_lease_records = router_entry.rest_api.get('ip/dhcp-server/lease')
+        dhcp_lease_records = router_entry.rest_api.get('ip/dhcp-server/lease', proplist=self.metric_store.proplist())
         self.metric_store.set_metrics(dhcp_lease_records)
@@ -36,7 +36,7 @@ class FirewallFilterCollector(LoadingCollector):
         self.metric_store.create_counter_metric('firewall_filter_packets', 'Total amount of packets matched by firewall rules', 'packets')
 
     def load_data(self, router_entry: 'RouterEntry'):
-        firewall_filter_records = router_entry.rest_api.get('ip/firewall/filter')
+        firewall_filter_records = router_entry.rest_api.get('ip/firewall/filter', proplist=self.metric_store.proplist())
         self.metric_store.set_metrics(firewall_filter_records)
 
 class FirewallMangleCollector(LoadingCollector):
@@ -52,7 +52,7 @@ class FirewallMangleCollector(LoadingCollector):
         self.metric_store.create_counter_metric('firewall_mangle_packets', 'Total amount of packets matched by firewall mangle rules', 'packets')
 
     def load_data(self, router_entry: 'RouterEntry'):
-        firewall_mangle_records = router_entry.rest_api.get('ip/firewall/mangle')
+        firewall_mangle_records = router_entry.rest_api.get('ip/firewall/mangle', proplist=self.metric_store.proplist())
         self.metric_store.set_metrics(firewall_mangle_records)
 
 class FirewallRawCollector(LoadingCollector):
@@ -68,7 +68,7 @@ class FirewallRawCollector(LoadingCollector):
         self.metric_store.create_counter_metric('firewall_raw_packets', 'Total amount of packets matched by firewall raw rules', 'packets')
 
     def load_data(self, router_entry: 'RouterEntry'):
-        firewall_raw_records = router_entry.rest_api.get('ip/firewall/raw')
+        firewall_raw_records = router_entry.rest_api.get('ip/firewall/raw', proplist=self.metric_store.proplist())
         self.metric_store.set_metrics(firewall_raw_records)
 
 class IPv6FirewallFilterCollector(LoadingCollector):
@@ -84,7 +84,7 @@ class IPv6FirewallFilterCollector(LoadingCollector):
         self.metric_store.create_counter_metric('firewall_filter_ipv6_packets', 'Total amount of packets matched by firewall rules (IPv6)', 'packets')
 
     def load_data(self, router_entry: 'RouterEntry'):
-        firewall_filter_records_ipv6 = router_entry.rest_api.get('ipv6/firewall/filter')
+        firewall_filter_records_ipv6 = router_entry.rest_api.get('ipv6/firewall/filter', proplist=self.metric_store.proplist())
         self.metric_store.set_metrics(firewall_filter_records_ipv6)
 
 class IPv6FirewallMangleCollector(LoadingCollector):
@@ -100,7 +100,7 @@ class IPv6FirewallMangleCollector(LoadingCollector):
         self.metric_store.create_counter_metric('firewall_mangle_ipv6_packets', 'Total amount of packets matched by firewall mangle rules (IPv6)', 'packets')
 
     def load_data(self, router_entry: 'RouterEntry'):
-        firewall_mangle_records_ipv6 = router_entry.rest_api.get('ipv6/firewall/mangle')
+        firewall_mangle_records_ipv6 = router_entry.rest_api.get('ipv6/firewall/mangle', proplist=self.metric_store.proplist())
         self.metric_store.set_metrics(firewall_mangle_records_ipv6)
 
 class IPv6FirewallRawCollector(LoadingCollector):
@@ -117,5 +117,5 @@ class IPv6FirewallRawCollector(LoadingCollector):
 
 
     def load_data(self, router_entry: 'RouterEntry'):
-        firewall_raw_records_ipv6 = router_entry.rest_api.get('ipv6/firewall/raw')
+        firewall_raw_records_ipv6 = router_entry.rest_api.get('ipv6/firewall/raw', proplist=self.metric_store.proplist())
         self.metric_store.set_metrics(firewall_raw_records_ipv6)
\ No newline at end of file
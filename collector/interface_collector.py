@@ -47,7 +47,7 @@ class InterfaceCollector(LoadingCollector):
         self.metric_store.create_counter_metric('link_downs', 'Number of times link went down', 'link_downs')
 
     def load_data(self, router_entry: 'RouterEntry'):
-        interface_traffic_records = router_entry.rest_api.get('interface')
+        interface_traffic_records = router_entry.rest_api.get('interface', proplist=self.metric_store.proplist())
         interface_traffic_records_running = [ift for ift in interface_traffic_records if ift['running'] == 'true']
         self.metric_store.set_metrics(interface_traffic_records_running)
 
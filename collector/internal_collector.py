@@ -14,10 +14,16 @@
 
 
 from prometheus_client.context_managers import Timer
-from prometheus_client.core import Gauge, Counter
+from prometheus_client.core import Gauge, Counter, Histogram
+from cli.config import ConfigKeys
 from typing import TYPE_CHECKING
 
 
+# Request round trips, from milliseconds on a LAN to the socket timeout
+NETWORK_BUCKETS = (.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30)
+# In process work: JSON decode, set_metrics and rendering
+CPU_BUCKETS = (.0001, .0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5)
+
 class InternalCollector():
     ''' System Identity Metrics collector
     '''
@@ -30,6 +36,41 @@ class InternalCollector():
         self.load_last_run = Gauge(f'mtik_exporter_data_load_last_run', 'Last run timestamp of metrics load', labelnames=labels)
         self.load_exceptions = Counter(f'mtik_exporter_data_load_errors', 'Data Load Error Count', labelnames=labels)
 
+        path_labels = ['path', ConfigKeys.ROUTERBOARD_NAME, ConfigKeys.ROUTERBOARD_ADDRESS]
+        self.cache_hits = Counter(f'mtik_exporter_rest_cache_hits', 'REST responses served from the response cache', labelnames=path_labels)
+        self.cache_misses = Counter(f'mtik_exporter_rest_cache_misses', 'REST responses fetched from the router', labelnames=path_labels)
+
+        self.request_time = Histogram(f'mtik_exporter_rest_request_seconds', 'Time waiting for RouterOS REST responses, request sent to body received', labelnames=path_labels, buckets=NETWORK_BUCKETS)
+        self.decode_time = Histogram(f'mtik_exporter_rest_decode_seconds', 'Time decoding RouterOS REST response bodies', labelnames=path_labels, buckets=CPU_BUCKETS)
+        self.response_bytes = Counter(f'mtik_exporter_rest_response_bytes', 'Bytes of RouterOS REST response bodies', labelnames=path_labels)
+        self.response_records = Counter(f'mtik_exporter_rest_response_records', 'Records in RouterOS REST responses', labelnames=path_labels)
+
+        self.set_metrics_time = Histogram(f'mtik_exporter_set_metrics_seconds', 'Time turning the records of a load into series', labelnames=labels, buckets=CPU_BUCKETS)
+        self.render_time = Histogram(f'mtik_exporter_render_seconds', 'Time rendering the text exposition of a load', labelnames=labels, buckets=CPU_BUCKETS)
+        self.series = Gauge(f'mtik_exporter_collector_series', 'Series exposed by the collector after its last load', labelnames=labels)
+        self.interval = Gauge(f'mtik_exporter_collector_interval_seconds', 'Effective polling interval of adaptively polled collectors', labelnames=labels)
+
+        router_labels = [ConfigKeys.ROUTERBOARD_NAME, ConfigKeys.ROUTERBOARD_ADDRESS]
+        self.label_dictionary_size = Gauge(f'mtik_exporter_label_dictionary_size', 'Label values interned for the router', labelnames=router_labels)
+        self.skipped_loads = Counter(f'mtik_exporter_skipped_loads', 'Scheduled loads skipped because the previous load was still running', labelnames=router_labels)
+        self.deadline_exceeded = Counter(f'mtik_exporter_on_demand_deadline_exceeded', 'Scrapes served the previous metrics of the router because its on demand load missed the deadline', labelnames=router_labels)
+        self.router_backoff = Gauge(f'mtik_exporter_router_backoff_seconds', 'Current backoff of the router after connection failures, 0 when reachable', labelnames=router_labels)
+        self.router_failures = Gauge(f'mtik_exporter_router_failures', 'Successive connection failures of the router', labelnames=router_labels)
+        self.endpoint_backoff = Gauge(f'mtik_exporter_rest_backoff_seconds', 'Current backoff of the REST path after failed requests, 0 when answering', labelnames=path_labels)
+        self.endpoint_failures = Gauge(f'mtik_exporter_rest_failures', 'Successive failed requests of the REST path', labelnames=path_labels)
+
+        self.scrape_render_time = Histogram(f'mtik_exporter_scrape_render_seconds', 'Time assembling the scrape responses', labelnames=['encoding'], buckets=CPU_BUCKETS)
+
+        self.router_shard = Gauge(f'mtik_exporter_router_shard', 'Shard polling the router, 1 if it is the shard of this instance', labelnames=router_labels + ['shard'])
+        self.worker_routers = Gauge(f'mtik_exporter_worker_routers', 'Routers polled by the worker process', labelnames=['worker'])
+        self.worker_restarts = Counter(f'mtik_exporter_worker_restarts', 'Restarts of the worker process after it exited', labelnames=['worker'])
+
+        self.remote_write_queue = Gauge(f'mtik_exporter_remote_write_queue_batches', 'Remote write batches waiting to be sent', labelnames=['worker', 'shard', 'storage'])
+        self.remote_write_send_time = Histogram(f'mtik_exporter_remote_write_send_seconds', 'Time sending a remote write batch, response received', labelnames=['worker'], buckets=NETWORK_BUCKETS)
+        self.remote_write_sent = Counter(f'mtik_exporter_remote_write_samples_sent', 'Samples accepted by the remote write endpoint', labelnames=['worker'])
+        self.remote_write_dropped = Counter(f'mtik_exporter_remote_write_samples_dropped', 'Samples dropped by remote write, rejected by the endpoint or over the queue limits', labelnames=['worker', 'reason'])
+        self.remote_write_failures = Counter(f'mtik_exporter_remote_write_failures', 'Failed remote write sends, retried', labelnames=['worker'])
+
     def time(self, labelvalues):
         return Timer(self.load_time.labels(**labelvalues), 'inc')
 
@@ -40,4 +81,68 @@ class InternalCollector():
         return self.load_last_run.labels(**labelvalues).set_to_current_time()
 
     def inc_load_count(self, labelvalues):
-        return self.load_count.labels(**labelvalues).inc()
\ No newline at end of file
+        return self.load_count.labels(**labelvalues).inc()
+
+    def set_label_dictionary_size(self, labelvalues, size):
+        return self.label_dictionary_size.labels(**labelvalues).set(size)
+
+    def count_skipped_load(self, labelvalues):
+        return self.skipped_loads.labels(**labelvalues).inc()
+
+    def count_deadline_exceeded(self, labelvalues):
+        return self.deadline_exceeded.labels(**labelvalues).inc()
+
+    def set_router_backoff(self, labelvalues, delay, failures):
+        self.router_backoff.labels(**labelvalues).set(delay)
+        self.router_failures.labels(**labelvalues).set(failures)
+
+    def set_endpoint_backoff(self, labelvalues, delay, failures):
+        self.endpoint_backoff.labels(**labelvalues).set(delay)
+        self.endpoint_failures.labels(**labelvalues).set(failures)
+
+    def count_cache_lookup(self, labelvalues, hit):
+        if hit:
+            return self.cache_hits.labels(**labelvalues).inc()
+        return self.cache_misses.labels(**labelvalues).inc()
+
+    def observe_response(self, labelvalues, request_seconds, decode_seconds, size, records):
+        self.request_time.labels(**labelvalues).observe(request_seconds)
+        self.decode_time.labels(**labelvalues).observe(decode_seconds)
+        self.response_bytes.labels(**labelvalues).inc(size)
+        self.response_records.labels(**labelvalues).inc(records)
+
+    def observe_load(self, labelvalues, set_metrics_seconds, render_seconds, series):
+        self.set_metrics_time.labels(**labelvalues).observe(set_metrics_seconds)
+        self.render_time.labels(**labelvalues).observe(render_seconds)
+        self.series.labels(**labelvalues).set(series)
+
+    def set_collector_interval(self, labelvalues, seconds):
+        return self.interval.labels(**labelvalues).set(seconds)
+
+    def observe_scrape_render(self, encoding, seconds):
+        self.scrape_render_time.labels(encoding).observe(seconds)
+
+    def set_router_shard(self, labelvalues, shard, owned):
+        return self.router_shard.labels(shard=shard, **labelvalues).set(int(owned))
+
+    def set_worker_routers(self, worker, routers):
+        return self.worker_routers.labels(worker).set(routers)
+
+    def count_worker_restart(self, worker):
+        return self.worker_restarts.labels(worker).inc()
+
+    def track_remote_write_queue(self, worker, shard, memory_batches, disk_batches):
+        self.remote_write_queue.labels(worker, shard, 'memory').set_function(memory_batches)
+        self.remote_write_queue.labels(worker, shard, 'disk').set_function(disk_batches)
+
+    def observe_remote_write_send(self, worker, seconds):
+        self.remote_write_send_time.labels(worker).observe(seconds)
+
+    def count_remote_write_sent(self, worker, samples):
+        return self.remote_write_sent.labels(worker).inc(samples)
+
+    def count_remote_write_dropped(self, worker, reason, samples):
+        return self.remote_write_dropped.labels(worker, reason).inc(samples)
+
+    def count_remote_write_failure(self, worker):
+        return self.remote_write_failures.labels(worker).inc()
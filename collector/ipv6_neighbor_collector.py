@@ -27,12 +27,13 @@ class IPv6NeighborCollector(LoadingCollector):
         self.metric_store = MetricStore(
             router_id,
             ['address', 'interface', 'mac_address', 'mac_vendor', 'status', 'router'],
-            resolve_mac_vendor = True)
+            resolve_mac_vendor = True,
+            intern_labels = True)
 
         # Metrics
         self.metric_store.create_info_metric('ipv6_neighbor', 'Reachable IPv6 neighbors')
 
     def load_data(self, router_entry: 'RouterEntry'):
-        records = router_entry.rest_api.get('ipv6/neighbor', {'status': 'reachable'})
+        records = router_entry.rest_api.get('ipv6/neighbor', {'status': 'reachable'}, self.metric_store.proplist())
         # add dhcp info
         self.metric_store.set_metrics(records)
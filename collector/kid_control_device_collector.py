@@ -23,6 +23,7 @@ if TYPE_CHECKING:
 class KidDeviceCollector(LoadingCollector):
     """ Kid-control device Metrics collector
     """
+    probe_path = 'ip/kid-control/device'
 
     def __init__(self, router_id: dict[str, str]):
         self.name = 'KidDeviceCollector'
@@ -49,7 +50,7 @@ class KidDeviceCollector(LoadingCollector):
         self.metric_store.create_gauge_metric('kid_control_device_idle_time', 'Device idle time', 'idle_time', ['name', 'mac_address', 'user'])
 
     def load_data(self, router_entry: 'RouterEntry'):
-        records = router_entry.rest_api.get('ip/kid-control/device')
+        records = router_entry.rest_api.get('ip/kid-control/device', proplist=self.metric_store.proplist())
         device_records = []
         for record in records:
             if record.get('user'):
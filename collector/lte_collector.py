@@ -24,6 +24,8 @@ if TYPE_CHECKING:
 class LTECollector(LoadingCollector):
     ''' Router LTE Metrics collector
     '''
+    probe_path = 'interface/lte'
+    volatile_metrics = frozenset({'lte_uptime'})
 
     def __init__(self, router_id: dict[str, str]):
         self.name = 'LTECollector'
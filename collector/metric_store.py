@@ -12,17 +12,29 @@
 ## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
 ## GNU General Public License for more details.
 
+import zlib
+
 from abc import abstractmethod
-from prometheus_client.core import GaugeMetricFamily, CounterMetricFamily, InfoMetricFamily, Metric
+from array import array
+from prometheus_client.core import Metric
+from prometheus_client.openmetrics.exposition import escape_label_name, escape_metric_name
 from prometheus_client.registry import Collector
-from collections.abc import Callable
-from time import time
+from prometheus_client.utils import floatToGoString
+from collections.abc import Callable, Iterable, Iterator
+from operator import itemgetter
+from time import perf_counter, time
 
+from flow.exposition import EMPTY_SNAPSHOT, Snapshot
+from flow.router_entry import ReplayRouterEntry
+from flow.router_rest_api import PendingRequest
+from utils.parsers import parse_column
 from utils.utils import get_mac_vendor
 
 from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
+    from flow.adaptive_interval import AdaptiveInterval
+    from flow.label_dictionary import LabelDictionary
     from flow.router_entry import RouterEntry
 
 class MetricStore():
@@ -33,7 +45,10 @@ class MetricStore():
                  metric_labels: list[str],
                  metric_values: list[str] = [],
                  translation_table: dict[str, Callable[[str | None], str | float | None]]={},
-                 resolve_mac_vendor: bool = False
+                 resolve_mac_vendor: bool = False,
+                 extra_properties: list[str] = [],
+                 derived_properties: list[str] = [],
+                 intern_labels: bool = False
                 ):
         self.router_id = router_id
         self.ts: float = 0
@@ -41,100 +56,510 @@ class MetricStore():
         self.metric_values = metric_values
         self.translation_table = translation_table
         self.resolve_mac_vendor = resolve_mac_vendor
+        # Raw RouterOS properties read in load_data, and fields load_data computes itself
+        self.extra_properties = extra_properties
+        self.derived_properties = derived_properties
+        # High cardinality stores share their label values through the router label dictionary, set by use_label_dictionary
+        self.intern_labels = intern_labels
+        self.label_dictionary: 'LabelDictionary | None' = None
 
-        self.metrics: list[tuple[Metric, list[str], str | None]] = []
+        self.metrics: list[tuple[SeriesFamily, list[str], str | None]] = []
+        # Time spent in set_metrics since the last clear_metrics
+        self.set_metrics_time: float = 0
+        self._proplist: str | None = None
+        self._plan: SetMetricsPlan | None = None
 
     def create_info_metric(self, name: str, decription: str):
-        self.metrics.append((InfoMetricFamily(f'mtik_exporter_{name}', decription, labels=self.metric_labels), self.metric_labels, None))
+        self._proplist = self._plan = None
+        self.metrics.append((SeriesFamily(f'mtik_exporter_{name}', decription, 'info', self.metric_labels), self.metric_labels, None))
 
     def create_gauge_metric(self, name: str, decription: str, value: str, labels = []):
         labels = self.add_router_labels(labels) if labels else self.metric_labels
-        self.metrics.append((GaugeMetricFamily(f'mtik_exporter_{name}', decription, labels=labels), labels, value))
+        self._proplist = self._plan = None
+        self.metrics.append((SeriesFamily(f'mtik_exporter_{name}', decription, 'gauge', labels), labels, value))
 
     def create_counter_metric(self, name: str, decription: str, value: str, labels = []):
         labels = self.add_router_labels(labels) if labels else self.metric_labels
-        self.metrics.append((CounterMetricFamily(f'mtik_exporter_{name}', decription, labels=labels), labels, value))
+        self._proplist = self._plan = None
+        self.metrics.append((SeriesFamily(f'mtik_exporter_{name}', decription, 'counter', labels), labels, value))
+
+    def proplist(self) -> str:
+        ''' Comma separated RouterOS properties needed by the metrics, for the .proplist request parameter
+        '''
+        if self._proplist is None:
+            keys = set(self.metric_labels) | set(self.metric_values) | set(self.translation_table)
+            for _, labels, value in self.metrics:
+                keys.update(labels)
+                if value:
+                    keys.add(value)
+
+            keys -= set(self.router_id) | set(self.derived_properties)
+            if self.resolve_mac_vendor:
+                keys.discard('mac_vendor')
+                keys.add('mac_address')
+
+            # set_metrics drops disabled records
+            properties = {ros_property(k) for k in keys} | {'disabled'} | set(self.extra_properties)
+            self._proplist = ','.join(sorted(properties))
+
+        return self._proplist
 
     def get_metrics(self):
         if not self.ts:
             return
 
-        for metric, _, _ in self.metrics:
-            yield metric
+        for family, _, _ in self.metrics:
+            yield family.metric()
+
+    def render(self) -> bytes:
+        ''' Text exposition of the metrics, same output as the prometheus client for get_metrics
+        '''
+        if not self.ts:
+            return b''
+
+        output = []
+        for family, _, _ in self.metrics:
+            family.render(output)
+        return ''.join(output).encode('utf-8')
 
     def clear_metrics(self):
-        for metric, _, _ in self.metrics:
-            metric.samples.clear()
+        self.set_metrics_time = 0
+        for family, _, _ in self.metrics:
+            family.clear()
+
+    def series_count(self) -> int:
+        return sum(family.count for family, _, _ in self.metrics)
 
-    def set_metrics(self, router_records: list[dict[str, str | float]] = []):
+    def families(self) -> list['SeriesFamily']:
+        return [family for family, _, _ in self.metrics]
+
+    def set_metrics(self, router_records: Iterable[dict[str, str | float]] = []):
+        ''' Turns the records into series, router_records can be a stream of records
+            decoded one at a time, they are processed in batches and not held
+        '''
+        start = perf_counter()
         self.ts = time()
 
         if not router_records:
             router_records = []
 
-        for router_record in router_records:
-            # Some routeros endpoints do not support filtering by disabled flag, do it here instead
-            if router_record.get('disabled', 'false') == 'true':
-                continue
-
-            translated_record = {}
-            # Normalize keys
-            for key, value in router_record.items():
-                k = key
-                if key.startswith(('.', '_', '-')):
-                    k = k[1:]
-                if k.endswith(('.', '_', '-')):
-                    k = k[:-1]
-
-                k = k.replace('.', '_').replace('-', '_')
-                translated_record[k] = value
-
-            # Add Router labels
-            for k, v in self.router_id.items():
-                translated_record[k] = v
-
-            # translate fields if needed
-            for key, func in self.translation_table.items():
-                val = func(str(translated_record.get(key)) if key in translated_record else None)
-                if val != None:
-                    translated_record[key] = val
+        plan = self._plan or self._compile()
+        raw_columns = plan.raw_columns
+        template = plan.template
+
+        rows = []
+        try:
+            for router_record in router_records:
+                # Some routeros endpoints do not support filtering by disabled flag, do it here instead
+                if router_record.get('disabled', 'false') == 'true':
+                    continue
+
+                # Copy the needed fields into a row, router labels are already in the template
+                row = template.copy()
+                for key, value in router_record.items():
+                    idx = raw_columns.get(key)
+                    if idx is None:
+                        idx = plan.map_key(key)
+                    if idx >= 0:
+                        row[idx] = value
+                rows.append(row)
+                if len(rows) >= ROWS_BATCH:
+                    self._add_rows(plan, rows)
+                    rows = []
+        except Exception:
+            # A stream failing half way, no partial table
+            self.clear_metrics()
+            raise
+
+        self._add_rows(plan, rows)
+        self.set_metrics_time += perf_counter() - start
+
+    def _add_rows(self, plan: 'SetMetricsPlan', rows: list[list]):
+        mac_column = plan.mac_column
+        vendor_column = plan.vendor_column
+        label_columns = plan.label_columns
+        metric_plan = plan.metrics
+        intern = self.label_dictionary.intern if self.label_dictionary is not None else None
 
+        # translate fields if needed, a column at a time so that repeated values are parsed once
+        for idx, func, default in plan.translations:
+            def translate(v, func=func, default=default):
+                return default if v is MISSING else func(v)
+            column = [v if type(v) is str or v is MISSING else str(v) for v in (row[idx] for row in rows)]
+            for row, v in zip(rows, parse_column(column, translate)):
+                if v != None:
+                    row[idx] = v
+
+        for row in rows:
             # add mac vendor
-            if self.resolve_mac_vendor:
-                mac = translated_record.get('mac_address')
-                if mac:
-                    translated_record['mac_vendor'] = get_mac_vendor(mac)
-
-            for metric, labels, value in self.metrics:
-                v = None
-                # Info Metrics
-                if not value:
-                    v = {}
-                else:
-                    v = translated_record.get(value)
-                    if v == None:
+            if mac_column >= 0:
+                mac = row[mac_column]
+                if mac and mac is not MISSING:
+                    row[vendor_column] = get_mac_vendor(mac)
+
+            labels_row = row.copy() if plan.shared_columns else row
+            for idx in label_columns:
+                v = labels_row[idx]
+                if type(v) is not str:
+                    v = labels_row[idx] = '' if v is MISSING else str(v)
+                if intern:
+                    labels_row[idx] = intern(v)
+
+            for get_labels, families in metric_plan:
+                # Families with the same labels share the label tuple
+                labels = get_labels(labels_row)
+                for add, value_idx in families:
+                    # Info Metrics
+                    if value_idx < 0:
+                        add(labels, 1.0)
+                        continue
+
+                    v = row[value_idx]
+                    if v is MISSING or v is None:
                         continue
+                    add(labels, v)
 
-                lv: list[str] = [str(translated_record.get(label, '')) for label in labels]
-                metric.add_metric(lv, v)
+    def _compile(self) -> 'SetMetricsPlan':
+        self._plan = SetMetricsPlan(self)
+        return self._plan
 
     def add_router_labels(self, labels: list[str]):
         return labels + list(self.router_id.keys())
 
+class SeriesFamily:
+    ''' Samples of one metric family, in place of the prometheus client metric families
+
+        Label tuples are kept across loads and the values sit in an array, overwritten
+        in place for as long as a load brings the same series in the same order
+    '''
+    __slots__ = ('name', 'documentation', 'type', 'sample_name', 'label_positions', 'header', 'line_format', 'series', 'values', 'count', 'pending')
+
+    def __init__(self, name: str, documentation: str, type: str, label_names: list[str]):
+        self.documentation = documentation
+        self.type = type
+
+        # Same naming as the prometheus client families and the text format
+        if type == 'counter':
+            self.name = name[:-6] if name.endswith('_total') else name
+            self.sample_name = f'{self.name}_total'
+            exposed_type = type
+        elif type == 'info':
+            self.name = name
+            self.sample_name = f'{name}_info'
+            exposed_type = 'gauge'
+        else:
+            self.name = self.sample_name = name
+            exposed_type = type
+
+        sample_name = escape_metric_name(self.sample_name)
+        doc = documentation.replace('\\', r'\\').replace('\n', r'\n')
+        self.header = f'# HELP {sample_name} {doc}\n# TYPE {sample_name} {exposed_type}\n'
+
+        # Labels are exposed sorted by name, a repeated name keeps its last value
+        positions = {label: i for i, label in enumerate(label_names)}
+        self.label_positions = sorted(positions.items())
+        if positions:
+            pairs = ','.join(f'{escape_label_name(label)}="%s"' for label, _ in self.label_positions)
+            self.line_format = f'{sample_name}{{{pairs}}} '
+        else:
+            self.line_format = f'{sample_name} '
+
+        self.series: list[tuple] = []
+        self.values = array('d')
+        self.count = 0
+        # Series and values of the current load, once it no longer matches the previous one
+        self.pending: tuple[list[tuple], array] | None = None
+
+    def add(self, labels: tuple, value: str | float):
+        value = float(value)
+        i = self.count
+        self.count = i + 1
+        if self.pending is None:
+            series = self.series
+            if i < len(series) and series[i] == labels:
+                self.values[i] = value
+                return
+            self.pending = (series[:i], self.values[:i])
+
+        pending_series, pending_values = self.pending
+        pending_series.append(labels)
+        pending_values.append(value)
+
+    def clear(self):
+        self._settle()
+        self.count = 0
+
+    def checksum(self, values: bool = True) -> int:
+        ''' Checksum of the series of the family, and of their values
+        '''
+        pending = self.pending
+        series, series_values = pending if pending is not None else (self.series[:self.count], self.values[:self.count])
+        checksum = hash((self.name, tuple(series)))
+        return hash((checksum, zlib.crc32(series_values))) if values else checksum
+
+    def samples(self) -> Iterator[tuple[tuple, float]]:
+        # Read only, the http server threads may call it while the family is loading and settling,
+        # every attribute is read once
+        pending = self.pending
+        if pending is not None:
+            return zip(*pending)
+        count = self.count
+        return zip(self.series[:count], self.values[:count])
+
+    def metric(self) -> Metric:
+        metric = Metric(self.name, self.documentation, self.type)
+        for labels, value in self.samples():
+            metric.add_sample(self.sample_name, {label: labels[i] for label, i in self.label_positions}, value)
+        return metric
+
+    def render(self, output: list[str]):
+        self._settle()
+        output.append(self.header)
+
+        line_format = self.line_format
+        positions = [i for _, i in self.label_positions]
+        for labels, value in zip(self.series, self.values):
+            if positions:
+                line = line_format % tuple(escape_label_value(labels[i]) for i in positions)
+            else:
+                line = line_format
+            output.append(f'{line}{floatToGoString(value)}\n')
+
+    def _settle(self):
+        # Makes the series of the last load the current ones
+        if self.pending is not None:
+            self.series, self.values = self.pending
+            self.pending = None
+        elif self.count < len(self.series):
+            del self.series[self.count:]
+            del self.values[self.count:]
+
+def escape_label_value(value: str) -> str:
+    return value.replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+# Row placeholder for fields missing from the record
+MISSING = object()
+# Records turned into series at a time, a streamed table is never held as a whole
+ROWS_BATCH = 4096
+
+class SetMetricsPlan:
+    ''' Per store plan used by set_metrics, built once from the store schema
+
+        Records are copied into a row holding only the columns the metrics use,
+        raw RouterOS keys are normalized once and mapped straight to their column.
+    '''
+    __slots__ = ('columns', 'router_columns', 'raw_columns', 'template', 'translations', 'label_columns', 'shared_columns', 'mac_column', 'vendor_column', 'metrics')
+
+    def __init__(self, store: MetricStore):
+        self.columns: dict[str, int] = {}
+        for key in store.metric_labels:
+            self._column(key)
+        for _, labels, value in store.metrics:
+            for key in labels:
+                self._column(key)
+            if value:
+                self._column(value)
+        for key in store.translation_table:
+            self._column(key)
+
+        self.mac_column = self.vendor_column = -1
+        if store.resolve_mac_vendor:
+            self.mac_column = self._column('mac_address')
+            self.vendor_column = self._column('mac_vendor')
+
+        self.template: list = [MISSING] * len(self.columns)
+        router_columns = self.router_columns = set()
+        for key, value in store.router_id.items():
+            router_columns.add(self.columns[key])
+            self.template[self.columns[key]] = value
+
+        # Raw record key -> column, -1 for keys no metric uses. Router labels can not be overwritten
+        self.raw_columns: dict[str, int] = {}
+        for key, idx in self.columns.items():
+            if idx in router_columns:
+                self.raw_columns[key] = -1
+
+        # Translations of absent keys always give the same result, evaluate them once
+        self.translations: list[tuple[int, Callable, str | float | None]] = []
+        for key, func in store.translation_table.items():
+            try:
+                default = func(None)
+            except Exception:
+                default = None
+            self.translations.append((self.columns[key], func, default))
+
+        label_columns = set()
+        value_columns = set()
+        groups: dict[tuple[int, ...], list[tuple[Callable, int]]] = {}
+        for family, labels, value in store.metrics:
+            idxs = tuple(self.columns[label] for label in labels)
+            label_columns.update(idxs)
+            value_idx = self.columns[value] if value else -1
+            if value:
+                value_columns.add(value_idx)
+            groups.setdefault(idxs, []).append((family.add, value_idx))
+        self.metrics: list[tuple[Callable, list[tuple[Callable, int]]]] = [(label_getter(idxs), families) for idxs, families in groups.items()]
+
+        self.label_columns = sorted(label_columns - router_columns)
+        # Columns used both as a label and as a value need their raw value kept aside
+        self.shared_columns = bool(label_columns & value_columns)
+
+    def map_key(self, key: str) -> int:
+        idx = self.columns.get(normalize_key(key), -1)
+        if idx in self.router_columns:
+            idx = -1
+        self.raw_columns[key] = idx
+        return idx
+
+    def _column(self, key: str) -> int:
+        idx = self.columns.get(key)
+        if idx is None:
+            idx = self.columns[key] = len(self.columns)
+        return idx
+
+def normalize_key(key: str) -> str:
+    ''' RouterOS property name to record key, e.g. '.id' -> 'id', 'mac-address' -> 'mac_address'
+    '''
+    k = key
+    if k.startswith(('.', '_', '-')):
+        k = k[1:]
+    if k.endswith(('.', '_', '-')):
+        k = k[:-1]
+
+    return k.replace('.', '_').replace('-', '_')
+
+def label_getter(idxs: tuple[int, ...]) -> Callable[[list], tuple]:
+    if len(idxs) > 1:
+        return itemgetter(*idxs)
+    if idxs:
+        idx = idxs[0]
+        return lambda row: (row[idx],)
+    return lambda row: ()
+
+def ros_property(key: str) -> str:
+    ''' RouterOS property name of a normalized record key
+    '''
+    return '.id' if key == 'id' else key.replace('_', '-')
+
+class MetricStoreGroup:
+    ''' Stores of a collector loading records of different kinds, used as its single metric store
+        Every store gets the records of its kind, only the stores set since the start are exported
+    '''
+    def __init__(self, *stores: MetricStore):
+        self.stores = stores
+
+    @property
+    def ts(self) -> float:
+        return max(store.ts for store in self.stores)
+
+    @property
+    def set_metrics_time(self) -> float:
+        return sum(store.set_metrics_time for store in self.stores)
+
+    def get_metrics(self):
+        for store in self.stores:
+            yield from store.get_metrics()
+
+    def render(self) -> bytes:
+        return b''.join(store.render() for store in self.stores)
+
+    def clear_metrics(self):
+        for store in self.stores:
+            store.clear_metrics()
+
+    def series_count(self) -> int:
+        return sum(store.series_count() for store in self.stores)
+
+    def families(self) -> list['SeriesFamily']:
+        return [family for store in self.stores if store.ts for family in store.families()]
+
+# Requests load_data is replayed for in asyncio mode
+MAX_REPLAYED_REQUESTS = 3
+
 class LoadingCollector(Collector):
     name: str
-    metric_store: MetricStore
+    metric_store: MetricStore | MetricStoreGroup
 
     def get_name(self):
         return self.name
 
+    # Text exposition served to the scrapes, rendered after every load
+    snapshot: Snapshot = EMPTY_SNAPSHOT
+    render_time: float = 0
+    # Set when the router polls adaptively
+    adaptive_interval: 'AdaptiveInterval | None' = None
+    # REST path that only exists with an optional package, the collector is created once the path is found on the router
+    probe_path: str | None = None
+    # Seconds between the loads of the collector group, 0 when the collector is not polled on a timer
+    group_interval: int = 0
+    # Metrics whose values change on almost every load while the table stays the same (expiry times, uptimes),
+    # only their series count as a change for the adaptive interval
+    volatile_metrics: frozenset[str] = frozenset()
+
+    def use_label_dictionary(self, label_dictionary: 'LabelDictionary'):
+        ''' Interns the label values of the high cardinality stores in the label dictionary of the router
+        '''
+        for store in getattr(self.metric_store, 'stores', (self.metric_store,)):
+            if store.intern_labels:
+                store.label_dictionary = label_dictionary
+
+    @property
+    def interval(self) -> int:
+        ''' Seconds between the loads of the collector
+        '''
+        return self.adaptive_interval.interval if self.adaptive_interval else self.group_interval
+
     def load(self, router_entry: 'RouterEntry') -> None:
-        self.metric_store.clear_metrics()
-        self.load_data(router_entry)
-    
+        try:
+            self.metric_store.clear_metrics()
+            self.load_data(router_entry)
+        finally:
+            self.take_snapshot()
+
+    async def load_async(self, router_entry: 'RouterEntry') -> None:
+        ''' asyncio variant of load
+        '''
+        try:
+            self.metric_store.clear_metrics()
+            await self.load_data_async(router_entry)
+        finally:
+            self.take_snapshot()
+
+    def take_snapshot(self):
+        start = perf_counter()
+        self.snapshot = Snapshot(self.render())
+        self.render_time = perf_counter() - start
+
+    async def load_data_async(self, router_entry: 'RouterEntry') -> None:
+        ''' asyncio variant of load_data
+            load_data is replayed until every response it asks for has been fetched on the event loop, each
+            request costs a full run of load_data, collectors making more than MAX_REPLAYED_REQUESTS override this
+        '''
+        replay_entry = ReplayRouterEntry(router_entry)
+        for replayed in range(MAX_REPLAYED_REQUESTS + 1):
+            self.metric_store.clear_metrics()
+            try:
+                self.load_data(replay_entry)
+                return
+            except PendingRequest as pending:
+                if replayed == MAX_REPLAYED_REQUESTS:
+                    raise RuntimeError(f'{self.name} makes more than {MAX_REPLAYED_REQUESTS} requests, {pending.key} is not replayed') from None
+                await replay_entry.rest_api.fetch(pending)
+
+    def change_checksum(self) -> int:
+        ''' Checksum of the loaded series and their values, the values of the volatile metrics left out
+        '''
+        volatile = {f'mtik_exporter_{name}' for name in self.volatile_metrics}
+        return hash(tuple(family.checksum(family.name not in volatile) for family in self.metric_store.families()))
+
     @abstractmethod
     def load_data(self, router_entry: 'RouterEntry') -> None:
         pass
 
+    def render(self) -> bytes:
+        ''' Text exposition of the collect metrics
+        '''
+        return self.metric_store.render()
+
     def collect(self):
         yield from self.metric_store.get_metrics()
\ No newline at end of file
@@ -40,7 +40,8 @@ class NetwatchCollector(LoadingCollector):
                 'http_resp_time': parse_timedelta,
                 'tcp_connect_time': parse_timedelta,
                 'status': lambda value: 1 if value == 'up' else 0
-            })
+            },
+            extra_properties = ['loss-percent'])
 
         # Create metrics
         self.metric_store.create_gauge_metric('netwatch_status', 'Netwatch Status Metrics', 'status')
@@ -62,7 +63,7 @@ class NetwatchCollector(LoadingCollector):
         self.metric_store.create_gauge_metric('tcp_connect_time', 'Netwatch HTTP TCP Connect Time', 'tcp_connect_time')
 
     def load_data(self, router_entry: 'RouterEntry'):
-        nw_records = router_entry.rest_api.get('tool/netwatch', {'disabled': 'false'})
+        nw_records = router_entry.rest_api.get('tool/netwatch', {'disabled': 'false'}, self.metric_store.proplist())
         if not nw_records:
             return
 
@@ -38,5 +38,5 @@ class PackageCollector(LoadingCollector):
         self.metric_store.create_gauge_metric('installed_packages_build_time', 'Installed Package Build Time', 'build_time')
 
     def load_data(self, router_entry: 'RouterEntry'):
-        package_record = router_entry.rest_api.get('system/package')
+        package_record = router_entry.rest_api.get('system/package', proplist=self.metric_store.proplist())
         self.metric_store.set_metrics(package_record)
\ No newline at end of file
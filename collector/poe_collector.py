@@ -22,6 +22,7 @@ if TYPE_CHECKING:
 class POECollector(LoadingCollector):
     ''' POE Metrics collector
     '''
+    probe_path = 'interface/ethernet/poe'
 
     def __init__(self, router_id: dict[str, str]):
         self.name = 'POECollector'
@@ -31,5 +31,5 @@ class PoolCollector(LoadingCollector):
         self.metric_store.create_info_metric('ip_pool_device', 'Used Addresses in IP Pool')
 
     def load_data(self, router_entry: 'RouterEntry'):
-        pool_used_records = router_entry.rest_api.get('ip/pool/used')
+        pool_used_records = router_entry.rest_api.get('ip/pool/used', proplist=self.metric_store.proplist())
         self.metric_store.set_metrics(pool_used_records)
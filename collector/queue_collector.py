@@ -37,7 +37,7 @@ class QueueTreeCollector(LoadingCollector):
         self.metric_store.create_counter_metric('queue_tree_dropped', 'Number of dropped bytes', 'dropped', ['name'])
 
     def load_data(self, router_entry: 'RouterEntry'):
-        qt_records = router_entry.rest_api.get('queue/tree')
+        qt_records = router_entry.rest_api.get('queue/tree', proplist=self.metric_store.proplist())
         self.metric_store.set_metrics(qt_records)
 
 
@@ -23,6 +23,7 @@ if TYPE_CHECKING:
 class SystemResourceCollector(LoadingCollector):
     ''' System Resource Metrics collector
     '''
+    volatile_metrics = frozenset({'system_uptime'})
 
     def __init__(self, router_id: dict[str, str]):
         self.name = 'SystemResourceCollector'
@@ -12,41 +12,195 @@
 ## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
 ## GNU General Public License for more details.
 
+import asyncio
+import logging
 
-from collector.metric_store import MetricStore, LoadingCollector
+from collections import Counter
+from collections.abc import Iterable
+
+from collector.metric_store import MetricStore, MetricStoreGroup, LoadingCollector
 from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
     from flow.router_entry import RouterEntry
 
-class RouteCollector(LoadingCollector):
-    ''' IP Route Metrics collector
+# Route flags naming the protocol of a route, the first one set wins
+PROTOCOLS = ['bgp', 'ospf', 'rip', 'connect', 'static', 'dhcp', 'vpn', 'modem']
+ROUTE_LABELS = ['comment', 'type', 'dst_address', 'gateway', 'distance', 'connect', 'dynamic', 'bgp', 'ospf', 'active']
+SUMMARY_PROPLIST = ','.join(['dst-address', 'gateway', 'type', 'blackhole', 'active', 'disabled'] + PROTOCOLS)
+# Count-only queries of the enabled routes of each protocol, and of all of them
+COUNT_QUERIES = [(protocol, [f'{protocol}=true', 'disabled=false']) for protocol in PROTOCOLS] + [(None, ['disabled=false'])]
+
+def route_protocol(route: dict[str, str]) -> str:
+    for protocol in PROTOCOLS:
+        if route.get(protocol) == 'true':
+            return protocol
+    return 'other'
+
+def route_type(route: dict[str, str]) -> str:
+    # RouterOS 7 has a blackhole flag instead of the type
+    return route.get('type') or ('blackhole' if route.get('blackhole') == 'true' else 'unicast')
+
+def count_request(query: list[str]) -> dict:
+    return {'count-only': '', '.query': query}
+
+def count_result(response) -> int | None:
+    ''' Count of a count-only print, None if the router did not answer with one
+    '''
+    if isinstance(response, list) and len(response) == 1:
+        response = response[0]
+    if isinstance(response, dict) and 'ret' in response:
+        try:
+            return int(response['ret'])
+        except (TypeError, ValueError):
+            return None
+    return None
+
+class BaseRouteCollector(LoadingCollector):
+    ''' Routes of a routing table, one info series per route, or in summary mode route counts and
+        prefix length distributions, aggregated while the routes are decoded so that a full BGP
+        table is never held. Per route series are then kept for the route_detail_prefixes
     '''
+    path: str
+    metric: str
+    summary_metric: str
+
     def __init__(self, router_id: dict[str, str]):
-        self.name = 'RouteCollector'
-        self.metric_store = MetricStore(
-            router_id,
-            ['comment', 'type', 'dst_address', 'gateway', 'distance', 'connect', 'dynamic', 'bgp', 'ospf', 'active'])
+        self.route_store = MetricStore(router_id, ROUTE_LABELS)
+        self.route_store.create_info_metric(self.metric, f'{self.description} Info')
 
-        # Metrics
-        self.metric_store.create_info_metric('routes', 'Routes Info')
+        self.summary_store = MetricStore(router_id, [], ['routes', 'prefix_routes'])
+        self.summary_store.create_gauge_metric(f'{self.summary_metric}_count', f'{self.description} by type, protocol, gateway and active flag',
+                                               'routes', ['type', 'protocol', 'gateway', 'active'])
+        self.summary_store.create_gauge_metric(f'{self.summary_metric}_prefix_length', f'{self.description} by protocol and prefix length',
+                                               'prefix_routes', ['protocol', 'prefix_length'])
+
+        self.metric_store = MetricStoreGroup(self.route_store, self.summary_store)
+        # Cleared when the router does not answer count-only prints
+        self.count_only = True
 
     def load_data(self, router_entry: 'RouterEntry'):
-        route_records = router_entry.rest_api.get('ip/route')
-        self.metric_store.set_metrics(route_records)
+        config_entry = router_entry.config_entry
+        if not config_entry.route_summary:
+            # Full routing tables are too large to hold decoded at once, the routes are decoded as they arrive
+            route_records = router_entry.rest_api.get_stream(self.path, proplist=self.route_store.proplist())
+            self.route_store.set_metrics(route_records)
+            return
+
+        detail_prefixes = set(config_entry.route_detail_prefixes)
+        if config_entry.route_count_only and self.count_only:
+            if self.load_counts(router_entry):
+                if detail_prefixes:
+                    self.load_details(router_entry, detail_prefixes)
+                return
+            self.count_only_unsupported(router_entry)
+
+        self.load_summary(router_entry, detail_prefixes)
+
+    async def load_data_async(self, router_entry: 'RouterEntry'):
+        ''' The count-only queries and detail prefixes are requested concurrently, instead of one load_data replay each
+        '''
+        config_entry = router_entry.config_entry
+        if not (config_entry.route_summary and config_entry.route_count_only and self.count_only):
+            await super().load_data_async(router_entry)
+            return
+
+        rest_api = router_entry.rest_api
+        responses = await asyncio.gather(*(rest_api.post(self.path, 'print', count_request(query)) for _, query in COUNT_QUERIES))
+        if not self.set_counts(responses, rest_api):
+            self.count_only_unsupported(router_entry)
+            await super().load_data_async(router_entry)
+            return
+
+        detail_prefixes = sorted(set(config_entry.route_detail_prefixes))
+        if detail_prefixes:
+            details = await asyncio.gather(*(rest_api.get(self.path, {'dst-address': prefix}, self.route_store.proplist()) for prefix in detail_prefixes))
+            self.route_store.set_metrics([route for routes in details for route in routes])
 
-class IPv6RouteCollector(LoadingCollector):
+    def count_only_unsupported(self, router_entry: 'RouterEntry'):
+        logging.warning('%s: %s count-only prints not supported, counting the transferred routes', router_entry.router_name, self.path)
+        self.count_only = False
+
+    def load_summary(self, router_entry: 'RouterEntry', detail_prefixes: set[str]):
+        ''' Counts the routes in one pass over the streamed table, keeping the detail prefixes
+        '''
+        proplist = SUMMARY_PROPLIST
+        if detail_prefixes:
+            proplist = f'{proplist},{self.route_store.proplist()}'
+
+        counts = Counter()
+        lengths = Counter()
+        details = []
+        for route in router_entry.rest_api.get_stream(self.path, proplist=proplist):
+            if route.get('disabled') == 'true':
+                continue
+            protocol = route_protocol(route)
+            dst_address = route.get('dst-address', '')
+            counts[(route_type(route), protocol, route.get('gateway', ''), route.get('active', 'false'))] += 1
+            lengths[(protocol, dst_address.rpartition('/')[2])] += 1
+            if dst_address in detail_prefixes:
+                details.append(route)
+
+        self.summary_store.set_metrics(
+            [{'type': t, 'protocol': protocol, 'gateway': gateway, 'active': active, 'routes': n} for (t, protocol, gateway, active), n in counts.items()] +
+            [{'protocol': protocol, 'prefix_length': length, 'prefix_routes': n} for (protocol, length), n in lengths.items()])
+        if detail_prefixes:
+            self.route_store.set_metrics(details)
+
+    def load_counts(self, router_entry: 'RouterEntry') -> bool:
+        ''' Counts the enabled routes of each protocol with count-only prints, no route is transferred
+            The type, gateway, active flag and prefix lengths are not available this way, their labels are 'any'
+            False if the router refused the prints or answered with something else than a count
+        '''
+        rest_api = router_entry.rest_api
+        return self.set_counts((rest_api.post(self.path, 'print', count_request(query)) for _, query in COUNT_QUERIES), rest_api)
+
+    def set_counts(self, responses: Iterable, rest_api) -> bool:
+        counts = {}
+        for (protocol, _), response in zip(COUNT_QUERIES, responses):
+            if not response:
+                if not rest_api.backed_off() and rest_api.rejected(f'{self.path}/print'):
+                    return False
+                # Unreachable router or server error, no counts this cycle
+                return True
+            count = count_result(response)
+            if count is None:
+                return False
+            counts[protocol] = count
+
+        # Routes without a protocol flag, counted as 'other' like in the streamed counts
+        total = counts.pop(None)
+        counts['other'] = max(total - sum(counts.values()), 0)
+        self.summary_store.set_metrics([{'type': 'any', 'protocol': protocol, 'gateway': 'any', 'active': 'any', 'routes': count}
+                                        for protocol, count in counts.items() if count])
+        return True
+
+    def load_details(self, router_entry: 'RouterEntry', detail_prefixes: set[str]):
+        details = []
+        for prefix in sorted(detail_prefixes):
+            details.extend(router_entry.rest_api.get(self.path, {'dst-address': prefix}, self.route_store.proplist()))
+        self.route_store.set_metrics(details)
+
+class RouteCollector(BaseRouteCollector):
     ''' IP Route Metrics collector
     '''
+    path = 'ip/route'
+    metric = 'routes'
+    summary_metric = 'route'
+    description = 'Routes'
+
     def __init__(self, router_id: dict[str, str]):
-        self.name = 'IPv6RouteCollector'
-        self.metric_store = MetricStore(
-            router_id,
-            ['comment', 'type', 'dst_address', 'gateway', 'distance', 'connect', 'dynamic', 'bgp', 'ospf', 'active'])
+        self.name = 'RouteCollector'
+        super().__init__(router_id)
 
-        # Metrics
-        self.metric_store.create_info_metric('ipv6_routes', 'IPv6 Routes Info')
+class IPv6RouteCollector(BaseRouteCollector):
+    ''' IP Route Metrics collector
+    '''
+    path = 'ipv6/route'
+    metric = 'ipv6_routes'
+    summary_metric = 'ipv6_route'
+    description = 'IPv6 Routes'
 
-    def load_data(self, router_entry: 'RouterEntry'):
-        route_records = router_entry.rest_api.get('ipv6/route')
-        self.metric_store.set_metrics(route_records)
+    def __init__(self, router_id: dict[str, str]):
+        self.name = 'IPv6RouteCollector'
+        super().__init__(router_id)
@@ -23,6 +23,7 @@ if TYPE_CHECKING:
 class WifiCollector(LoadingCollector):
     ''' Wireless Metrics collector
     '''
+    probe_path = 'interface/wifi'
 
     def __init__(self, router_id: dict[str, str]):
         self.name = 'WifiCollector'
@@ -47,6 +48,8 @@ class WifiCollector(LoadingCollector):
 class WifiClientCollector(LoadingCollector):
     ''' Wireless Metrics collector
     '''
+    probe_path = 'interface/wifi'
+    volatile_metrics = frozenset({'wifi_clients_uptime'})
 
     def __init__(self, router_id: dict[str, str]):
         self.name = 'WifiClientCollector'
@@ -54,7 +57,10 @@ class WifiClientCollector(LoadingCollector):
             router_id,
             ['interface', 'ssid', 'mac_address', 'mac_vendor'],
             ['tx_rate', 'rx_rate', 'rx_signal', 'signal', 'uptime', 'rx_bytes', 'tx_bytes'],
-            resolve_mac_vendor = True)
+            resolve_mac_vendor = True,
+            extra_properties = ['bytes'],
+            derived_properties = ['rx_bytes', 'tx_bytes'],
+            intern_labels = True)
 
         # Metrics
         self.metric_store.create_info_metric('wifi_clients_devices', 'Registered client devices info')
@@ -68,7 +74,7 @@ class WifiClientCollector(LoadingCollector):
         self.metric_store.create_gauge_metric('wifi_clients_tx_rate', 'Client devices TX bitrate', 'tx_rate', ['mac_address'])
 
     def load_data(self, router_entry: 'RouterEntry'):
-        registration_records = router_entry.rest_api.get('interface/wifi/registration-table')
+        registration_records = router_entry.rest_api.get('interface/wifi/registration-table', proplist=self.metric_store.proplist())
         if registration_records:
             for r in registration_records:
                 # Split bytes
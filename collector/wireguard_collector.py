@@ -30,12 +30,13 @@ class WireguardCollector(LoadingCollector):
         self.metric_store.create_info_metric('wireguard_interfaces', 'Wireguard Interfaces')
 
     def load_data(self, router_entry: 'RouterEntry'):
-        recs = router_entry.rest_api.get('interface/wireguard')
+        recs = router_entry.rest_api.get('interface/wireguard', proplist=self.metric_store.proplist())
         self.metric_store.set_metrics(recs)
 
 
 class WireguardPeerCollector(LoadingCollector):
     '''Wireguard collector'''
+    volatile_metrics = frozenset({'wireguard_peer_last_handshake'})
 
     def __init__(self, router_id: dict[str, str]):
         self.name = 'WireguardPeerCollector'
@@ -56,5 +57,5 @@ class WireguardPeerCollector(LoadingCollector):
         self.metric_store.create_counter_metric('wireguard_peer_rx_bytes', 'Wireguard Peer RX Bytes', 'rx', wg_peer_labels)
 
     def load_data(self, router_entry: 'RouterEntry'):
-        recs = router_entry.rest_api.get('interface/wireguard/peers')
+        recs = router_entry.rest_api.get('interface/wireguard/peers', proplist=self.metric_store.proplist())
         self.metric_store.set_metrics(recs)
\ No newline at end of file
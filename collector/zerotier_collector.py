@@ -21,6 +21,8 @@ if TYPE_CHECKING:
 
 class ZeroTierInterfaceCollector(LoadingCollector):
     '''ZeroTier collector'''
+    probe_path = 'zerotier/interface'
+
     def __init__(self, router_id: dict[str, str]):
         self.name = 'ZeroTierInterfaceCollector'
         self.metric_store = MetricStore(
@@ -35,11 +37,13 @@ class ZeroTierInterfaceCollector(LoadingCollector):
         self.metric_store.create_gauge_metric('zerotier_interface', 'ZeroTier Interface', 'running')
 
     def load_data(self, router_entry: 'RouterEntry'):
-        zerotier_interface_records = router_entry.rest_api.get('zerotier/interface')
+        zerotier_interface_records = router_entry.rest_api.get('zerotier/interface', proplist=self.metric_store.proplist())
         self.metric_store.set_metrics(zerotier_interface_records)
 
 class ZeroTierPeerCollector(LoadingCollector):
     '''ZeroTier peer collector'''
+    probe_path = 'zerotier/peer'
+
     def __init__(self, router_id: dict[str, str]):
         self.name = 'ZeroTierPeerCollector'
         self.metric_store = MetricStore(
@@ -48,13 +52,15 @@ class ZeroTierPeerCollector(LoadingCollector):
             ['latency'],
             {
                 'latency': parse_timedelta
-            })
+            },
+            extra_properties = ['path'],
+            derived_properties = ['preferred_endpoint'])
 
         # Metrics
         self.metric_store.create_gauge_metric('zerotier_peer_latency', 'ZeroTier Peer Latency', 'latency')
 
     def load_data(self, router_entry: 'RouterEntry'):
-        zerotier_peer_records = router_entry.rest_api.get('zerotier/peer')
+        zerotier_peer_records = router_entry.rest_api.get('zerotier/peer', proplist=self.metric_store.proplist())
         for peer in zerotier_peer_records:
             path = peer.get('path', '').split(',')
             for i, x in enumerate(path):
@@ -66,6 +72,8 @@ class ZeroTierPeerCollector(LoadingCollector):
 
 class ZeroTierControllerCollector(LoadingCollector):
     '''ZeroTier collector'''
+    probe_path = 'zerotier/controller/member'
+
     def __init__(self, router_id: dict[str, str]):
         self.name = 'ZeroTierControllerCollector'
         self.metric_store = MetricStore(
@@ -80,5 +88,5 @@ class ZeroTierControllerCollector(LoadingCollector):
         self.metric_store.create_gauge_metric('zerotier_controller_member_last_seen', 'ZeroTier Controller Member Last Seen', 'last_seen')
 
     def load_data(self, router_entry: 'RouterEntry'):
-        zerotier_controller_member_records = router_entry.rest_api.get('zerotier/controller/member')
+        zerotier_controller_member_records = router_entry.rest_api.get('zerotier/controller/member', proplist=self.metric_store.proplist())
         self.metric_store.set_metrics(zerotier_controller_member_records)
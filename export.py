@@ -12,20 +12,36 @@
 ## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
 ## GNU General Public License for more details.
 
-from prometheus_client.core import REGISTRY
-from prometheus_client import start_http_server
+from functools import partial
 from sched import scheduler
-from signal import signal, SIGTERM, SIGINT
+from signal import signal, SIGTERM, SIGINT, SIG_IGN
 from time import time, sleep
 
+from prometheus_client.core import REGISTRY
+from prometheus_client import GC_COLLECTOR, PLATFORM_COLLECTOR, PROCESS_COLLECTOR
+
+from collector.internal_collector import InternalCollector
+from flow.async_scheduler import AsyncScheduler
 from flow.collector_registry import CollectorRegistry, SystemCollectorRegistry
+from flow.exposition import SnapshotRegistry, SYSTEM_GROUP, start_http_server
+from flow.on_demand import OnDemandLoader
+from flow.phase import phase_start, warmup_time
+from flow.poll_executor import PollExecutor, due_collectors, router_labels
+from flow.remote_write import RemoteWriter
 from flow.router_entry import RouterEntry
+from flow.sharding import Sharding
+from flow.supervisor import Supervisor, SnapshotPublisher
 from cli.config import config_handler, ConfigKeys
 from cli.options import OptionsParser
+from utils.mac_vendor import mac_vendors
 
 import logging
+import os
 import sys
 
+# Labels of the collector load metrics
+LOAD_LABELS = ['name', ConfigKeys.ROUTERBOARD_NAME, ConfigKeys.ROUTERBOARD_ADDRESS]
+
 class ExportProcessor:
     ''' Base Export Processing
     '''
@@ -35,10 +51,16 @@ class ExportProcessor:
 
         self.option_parser = OptionsParser()
         self.registries = []
+        self.snapshots: SnapshotRegistry | None = None
         self.s = scheduler(time, sleep)
 
         self.server = None
         self.thr = None
+        self.executor = None
+        self.async_scheduler = None
+        self.supervisor = None
+        self.on_demand = None
+        self.remote_writer = None
 
     def exit_gracefully(self, signal, _):
         logging.warning(f"Caught signal {signal}, stopping")
@@ -46,6 +68,21 @@ class ExportProcessor:
             logging.warning(f'Cancelling scheduler job')
             self.s.cancel(j)
 
+        if self.async_scheduler:
+            self.async_scheduler.stop()
+
+        if self.supervisor:
+            logging.info(f'Shut Down worker processes')
+            self.supervisor.stop()
+
+        if self.executor:
+            logging.info(f'Shut Down collector workers')
+            self.executor.shutdown()
+
+        if self.remote_writer:
+            logging.info(f'Shut Down remote write')
+            self.remote_writer.stop()
+
         logging.info(f'Shut Down HTTP server')
         if self.server:
             self.server.shutdown()
@@ -59,52 +96,171 @@ class ExportProcessor:
     def start(self):
         self.option_parser.parse_options()
 
-        self._router_entries = {}
-        start_time = round(time(), -1)
+        start_time = time()
 
         system_config = config_handler.system_entry()
-        system_collector_registry = SystemCollectorRegistry(system_config, ['name', ConfigKeys.ROUTERBOARD_NAME, ConfigKeys.ROUTERBOARD_ADDRESS])
+        if system_config.oui_index:
+            mac_vendors.set_index_path(system_config.oui_index)
+
+        system_collector_registry = SystemCollectorRegistry(system_config, LOAD_LABELS)
         self.internal_collector = system_collector_registry.interal_collector
+        self.snapshots = SnapshotRegistry(internal_collector=self.internal_collector)
+        self.create_remote_writer(system_config)
+        self.create_scheduler(system_config)
+
+        router_names = self.enabled_routers()
+        if system_config.shard_count > 1 or system_config.shard_members:
+            router_names = self.shard_routers(router_names, system_config)
+
+        processes = min(system_config.worker_processes, len(router_names))
+        if processes > 1:
+            logging.info('Polling %i routers in %i worker processes', len(router_names), processes)
+            worker = partial(run_worker, config_handler.data_path, logging.getLogger().level)
+            self.supervisor = Supervisor(worker, router_names, processes, self.snapshots, self.internal_collector)
+            self.supervisor.start()
+            if system_config.on_demand:
+                logging.warning('On demand loading is not available with worker processes, polling the routers on their intervals')
+        else:
+            if system_config.on_demand:
+                logging.info('Loading the collectors on demand, deadline %i seconds', system_config.on_demand_deadline)
+                submit = self.async_scheduler.submit if self.async_scheduler else self.executor.submit
+                self.on_demand = OnDemandLoader(submit, system_config.on_demand_deadline, self.internal_collector)
+                self.snapshots.on_demand = self.on_demand
+            self.schedule_routers(router_names, system_config, start_time)
 
-        for router_name in config_handler.registered_entries():
-            router = RouterEntry(router_name)
-            if not router.config_entry.enabled:
-                logging.info('%s: Skipping disabled router', router_name)
-                continue
+        interval = system_collector_registry.interval
+        for c in system_collector_registry.system_collectors:
+            logging.info('Adding System Collector %s', c.name)
+            self.snapshots.register(c, group=SYSTEM_GROUP)
 
-            registry = CollectorRegistry(router)
-            self.registries.append(registry)
+        if self.async_scheduler:
+            self.async_scheduler.add_job(None, system_collector_registry.system_collectors, interval, time(), 3)
+        else:
+            self.run_collectors(None, system_collector_registry.system_collectors, interval, start_time, 3)
 
-            interval = registry.router_entry.config_entry.polling_interval
-            self.s.enterabs(start_time + interval, 1, self.run_collectors, argument=(router, registry.fast_collectors, interval, start_time, 1))
-            #self.run_collectors(router, registry.fast_collectors, interval, start_time, 1)
+        logging.info('Running HTTP metrics server on address %s port %i', system_config.export_address, system_config.export_port)
 
-            slow_interval = registry.router_entry.config_entry.slow_polling_interval
-            self.s.enterabs(start_time + interval, 2, self.run_collectors, argument=(router, registry.slow_collectors, slow_interval, start_time, 2))
-            #self.run_collectors(router, registry.slow_collectors, slow_interval, start_time, 2)
+        self.server, self.thr = start_http_server(system_config.export_port, system_config.export_address, self.snapshots)
 
-            for c in registry.fast_collectors:
-                logging.info('%s: Adding Fast Collector %s', router.router_name, c.name)
-                REGISTRY.register(c)
+        self.run()
+        # Without system collectors the scheduler is done right away, the workers and scrapes go on
+        while self.thr.is_alive():
+            self.thr.join(1)
 
-            for c in registry.slow_collectors:
-                logging.info('%s: Adding Slow Collector %s', router.router_name, c.name)
-                REGISTRY.register(c)
+        logging.info(f'Shut Down Done')
 
-        interval = system_collector_registry.interval
-        for c in system_collector_registry.system_collectors:
-            logging.info('Adding System Collector %s', c.name)
-            REGISTRY.register(c)
+    def start_worker(self, index, router_names, conn):
+        ''' Polls a share of the routers in a worker process, sending the snapshots to the supervisor
+        '''
+        start_time = time()
 
-        self.run_collectors(None, system_collector_registry.system_collectors, interval, start_time, 3)
+        system_config = config_handler.system_entry()
+        if system_config.oui_index:
+            mac_vendors.set_index_path(system_config.oui_index)
 
-        logging.info('Running HTTP metrics server on address %s port %i', system_config.export_address, system_config.export_port)
+        # The supervisor exports the process metrics, a worker only sends its internal metrics
+        for c in (PROCESS_COLLECTOR, PLATFORM_COLLECTOR, GC_COLLECTOR):
+            REGISTRY.unregister(c)
 
-        self.server, self.thr = start_http_server(port=system_config.export_port, addr=system_config.export_address)
+        self.internal_collector = InternalCollector(LOAD_LABELS)
+        self.snapshots = SnapshotRegistry(internal_collector=self.internal_collector)
+        self.create_remote_writer(system_config, str(index))
+        self.create_scheduler(system_config)
+        self.schedule_routers(router_names, system_config, start_time)
 
-        self.s.run()
+        SnapshotPublisher(self.snapshots, conn).start()
+        self.run()
 
-        logging.info(f'Shut Down Done')
+    def enabled_routers(self) -> list[str]:
+        router_names = []
+        for router_name in config_handler.registered_entries():
+            if not config_handler.config_entry(router_name).enabled:
+                logging.info('%s: Skipping disabled router', router_name)
+                continue
+            router_names.append(router_name)
+        return router_names
+
+    def shard_routers(self, router_names, system_config) -> list[str]:
+        ''' The routers of the shard of this instance, exports the assignment of all routers
+        '''
+        try:
+            sharding = Sharding(system_config.shard_index, system_config.shard_count, system_config.shard_members, system_config.shard_member)
+        except ValueError as exc:
+            logging.error('Invalid sharding config: %s', exc)
+            sys.exit(1)
+
+        shard_routers = []
+        for router_name in router_names:
+            shard = sharding.owner(router_name)
+            owned = shard == sharding.shard
+            self.internal_collector.set_router_shard({
+                ConfigKeys.ROUTERBOARD_NAME: router_name,
+                ConfigKeys.ROUTERBOARD_ADDRESS: config_handler.config_entry(router_name).hostname,
+            }, shard, owned)
+            if owned:
+                shard_routers.append(router_name)
+
+        logging.info('Shard %s of %i: polling %i of %i routers', sharding.shard, len(sharding.shards), len(shard_routers), len(router_names))
+        return shard_routers
+
+    def create_remote_writer(self, system_config, worker=''):
+        ''' Pushes the samples of every load to the remote write endpoint, when configured
+        '''
+        if not system_config.remote_write_url:
+            return
+
+        logging.info('Pushing the samples to %s, at most %i sends at a time', system_config.remote_write_url, system_config.remote_write_max_sends)
+        spill_dir = system_config.remote_write_spill_dir
+        if spill_dir and worker:
+            # Every process has its own spill files
+            spill_dir = os.path.join(spill_dir, f'worker-{worker}')
+        self.remote_writer = RemoteWriter(system_config.remote_write_url, system_config.remote_write_max_sends, system_config.remote_write_batch_size,
+                                          system_config.remote_write_flush_interval, system_config.remote_write_queue_size,
+                                          spill_dir, system_config.remote_write_spill_size * 1024 * 1024,
+                                          system_config.remote_write_timeout, self.internal_collector,
+                                          system_config.remote_write_username, system_config.remote_write_password, worker)
+        self.remote_writer.start()
+
+    def create_scheduler(self, system_config):
+        after_load = self.remote_writer.write if self.remote_writer else None
+        if system_config.async_mode:
+            logging.info('Running collectors on the asyncio event loop')
+            self.async_scheduler = AsyncScheduler(self.internal_collector, system_config.max_workers, after_load)
+        else:
+            self.executor = PollExecutor(self.internal_collector, system_config.max_workers, after_load)
+
+    def schedule_routers(self, router_names, system_config, start_time):
+        backoff_settings = (system_config.initial_delay_on_failure, system_config.max_delay_on_failure, system_config.delay_inc_div)
+        for router_name in router_names:
+            router = RouterEntry(router_name, system_config.async_mode, self.internal_collector, backoff_settings)
+            registry = CollectorRegistry(router, self.snapshots)
+            self.registries.append(registry)
+
+            interval = registry.router_entry.config_entry.polling_interval
+            self.schedule(router, registry.fast_collectors, interval, start_time, 1)
+
+            slow_interval = registry.router_entry.config_entry.slow_polling_interval
+            self.schedule(router, registry.slow_collectors, slow_interval, start_time, 2)
+
+    def run(self):
+        if self.async_scheduler:
+            self.async_scheduler.run(forever=self.on_demand is not None)
+        else:
+            self.s.run()
+
+    def schedule(self, router_entry, collectors, interval, start_time, priority):
+        if self.on_demand:
+            # The interval is the freshness TTL of the scraped collectors
+            self.on_demand.add_group(router_entry, collectors, interval, priority)
+            return
+
+        # A staggered warm-up load, then the loads at the phase of the router group
+        first_run = warmup_time(router_entry.router_name, priority, start_time)
+        phase = phase_start(router_entry.router_name, priority, interval, start_time)
+        if self.async_scheduler:
+            self.async_scheduler.add_job(router_entry, collectors, interval, first_run, priority, phase)
+        else:
+            self.s.enterabs(first_run, priority, self.run_collectors, argument=(router_entry, collectors, interval, phase, priority))
 
     def run_collectors(self, router_entry, collectors, interval, start_time, priority):
         next_run = start_time + interval
@@ -114,27 +270,21 @@ class ExportProcessor:
         self.s.enterabs(next_run, priority, self.run_collectors, argument=(router_entry, collectors, interval, next_run, priority))
 
         logging.debug('Starting data load, polling interval set to: %i', interval)
-        logged_skip = False
-
-        for c in collectors:
-            internal_labels = {'name': c.name, ConfigKeys.ROUTERBOARD_ADDRESS: '', ConfigKeys.ROUTERBOARD_NAME: ''}
-            if router_entry:
-                internal_labels.update(router_entry.router_id)
-
-            logging.debug('Running %s', c.name)
-
-            try:
-                with self.internal_collector.time(internal_labels), self.internal_collector.count_exceptions(internal_labels):
-                    c.load(router_entry)
-                self.internal_collector.inc_load_count(internal_labels)
-            except Exception as e:
-                if str(e) == 'retry_timer_skip':
-                    if not logged_skip:
-                        logging.error("Skipping Load because of previous error")
-                        logged_skip = True
-                    continue
-                logging.error(f'Catched exception while loading: {e}')
-            self.internal_collector.set_last_run(internal_labels)
+        if not self.executor.submit(router_entry, due_collectors(router_entry, collectors), priority):
+            router_name = router_entry.router_name if router_entry else 'System'
+            logging.warning('%s: Previous load still running, skipping this cycle', router_name)
+            self.internal_collector.count_skipped_load(router_labels(router_entry))
+
+def run_worker(data_path, loglevel, index, router_names, conn):
+    ''' Entry point of a worker process of the supervisor
+    '''
+    logging.basicConfig(format=f'%(levelname)s worker {index}: %(message)s', level=loglevel)
+    config_handler(data_path)
+
+    processor = ExportProcessor()
+    # Interrupts go to the supervisor, which stops the workers
+    signal(SIGINT, SIG_IGN)
+    processor.start_worker(index, router_names, conn)
 
 if __name__ == '__main__':
     ExportProcessor().start()
@@ -0,0 +1,60 @@
+# coding=utf8
+## Copyright (c) 2020 Arseniy Kuznetsov
+## Copyright (c) 2024 Martti Anttila
+##
+## This program is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License
+## as published by the Free Software Foundation; either version 2
+## of the License, or (at your option) any later version.
+##
+## This program is distributed in the hope that it will be useful,
+## but WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+## GNU General Public License for more details.
+
+import math
+
+# Share of its interval a collector may spend loading, slower collectors are polled less often
+LOAD_BUDGET = 0.1
+
+class AdaptiveInterval:
+    ''' Polling interval of a collector, a multiple of its group interval
+
+        The collector is loaded every cycles-th run of its group. A load leaving the series
+        unchanged doubles the cycles, a changed one halves them, but never below what keeps the
+        load time within LOAD_BUDGET of the interval, nor outside the configured bounds
+    '''
+    def __init__(self, group_interval: int, min_interval: int, max_interval: int):
+        self.group_interval = max(group_interval, 1)
+        self.min_cycles = max(math.ceil(min_interval / self.group_interval), 1)
+        self.max_cycles = max(max_interval // self.group_interval, self.min_cycles)
+        self.cycles = self.min_cycles
+        self.countdown = 0
+        self.checksum: int | None = None
+
+    @property
+    def interval(self) -> int:
+        return self.cycles * self.group_interval
+
+    def tick(self) -> bool:
+        ''' Called on every run of the group, True if the collector is due
+            Stays due until started, a skipped run does not push the load back
+        '''
+        self.countdown -= 1
+        return self.countdown <= 0
+
+    def started(self):
+        self.countdown = self.cycles
+
+    def update(self, load_time: float, checksum: int):
+        ''' Adapts the interval to a successful load, checksum of its series
+        '''
+        changed = checksum != self.checksum
+        self.checksum = checksum
+
+        previous = self.cycles
+        cycles = previous // 2 if changed else previous * 2
+        cost_cycles = math.ceil(load_time / (LOAD_BUDGET * self.group_interval))
+        self.cycles = min(max(cycles, cost_cycles, self.min_cycles), self.max_cycles)
+        # The new interval counts from the start of this load
+        self.countdown += self.cycles - previous
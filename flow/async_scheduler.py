@@ -0,0 +1,159 @@
+# coding=utf8
+## Copyright (c) 2020 Arseniy Kuznetsov
+## Copyright (c) 2024 Martti Anttila
+##
+## This program is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License
+## as published by the Free Software Foundation; either version 2
+## of the License, or (at your option) any later version.
+##
+## This program is distributed in the hope that it will be useful,
+## but WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+## GNU General Public License for more details.
+
+import asyncio
+import logging
+
+from collections.abc import Callable
+from time import time
+
+from flow.poll_executor import CollectorLoad, LoadBatch, SYSTEM_QUEUE, due_collectors, router_labels
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from flow.router_entry import RouterEntry
+    from collector.metric_store import LoadingCollector
+    from collector.internal_collector import InternalCollector
+
+class AsyncScheduler:
+    ''' Event loop replacement for the sched loop and the worker pool
+        Every collector group of every router is a task on a single event loop,
+        loads share a global and a per-router concurrency limit
+    '''
+    def __init__(self, internal_collector: 'InternalCollector', max_concurrency: int, after_load: Callable | None = None):
+        self.internal_collector = internal_collector
+        self.after_load = after_load
+        self.max_concurrency = max(max_concurrency, 1)
+        self.jobs: list[tuple['RouterEntry | None', list['LoadingCollector'], int, float, int, float]] = []
+
+        self.running_batches: set[tuple[str, int]] = set()
+        self.router_batches: dict[str, int] = {}
+        self.tasks: set[asyncio.Task] = set()
+        self.loop: asyncio.AbstractEventLoop | None = None
+        self.main_task: asyncio.Task | None = None
+        # Routers loaded through submit, their sessions are closed with the loop
+        self.submitted_routers: set['RouterEntry'] = set()
+
+    def add_job(self, router_entry: 'RouterEntry | None', collectors: list['LoadingCollector'], interval: int, first_run: float, group: int, phase: float | None = None):
+        ''' Runs the collectors at first_run, then every interval from phase, by default from first_run
+        '''
+        self.jobs.append((router_entry, collectors, interval, first_run, group, first_run if phase is None else phase))
+
+    def run(self, forever: bool = False):
+        ''' Runs the jobs, with forever until stopped, for loads started through submit
+        '''
+        asyncio.run(self._main(forever))
+
+    def submit(self, router_entry: 'RouterEntry', collectors: list['LoadingCollector'], group: int, done: Callable[[], None]):
+        ''' Starts a load of the collectors from another thread
+            done is called on the event loop once the load has finished
+        '''
+        if not self.loop:
+            done()
+            return
+        self.loop.call_soon_threadsafe(self._submit, router_entry, collectors, group, done)
+
+    def _submit(self, router_entry: 'RouterEntry', collectors: list['LoadingCollector'], group: int, done: Callable[[], None]):
+        key = (router_entry.router_name, group)
+        if key in self.running_batches:
+            done()
+            return
+
+        self.submitted_routers.add(router_entry)
+        self.running_batches.add(key)
+        task = asyncio.create_task(self._run_batch(LoadBatch(key, router_entry, len(collectors), done), collectors))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    def stop(self):
+        if self.loop and self.main_task:
+            self.loop.call_soon_threadsafe(self.main_task.cancel)
+
+    async def _main(self, forever: bool):
+        self.global_limit = asyncio.Semaphore(self.max_concurrency)
+        self.router_limits: dict[str, asyncio.Semaphore] = {}
+        self.loop = asyncio.get_running_loop()
+        self.main_task = asyncio.current_task()
+
+        loops = [self._job_loop(*job) for job in self.jobs]
+        if forever:
+            loops.append(self.loop.create_future())
+
+        try:
+            await asyncio.gather(*loops)
+        except asyncio.CancelledError:
+            logging.info('Event loop scheduler stopped')
+        finally:
+            for router_entry in {job[0] for job in self.jobs if job[0]} | self.submitted_routers:
+                await router_entry.rest_api.close()
+
+    async def _job_loop(self, router_entry: 'RouterEntry | None', collectors: list['LoadingCollector'], interval: int, first_run: float, group: int, next_run: float):
+        # The collectors of a router may be empty until its capability probe has run
+        key = (router_entry.router_name if router_entry else SYSTEM_QUEUE, group)
+        await asyncio.sleep(max(first_run - time(), 0))
+        while True:
+            logging.debug('Starting data load, polling interval set to: %i', interval)
+            self._start_batch(key, router_entry, collectors)
+
+            while next_run <= time():
+                next_run += interval
+            await asyncio.sleep(max(next_run - time(), 0))
+
+    def _start_batch(self, key: tuple[str, int], router_entry: 'RouterEntry | None', collectors: list['LoadingCollector']):
+        due = due_collectors(router_entry, collectors)
+        if not due:
+            return
+
+        if key in self.running_batches:
+            router_name = router_entry.router_name if router_entry else 'System'
+            logging.warning('%s: Previous load still running, skipping this cycle', router_name)
+            self.internal_collector.count_skipped_load(router_labels(router_entry))
+            return
+
+        self.running_batches.add(key)
+        task = asyncio.create_task(self._run_batch(LoadBatch(key, router_entry, len(due)), due))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def _run_batch(self, batch: LoadBatch, collectors: list['LoadingCollector']):
+        router_key = batch.key[0]
+        self.router_batches[router_key] = self.router_batches.get(router_key, 0) + 1
+        try:
+            await asyncio.gather(*(self._load(batch, c) for c in collectors))
+        finally:
+            self.running_batches.discard(batch.key)
+            self.router_batches[router_key] -= 1
+            if not self.router_batches[router_key] and batch.router_entry:
+                batch.router_entry.end_cycle()
+            if batch.done:
+                batch.done()
+
+    async def _load(self, batch: LoadBatch, c: 'LoadingCollector'):
+        router_entry = batch.router_entry
+        async with self._router_limit(router_entry), self.global_limit:
+            with CollectorLoad(self.internal_collector, batch, c, self.after_load):
+                if router_entry:
+                    await c.load_async(router_entry)
+                else:
+                    # System collectors do not talk to a router, keep their blocking io off the loop
+                    await asyncio.to_thread(c.load, router_entry)
+
+    def _router_limit(self, router_entry: 'RouterEntry | None') -> asyncio.Semaphore:
+        key = router_entry.router_name if router_entry else SYSTEM_QUEUE
+        limit = self.router_limits.get(key)
+        if not limit:
+            limit = asyncio.Semaphore(max(router_entry.config_entry.max_workers_per_router, 1) if router_entry else 1)
+            self.router_limits[key] = limit
+        return limit
@@ -0,0 +1,52 @@
+# coding=utf8
+## Copyright (c) 2020 Arseniy Kuznetsov
+## Copyright (c) 2024 Martti Anttila
+##
+## This program is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License
+## as published by the Free Software Foundation; either version 2
+## of the License, or (at your option) any later version.
+##
+## This program is distributed in the hope that it will be useful,
+## but WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+## GNU General Public License for more details.
+
+import random
+
+# Delays are spread by up to this share, so routers failing together do not retry together
+JITTER = 0.1
+
+class Backoff:
+    ''' Exponential backoff after successive failures of a router or an endpoint
+
+        The delay starts at initial_delay and doubles every inc_div failures,
+        up to max_delay: initial_delay * 2 ** ((failures - 1) / inc_div)
+    '''
+    def __init__(self, initial_delay: float, max_delay: float, inc_div: int):
+        self.initial_delay = initial_delay
+        self.max_delay = max(max_delay, initial_delay)
+        self.inc_div = max(inc_div, 1)
+        self.failures = 0
+        self.delay: float = 0
+        self.retry_at: float = 0
+
+    def blocked(self, now: float) -> bool:
+        return now < self.retry_at
+
+    def failure(self, now: float) -> bool:
+        ''' Backs off after a failure, False if already backing off
+            Concurrent requests failing together count once
+        '''
+        if self.blocked(now):
+            return False
+        self.failures += 1
+        delay = min(self.initial_delay * 2 ** ((self.failures - 1) / self.inc_div), self.max_delay)
+        self.delay = min(delay * random.uniform(1 - JITTER, 1 + JITTER), self.max_delay)
+        self.retry_at = now + self.delay
+        return True
+
+    def success(self):
+        self.failures = 0
+        self.delay = 0
+        self.retry_at = 0
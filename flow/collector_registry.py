@@ -41,12 +41,15 @@ from collector.bgp_collector import BGPCollector
 from collector.arp_collector import ARPCollector
 from collector.zerotier_collector import ZeroTierInterfaceCollector, ZeroTierPeerCollector, ZeroTierControllerCollector
 
+from collector.capability_probe import CapabilityProbe
 from collector.latest_version import LatestVersionCollector
 from collector.internal_collector import InternalCollector
+from flow.adaptive_interval import AdaptiveInterval
 
 from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
+    from flow.exposition import SnapshotRegistry
     from flow.router_entry import RouterEntry
     from collector.metric_store import LoadingCollector
 
@@ -94,30 +97,90 @@ class CollectorRegistry:
         'zerotier_controller': ZeroTierControllerCollector,
     }
 
-    def __init__(self, router_entry: 'RouterEntry') -> None:
+    def __init__(self, router_entry: 'RouterEntry', snapshots: 'SnapshotRegistry | None' = None) -> None:
         self.router_entry = router_entry
+        self.snapshots = snapshots
         self.polling_interval = router_entry.config_entry.polling_interval
         self.slow_polling_interval = router_entry.config_entry.slow_polling_interval
 
-        router_id = router_entry.router_id
+        # The scheduler holds on to these lists, update changes them in place
         self.fast_collectors: list[LoadingCollector] = []
         self.slow_collectors: list[LoadingCollector] = []
-
-        for key in router_entry.config_entry.collectors:
-            cls = self.collector_mapping.get(key)
-            if not cls:
-                logging.warning('Fast Collector not found: %s ignoring', key)
-                continue
-
-            self.fast_collectors.append(cls(router_id))
-
-        for key in router_entry.config_entry.slow_collectors:
-            cls = self.collector_mapping.get(key)
-            if not cls:
-                logging.warning('Slow Collector not found: %s ignoring', key)
-                continue
-
-            self.slow_collectors.append(cls(router_id))
+        self.groups = [
+            ('Fast', self.fast_collectors, self.polling_interval, router_entry.config_entry.collectors),
+            ('Slow', self.slow_collectors, self.slow_polling_interval, router_entry.config_entry.slow_collectors),
+        ]
+
+        # Configured collectors: (group, position in the group config) -> class, and the ones created
+        self.configured: dict[tuple[int, int], type] = {}
+        self.created: dict[tuple[int, int], LoadingCollector] = {}
+        for group, (kind, _, _, keys) in enumerate(self.groups):
+            for position, key in enumerate(keys):
+                cls = self.collector_mapping.get(key)
+                if not cls:
+                    logging.warning('%s Collector not found: %s ignoring', kind, key)
+                    continue
+                self.configured[(group, position)] = cls
+
+        # Collectors of optional packages wait for the capability probe, unless probing is off
+        self.probe: CapabilityProbe | None = None
+        self.supported: dict[str, bool] = {}
+        probe_paths = sorted({cls.probe_path for cls in self.configured.values() if cls.probe_path})
+        if probe_paths and router_entry.config_entry.probe_interval > 0:
+            self.probe = CapabilityProbe(router_entry.router_id, probe_paths, router_entry.config_entry.probe_interval, self.apply_probe)
+            self.probe.group_interval = self.slow_polling_interval
+            self.register(self.probe, 1)
+
+        self.update()
+
+    def available(self, cls) -> bool:
+        return not self.probe or not cls.probe_path or self.supported.get(cls.probe_path, False)
+
+    def apply_probe(self, supported: dict[str, bool]):
+        ''' Called by the capability probe with the paths found on the router
+        '''
+        self.supported = supported
+        self.update()
+
+    def update(self):
+        ''' Creates the collectors available on the router and drops the ones no longer available
+        '''
+        router_id = self.router_entry.router_id
+        for group, (kind, collectors, interval, _) in enumerate(self.groups):
+            current = [self.probe] if self.probe and group == 1 else []
+            for slot, cls in self.configured.items():
+                if slot[0] != group:
+                    continue
+
+                collector = self.created.get(slot)
+                if self.available(cls):
+                    if not collector:
+                        collector = self.created[slot] = self.create(cls, router_id, interval)
+                        logging.info('%s: Adding %s Collector %s', self.router_entry.router_name, kind, collector.name)
+                        self.register(collector, group)
+                    current.append(collector)
+                elif collector:
+                    logging.info('%s: Removing %s Collector %s, %s not found on the router', self.router_entry.router_name, kind, collector.name, cls.probe_path)
+                    del self.created[slot]
+                    if self.snapshots:
+                        self.snapshots.unregister(collector)
+
+            # Slice assignment, the scheduler threads see either the old or the new collectors
+            collectors[:] = current
+
+    def register(self, collector: 'LoadingCollector', group: int):
+        if self.snapshots:
+            self.snapshots.register(collector, self.router_entry.router_name, self.groups[group][0].lower())
+
+    def create(self, cls, router_id: dict[str, str], group_interval: int) -> 'LoadingCollector':
+        collector = cls(router_id)
+        collector.group_interval = group_interval
+        collector.use_label_dictionary(self.router_entry.label_dictionary)
+        config_entry = self.router_entry.config_entry
+        if config_entry.adaptive_polling:
+            collector.adaptive_interval = AdaptiveInterval(group_interval, config_entry.adaptive_min_interval, config_entry.adaptive_max_interval)
+            collector.volatile_metrics = collector.volatile_metrics | frozenset(config_entry.adaptive_volatile_metrics)
+        return collector
 
 
 class SystemCollectorRegistry:
@@ -0,0 +1,281 @@
+# coding=utf8
+## Copyright (c) 2020 Arseniy Kuznetsov
+## Copyright (c) 2024 Martti Anttila
+##
+## This program is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License
+## as published by the Free Software Foundation; either version 2
+## of the License, or (at your option) any later version.
+##
+## This program is distributed in the hope that it will be useful,
+## but WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+## GNU General Public License for more details.
+
+import hashlib
+import socket
+import struct
+import threading
+import time
+import zlib
+
+from prometheus_client.core import REGISTRY
+from prometheus_client.exposition import CONTENT_TYPE_PLAIN_0_0_4, ThreadingWSGIServer, generate_latest, gzip_accepted, make_wsgi_app
+from prometheus_client.registry import Collector
+from urllib.parse import parse_qs
+from wsgiref.simple_server import WSGIRequestHandler, make_server
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collector.metric_store import LoadingCollector
+    from collector.internal_collector import InternalCollector
+    from flow.on_demand import OnDemandLoader
+
+# gzip header: magic, deflate, no flags, no mtime, no extra flags, unknown os
+GZIP_HEADER = b'\x1f\x8b\x08\x00\x00\x00\x00\x00\x00\xff'
+
+# Collector groups served on /metrics/<group>, by their group number in the schedulers
+GROUPS = {'fast': 1, 'slow': 2, 'system': 3}
+# The group also serving the prometheus client REGISTRY
+SYSTEM_GROUP = 'system'
+
+class Snapshot:
+    ''' Text exposition of a collector, rendered once per load
+
+        The deflate stream is compressed on the first gzip scrape and ends in
+        a sync flush, so the streams of all snapshots join into one gzip member
+    '''
+    __slots__ = ('text', 'created', '_deflated')
+
+    def __init__(self, text: bytes = b''):
+        self.text = text
+        # Load timestamp, the ETags of the scrapes are derived from it
+        self.created = time.time_ns()
+        self._deflated: bytes | None = None
+
+    def deflated(self) -> bytes:
+        # Concurrent scrapes may both compress, either result is valid
+        if self._deflated is None:
+            compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -zlib.MAX_WBITS)
+            self._deflated = compressor.compress(self.text) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        return self._deflated
+
+EMPTY_SNAPSHOT = Snapshot()
+
+class SnapshotRegistry:
+    ''' Serves scrapes from the pre-rendered snapshots of the loading collectors
+        Collectors of the prometheus client REGISTRY (internal and process metrics) are rendered per scrape
+
+        The collectors of a router are also registered in a registry of their own,
+        its target, which serves the /probe?target= scrapes of the router, and
+        in the registry of their group, serving /metrics/<group>
+    '''
+    def __init__(self, registry: Collector | None = REGISTRY, internal_collector: 'InternalCollector | None' = None, groups: dict[str, int] = GROUPS):
+        self.registry = registry
+        self.internal_collector = internal_collector
+        self.collectors: list['LoadingCollector'] = []
+        self.targets: dict[str, SnapshotRegistry] = {}
+        self.groups = {group: SnapshotRegistry(registry if group == SYSTEM_GROUP else None, internal_collector, {}) for group in groups}
+        self.lock = threading.Lock()
+        # Set in on demand mode, scrapes load the stale collectors first
+        self.on_demand: 'OnDemandLoader | None' = None
+
+    def register(self, collector: 'LoadingCollector', target: str | None = None, group: str | None = None):
+        with self.lock:
+            self.collectors.append(collector)
+            if target:
+                if target not in self.targets:
+                    self.targets[target] = SnapshotRegistry(None, groups={})
+                self.targets[target].collectors.append(collector)
+            if group:
+                self.groups[group].collectors.append(collector)
+
+    def unregister(self, collector: 'LoadingCollector'):
+        # New lists, scrapes may be reading the current ones
+        with self.lock:
+            for registry in [self, *self.targets.values(), *self.groups.values()]:
+                if collector in registry.collectors:
+                    registry.collectors = [c for c in registry.collectors if c is not collector]
+
+    def refresh(self, target: str | None = None, group: str | None = None):
+        if self.on_demand:
+            self.on_demand.refresh(target, GROUPS[group] if group else None)
+
+    def render(self, gzip: bool = False) -> bytes:
+        return self.scrape(gzip)[2]
+
+    def scrape(self, gzip: bool = False, if_none_match: str | None = None) -> tuple[str | None, int, bytes | None]:
+        ''' ETag, max-age and body of a scrape, the body is None when the ETag is one of if_none_match
+            The live metrics of the registry change with every scrape, with them there is no ETag nor max-age
+        '''
+        start = time.perf_counter()
+        collectors = self.collectors
+        snapshots = [c.snapshot for c in collectors]
+        if self.registry:
+            live = generate_latest(self.registry)
+            etag = None
+            max_age = 0
+        else:
+            live = b''
+            etag = scrape_etag(snapshots, gzip)
+            max_age = snapshots_max_age(collectors, snapshots)
+            if if_none_match and etag_matches(if_none_match, etag):
+                return etag, max_age, None
+
+        output = self._render(live, snapshots, gzip)
+        if self.internal_collector:
+            self.internal_collector.observe_scrape_render('gzip' if gzip else 'identity', time.perf_counter() - start)
+        return etag, max_age, output
+
+    def _render(self, live: bytes, snapshots: list[Snapshot], gzip: bool) -> bytes:
+        if not gzip:
+            return b''.join([live] + [s.text for s in snapshots])
+
+        # One gzip member: the snapshot deflate streams followed by the finished live stream
+        crc = 0
+        size = 0
+        body = [GZIP_HEADER]
+        for s in snapshots:
+            crc = zlib.crc32(s.text, crc)
+            size += len(s.text)
+            body.append(s.deflated())
+
+        compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -zlib.MAX_WBITS)
+        body.append(compressor.compress(live) + compressor.flush())
+        crc = zlib.crc32(live, crc)
+        size += len(live)
+        body.append(struct.pack('<II', crc, size & 0xffffffff))
+        return b''.join(body)
+
+    # Registry interface for the prometheus client fallback, renders everything per scrape
+    def collect(self):
+        if self.registry:
+            yield from self.registry.collect()
+        for c in self.collectors:
+            yield from c.collect()
+
+    def restricted_registry(self, names) -> 'RestrictedView':
+        return RestrictedView(self, set(names))
+
+class RestrictedView:
+    ''' name[] filtered view of a SnapshotRegistry
+    '''
+    def __init__(self, registry: SnapshotRegistry, names: set[str]):
+        self.registry = registry
+        self.names = names
+
+    def collect(self):
+        for metric in self.registry.collect():
+            m = metric._restricted_metric(self.names)
+            if m:
+                yield m
+
+def scrape_etag(snapshots: list[Snapshot], gzip: bool) -> str:
+    ''' Changes with every load of the collectors
+    '''
+    digest = hashlib.blake2b(struct.pack(f'<{len(snapshots)}q', *(s.created for s in snapshots)), digest_size=12)
+    return f'"{digest.hexdigest()}{"-gzip" if gzip else ""}"'
+
+def snapshots_max_age(collectors: list['LoadingCollector'], snapshots: list[Snapshot]) -> int:
+    ''' Seconds until the next scheduled load of the collectors, 0 if one of them is not loaded on a timer
+    '''
+    if not collectors or any(c.interval <= 0 for c in collectors):
+        return 0
+    next_load = min(s.created / 1e9 + c.interval for c, s in zip(collectors, snapshots))
+    return max(int(next_load - time.time()), 0)
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    return any(tag.strip() in (etag, '*') for tag in if_none_match.split(','))
+
+def plain_text_accepted(accept_header: str | None) -> bool:
+    if not accept_header:
+        return True
+    for accepted in accept_header.split(','):
+        if accepted.split(';')[0].strip() in ('text/plain', '*/*'):
+            return True
+    return False
+
+def serve_snapshots(registry: SnapshotRegistry, fallback, environ, start_response):
+    if 'name[]' in parse_qs(environ.get('QUERY_STRING', '')) or not plain_text_accepted(environ.get('HTTP_ACCEPT')):
+        return fallback(environ, start_response)
+
+    gzip = gzip_accepted(environ.get('HTTP_ACCEPT_ENCODING'))
+    etag, max_age, output = registry.scrape(gzip, environ.get('HTTP_IF_NONE_MATCH'))
+    # Cached copies are fresh until the next load, then revalidated, unchanged metrics are not sent again
+    headers = [('Cache-Control', f'max-age={max_age}' if max_age else 'no-cache'), ('Vary', 'Accept-Encoding')]
+    if etag:
+        headers.append(('ETag', etag))
+    if output is None:
+        start_response('304 Not Modified', headers)
+        return []
+
+    headers.append(('Content-Type', CONTENT_TYPE_PLAIN_0_0_4))
+    if gzip:
+        headers.append(('Content-Encoding', 'gzip'))
+    start_response('200 OK', headers)
+    return [output]
+
+def make_snapshot_app(registry: SnapshotRegistry):
+    ''' WSGI app serving the snapshots in the text format
+        Requests it can not answer from the snapshots (only OpenMetrics accepted, name[] filters)
+        are passed on to the prometheus client app
+
+        /probe?target=<router> serves the collectors of a single router, like the snmp and blackbox exporters,
+        /metrics/fast, /metrics/slow and /metrics/system the collectors of a group
+    '''
+    fallback = make_wsgi_app(registry)
+    group_fallbacks = {group: make_wsgi_app(group_registry) for group, group_registry in registry.groups.items()}
+
+    def probe(environ, start_response):
+        target = parse_qs(environ.get('QUERY_STRING', '')).get('target', [''])[0]
+        target_registry = registry.targets.get(target)
+        if not target_registry:
+            status = '404 Not Found' if target else '400 Bad Request'
+            start_response(status, [('Content-Type', 'text/plain')])
+            return [f'Unknown target "{target}"\n'.encode('utf-8') if target else b'Missing target parameter\n']
+
+        registry.refresh(target)
+        return serve_snapshots(target_registry, make_wsgi_app(target_registry), environ, start_response)
+
+    def group(environ, start_response):
+        name = environ['PATH_INFO'][len('/metrics/'):].strip('/')
+        group_registry = registry.groups.get(name)
+        if not group_registry:
+            start_response('404 Not Found', [('Content-Type', 'text/plain')])
+            return [f'Unknown collector group "{name}", one of {", ".join(registry.groups)}\n'.encode('utf-8')]
+
+        registry.refresh(group=name)
+        return serve_snapshots(group_registry, group_fallbacks[name], environ, start_response)
+
+    def snapshot_app(environ, start_response):
+        if environ['REQUEST_METHOD'] != 'GET' or environ['PATH_INFO'] == '/favicon.ico':
+            return fallback(environ, start_response)
+        if environ['PATH_INFO'] == '/probe':
+            return probe(environ, start_response)
+        if environ['PATH_INFO'].startswith('/metrics/'):
+            return group(environ, start_response)
+
+        registry.refresh()
+        return serve_snapshots(registry, fallback, environ, start_response)
+
+    return snapshot_app
+
+class SilentHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+def start_http_server(port: int, addr: str, registry: SnapshotRegistry) -> tuple[ThreadingWSGIServer, threading.Thread]:
+    ''' Same as prometheus_client.start_http_server, serving the snapshot app
+    '''
+    family, _, _, _, sockaddr = socket.getaddrinfo(addr, port, type=socket.SOCK_STREAM)[0]
+
+    class Server(ThreadingWSGIServer):
+        address_family = family
+
+    httpd = make_server(sockaddr[0], port, make_snapshot_app(registry), Server, handler_class=SilentHandler)
+    t = threading.Thread(target=httpd.serve_forever)
+    t.daemon = True
+    t.start()
+
+    return httpd, t
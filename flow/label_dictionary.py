@@ -0,0 +1,68 @@
+# coding=utf8
+## Copyright (c) 2020 Arseniy Kuznetsov
+## Copyright (c) 2024 Martti Anttila
+##
+## This program is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License
+## as published by the Free Software Foundation; either version 2
+## of the License, or (at your option) any later version.
+##
+## This program is distributed in the hope that it will be useful,
+## but WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+## GNU General Public License for more details.
+
+import threading
+
+from collections import deque
+from itertools import islice
+
+from cli.config import ConfigKeys
+
+class LabelDictionary:
+    ''' Interns the label values of a router
+        A value repeated across loads, series and collectors is kept as a single str.
+        Values not seen for max_cycles poll cycles are dropped, above max_size new values are not added
+    '''
+    def __init__(self, max_size: int = ConfigKeys.DEFAULT_LABEL_DICTIONARY_SIZE, max_cycles: int = ConfigKeys.DEFAULT_LABEL_DICTIONARY_CYCLES):
+        self.max_size = max_size
+        self.max_cycles = max(max_cycles, 1)
+        # One dict per poll cycle, newest first. A value lives in the generation of the cycle it was last seen in
+        self.generations: deque[dict[str, str]] = deque([{}])
+        self.size = 0
+        # Collectors of the router load in parallel worker threads, values seen for the first time in the cycle are added under the lock
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self.size
+
+    def intern(self, value: str) -> str:
+        interned = self.generations[0].get(value)
+        if interned is not None:
+            return interned
+
+        with self.lock:
+            current = self.generations[0]
+            interned = current.get(value)
+            if interned is not None:
+                return interned
+
+            for generation in islice(self.generations, 1, None):
+                interned = generation.pop(value, None)
+                if interned is not None:
+                    current[value] = interned
+                    return interned
+
+            if self.size >= self.max_size:
+                return value
+            current[value] = value
+            self.size += 1
+            return value
+
+    def end_cycle(self):
+        ''' Called when none of the routers collector groups are loading
+        '''
+        with self.lock:
+            self.generations.appendleft({})
+            if len(self.generations) > self.max_cycles:
+                self.size -= len(self.generations.pop())
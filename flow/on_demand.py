@@ -0,0 +1,94 @@
+# coding=utf8
+## Copyright (c) 2020 Arseniy Kuznetsov
+## Copyright (c) 2024 Martti Anttila
+##
+## This program is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License
+## as published by the Free Software Foundation; either version 2
+## of the License, or (at your option) any later version.
+##
+## This program is distributed in the hope that it will be useful,
+## but WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+## GNU General Public License for more details.
+
+import logging
+import threading
+
+from collections.abc import Callable
+from time import time
+
+from flow.poll_executor import due_collectors
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from flow.router_entry import RouterEntry
+    from collector.metric_store import LoadingCollector
+    from collector.internal_collector import InternalCollector
+
+class OnDemandGroup:
+    ''' A collector group of a router, loaded when scraped after its TTL
+    '''
+    def __init__(self, router_entry: 'RouterEntry', collectors: list['LoadingCollector'], ttl: int, group: int):
+        self.router_entry = router_entry
+        self.collectors = collectors
+        self.ttl = ttl
+        self.group = group
+        self.loaded_at: float = 0
+        self.loading = False
+        self.finished = threading.Event()
+
+    def done(self):
+        self.loading = False
+        self.finished.set()
+
+class OnDemandLoader:
+    ''' Loads the collector groups when scraped instead of on a timer
+
+        A scrape starts the loads of the groups older than their TTL, all at once, and waits for them
+        and the loads already running up to the deadline. Concurrent scrapes wait for the same loads.
+        Collectors still loading at the deadline are served from their last snapshot
+    '''
+    def __init__(self, submit: Callable, deadline: float, internal_collector: 'InternalCollector'):
+        # submit(router_entry, collectors, group, done) starts a load on the scheduler of the mode
+        self.submit = submit
+        self.deadline = deadline
+        self.internal_collector = internal_collector
+        self.groups: list[OnDemandGroup] = []
+        self.lock = threading.Lock()
+
+    def add_group(self, router_entry: 'RouterEntry', collectors: list['LoadingCollector'], ttl: int, group: int):
+        self.groups.append(OnDemandGroup(router_entry, collectors, ttl, group))
+
+    def refresh(self, router_name: str | None = None, group: int | None = None):
+        ''' Loads the stale groups, of all routers or of router_name, all groups or group
+        '''
+        now = time()
+        waiting: list[OnDemandGroup] = []
+        with self.lock:
+            for g in self.groups:
+                if router_name and g.router_entry.router_name != router_name:
+                    continue
+                if group and g.group != group:
+                    continue
+                if not g.loading and now - g.loaded_at >= g.ttl:
+                    # Also when nothing is due, so a backed off router is not checked on every scrape
+                    g.loaded_at = now
+                    due = due_collectors(g.router_entry, g.collectors)
+                    if not due:
+                        continue
+                    logging.debug('%s: Loading collector group %i on demand', g.router_entry.router_name, g.group)
+                    g.loading = True
+                    g.finished.clear()
+                    if self.submit(g.router_entry, due, g.group, g.done) is False:
+                        # The executor is still running a load of the group
+                        g.done()
+                if g.loading:
+                    waiting.append(g)
+
+        end = now + self.deadline
+        for g in waiting:
+            if not g.finished.wait(max(end - time(), 0)):
+                logging.warning('%s: Load deadline exceeded, serving the previous metrics', g.router_entry.router_name)
+                self.internal_collector.count_deadline_exceeded(g.router_entry.router_id)
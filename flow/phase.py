@@ -0,0 +1,41 @@
+# coding=utf8
+## Copyright (c) 2020 Arseniy Kuznetsov
+## Copyright (c) 2024 Martti Anttila
+##
+## This program is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License
+## as published by the Free Software Foundation; either version 2
+## of the License, or (at your option) any later version.
+##
+## This program is distributed in the hope that it will be useful,
+## but WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+## GNU General Public License for more details.
+
+''' Start times of the collector groups
+
+    Every router and collector group polls at its own phase of the interval, hashed from the
+    router name and the group, so a fleet is not polled in one burst and a restart keeps the phases
+'''
+
+import hashlib
+
+# Seconds over which the warm-up loads at startup are spread
+WARMUP_WINDOW = 10
+
+def phase_fraction(router_name: str, group: int) -> float:
+    ''' Stable position of the router group in [0, 1)
+    '''
+    digest = hashlib.blake2b(f'{router_name}/{group}'.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big') / 2**64
+
+def phase_start(router_name: str, group: int, interval: int, now: float) -> float:
+    ''' Last run time of the group at or before now, runs are at its phase of every interval since the epoch
+    '''
+    offset = phase_fraction(router_name, group) * interval
+    return now - (now - offset) % interval
+
+def warmup_time(router_name: str, group: int, now: float) -> float:
+    ''' Time of the first load of the group, spread over WARMUP_WINDOW
+    '''
+    return now + phase_fraction(router_name, group) * WARMUP_WINDOW
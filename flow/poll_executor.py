@@ -0,0 +1,200 @@
+# coding=utf8
+## Copyright (c) 2020 Arseniy Kuznetsov
+## Copyright (c) 2024 Martti Anttila
+##
+## This program is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License
+## as published by the Free Software Foundation; either version 2
+## of the License, or (at your option) any later version.
+##
+## This program is distributed in the hope that it will be useful,
+## but WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+## GNU General Public License for more details.
+
+import logging
+
+from collections import deque
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from threading import Lock
+from time import perf_counter
+
+from cli.config import ConfigKeys
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from flow.router_entry import RouterEntry
+    from collector.metric_store import LoadingCollector
+    from collector.internal_collector import InternalCollector
+
+# Queue key used for the system collectors, which are not bound to a router
+SYSTEM_QUEUE = '__system__'
+
+def router_labels(router_entry: 'RouterEntry | None') -> dict[str, str]:
+    ''' Router id labels of the internal metrics, empty for the system collectors
+    '''
+    if router_entry:
+        return router_entry.router_id
+    return {ConfigKeys.ROUTERBOARD_NAME: '', ConfigKeys.ROUTERBOARD_ADDRESS: ''}
+
+def due_collectors(router_entry: 'RouterEntry | None', collectors: list['LoadingCollector']) -> list['LoadingCollector']:
+    ''' Collectors to load in this run of their group, adaptive ones only every few runs
+        and none while the router is backed off after connection failures
+    '''
+    if router_entry and router_entry.rest_api.backed_off():
+        logging.debug('%s: Backing off after connection failures, skipping this cycle', router_entry.router_name)
+        return []
+    return [c for c in collectors if not c.adaptive_interval or c.adaptive_interval.tick()]
+
+class LoadBatch:
+    ''' One scheduled run of a collector group on a router
+    '''
+    def __init__(self, key: tuple[str, int], router_entry: 'RouterEntry | None', size: int, done: Callable[[], None] | None = None):
+        self.key = key
+        self.router_entry = router_entry
+        self.remaining = size
+        self.logged_skip = False
+        # Called once all the collectors of the batch have loaded
+        self.done = done
+
+class CollectorLoad:
+    ''' Internal collector timing and error accounting around a single collector load
+        Swallows the load errors after logging them, like the sched loop always did
+    '''
+    def __init__(self, internal_collector: 'InternalCollector', batch: LoadBatch, collector: 'LoadingCollector',
+                 after_load: Callable[['RouterEntry | None', 'LoadingCollector'], None] | None = None):
+        self.internal_collector = internal_collector
+        self.batch = batch
+        self.collector = collector
+        # Called after a successful load, with the metric store holding the new samples
+        self.after_load = after_load
+        self.labels = {'name': collector.name, ConfigKeys.ROUTERBOARD_ADDRESS: '', ConfigKeys.ROUTERBOARD_NAME: ''}
+        if batch.router_entry:
+            self.labels.update(batch.router_entry.router_id)
+
+        logging.debug('Running %s', collector.name)
+
+    def __enter__(self):
+        if self.collector.adaptive_interval:
+            self.collector.adaptive_interval.started()
+        self.start = perf_counter()
+        self.stack = ExitStack()
+        self.stack.enter_context(self.internal_collector.time(self.labels))
+        self.stack.enter_context(self.internal_collector.count_exceptions(self.labels))
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stack.__exit__(exc_type, exc, tb)
+        if exc_type and not issubclass(exc_type, Exception):
+            # Cancellation and interrupts are not load errors
+            return False
+
+        if not exc:
+            self.internal_collector.inc_load_count(self.labels)
+            store = self.collector.metric_store
+            self.internal_collector.observe_load(self.labels, store.set_metrics_time, self.collector.render_time, store.series_count())
+            adaptive_interval = self.collector.adaptive_interval
+            if adaptive_interval:
+                adaptive_interval.update(perf_counter() - self.start, self.collector.change_checksum())
+                self.internal_collector.set_collector_interval(self.labels, adaptive_interval.interval)
+            if self.after_load:
+                try:
+                    self.after_load(self.batch.router_entry, self.collector)
+                except Exception as exc:
+                    logging.error('Catched exception after loading %s: %s', self.collector.name, exc)
+        elif str(exc) == 'retry_timer_skip':
+            if not self.batch.logged_skip:
+                logging.error("Skipping Load because of previous error")
+                self.batch.logged_skip = True
+            return True
+        else:
+            logging.error(f'Catched exception while loading: {exc}')
+
+        self.internal_collector.set_last_run(self.labels)
+        return True
+
+class RouterQueue:
+    ''' Pending loads of a single router
+    '''
+    def __init__(self, limit: int):
+        self.limit = max(limit, 1)
+        self.running = 0
+        self.batches = 0
+        self.pending: deque[tuple[LoadBatch, 'LoadingCollector']] = deque()
+
+class PollExecutor:
+    ''' Runs collector loads on a bounded worker pool
+        Every router has its own queue and never occupies more than its
+        per-router limit of workers, so a slow router can not starve the others
+    '''
+    def __init__(self, internal_collector: 'InternalCollector', max_workers: int, after_load: Callable | None = None):
+        self.internal_collector = internal_collector
+        self.after_load = after_load
+        self.pool = ThreadPoolExecutor(max_workers=max(max_workers, 1), thread_name_prefix='collector')
+        self.lock = Lock()
+        self.queues: dict[str, RouterQueue] = {}
+        self.running_batches: set[tuple[str, int]] = set()
+
+    def submit(self, router_entry: 'RouterEntry | None', collectors: list['LoadingCollector'], group: int, done: Callable[[], None] | None = None) -> bool:
+        ''' Queue a load of the collectors, returns False if the previous
+            load of the same group on the same router is still running
+            done is called from a worker thread once the load has finished
+        '''
+        if not collectors:
+            return True
+
+        queue_key = router_entry.router_name if router_entry else SYSTEM_QUEUE
+        batch_key = (queue_key, group)
+        with self.lock:
+            if batch_key in self.running_batches:
+                return False
+
+            queue = self.queues.get(queue_key)
+            if not queue:
+                limit = router_entry.config_entry.max_workers_per_router if router_entry else 1
+                queue = RouterQueue(limit)
+                self.queues[queue_key] = queue
+
+            batch = LoadBatch(batch_key, router_entry, len(collectors), done)
+            self.running_batches.add(batch_key)
+            queue.batches += 1
+            for c in collectors:
+                queue.pending.append((batch, c))
+
+            self._dispatch(queue)
+
+        return True
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+    def _dispatch(self, queue: RouterQueue):
+        # Called with the lock held
+        while queue.pending and queue.running < queue.limit:
+            batch, collector = queue.pending.popleft()
+            queue.running += 1
+            self.pool.submit(self._run, queue, batch, collector)
+
+    def _run(self, queue: RouterQueue, batch: LoadBatch, collector: 'LoadingCollector'):
+        try:
+            self._load(batch, collector)
+        finally:
+            with self.lock:
+                queue.running -= 1
+                batch.remaining -= 1
+                finished = batch.remaining <= 0
+                if finished:
+                    self.running_batches.discard(batch.key)
+                    queue.batches -= 1
+                    if not queue.batches and batch.router_entry:
+                        batch.router_entry.end_cycle()
+                self._dispatch(queue)
+            if finished and batch.done:
+                batch.done()
+
+    def _load(self, batch: LoadBatch, c: 'LoadingCollector'):
+        with CollectorLoad(self.internal_collector, batch, c, self.after_load):
+            c.load(batch.router_entry)
@@ -0,0 +1,313 @@
+# coding=utf8
+## Copyright (c) 2020 Arseniy Kuznetsov
+## Copyright (c) 2024 Martti Anttila
+##
+## This program is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License
+## as published by the Free Software Foundation; either version 2
+## of the License, or (at your option) any later version.
+##
+## This program is distributed in the hope that it will be useful,
+## but WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+## GNU General Public License for more details.
+
+''' Prometheus remote write push mode
+
+    The samples of every collector load are encoded right after the load and batched across routers.
+    The routers are spread over shards by name, each shard sends its batches in order on its own
+    thread, so the samples of a series arrive in order and the shards cap the concurrent sends.
+    Batches waiting for a failing endpoint are kept in a bounded queue, which spills to disk
+'''
+
+import logging
+import os
+import threading
+import zlib
+
+from collections import deque
+from time import time, perf_counter
+
+import requests
+
+from flow.backoff import Backoff
+from utils import snappy
+from utils.prompb import encode_label, encode_timeseries
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from flow.router_entry import RouterEntry
+    from collector.metric_store import LoadingCollector, SeriesFamily
+    from collector.internal_collector import InternalCollector
+
+HEADERS = {
+    'Content-Encoding': 'snappy',
+    'Content-Type': 'application/x-protobuf',
+    'User-Agent': 'mtik_exporter',
+    'X-Prometheus-Remote-Write-Version': '0.1.0',
+}
+
+# Retry delays of a batch while the endpoint fails
+RETRY_DELAY = 1
+MAX_RETRY_DELAY = 60
+# Encoded labels kept for reuse, the cache starts over when full
+LABEL_CACHE_SIZE = 100000
+# Spill files are numbered from here, batches put back in front of the queue get lower numbers
+FIRST_SPILL_SEQ = 10**12
+
+class SpillQueue:
+    ''' FIFO of encoded batches, up to max_batches in memory and the rest in spill_dir
+
+        Once batches are spilled, new batches go to disk too until the spilled ones are sent,
+        so the batches stay in order. Without spill_dir, or over max_spill_bytes, the oldest
+        batches are dropped. Spilled batches left by a previous run are sent first
+    '''
+    def __init__(self, max_batches: int, spill_dir: str, max_spill_bytes: int):
+        self.max_batches = max(max_batches, 1)
+        self.spill_dir = spill_dir
+        self.max_spill_bytes = max_spill_bytes
+        self.memory: deque[tuple[bytes, int]] = deque()
+        # Spilled batches: sequence number, bytes, samples
+        self.spilled: deque[tuple[int, int, int]] = deque()
+        self.spill_bytes = 0
+        self.next_seq = FIRST_SPILL_SEQ
+        self.condition = threading.Condition()
+
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+            for file_name in sorted(os.listdir(spill_dir)):
+                seq, _, samples = file_name.partition('.')[0].partition('-')
+                if not (seq.isdigit() and samples.isdigit()):
+                    continue
+                size = os.path.getsize(self.path(int(seq), int(samples)))
+                self.spilled.append((int(seq), size, int(samples)))
+                self.spill_bytes += size
+                self.next_seq = int(seq) + 1
+            if self.spilled:
+                logging.info('Remote write: %i batches left from a previous run in %s', len(self.spilled), spill_dir)
+
+    def __len__(self) -> int:
+        return len(self.memory) + len(self.spilled)
+
+    def path(self, seq: int, samples: int) -> str:
+        return os.path.join(self.spill_dir, f'{seq:015d}-{samples}.pb')
+
+    def put(self, payload: bytes, samples: int) -> int:
+        ''' Queues a batch, returns the samples of the batches dropped to make room
+        '''
+        dropped = 0
+        with self.condition:
+            if not self.spilled and len(self.memory) < self.max_batches:
+                self.memory.append((payload, samples))
+            elif self.spill_dir:
+                dropped = self._spill(self.next_seq, payload, samples)
+                self.next_seq += 1
+            else:
+                dropped = self.memory.popleft()[1]
+                self.memory.append((payload, samples))
+            self.condition.notify()
+        return dropped
+
+    def get(self, timeout: float) -> tuple[bytes, int] | None:
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.memory or self.spilled, timeout):
+                return None
+            if self.memory:
+                return self.memory.popleft()
+
+            seq, size, samples = self.spilled.popleft()
+            self.spill_bytes -= size
+            path = self.path(seq, samples)
+            with open(path, 'rb') as f:
+                payload = f.read()
+            os.remove(path)
+            return payload, samples
+
+    def persist(self, in_flight: tuple[bytes, int] | None):
+        ''' Spills the batches in memory at shutdown, in front of the spilled ones
+        '''
+        with self.condition:
+            front = ([in_flight] if in_flight else []) + list(self.memory)
+            self.memory.clear()
+            seq = (self.spilled[0][0] if self.spilled else self.next_seq) - len(front)
+            spilled = self.spilled
+            self.spilled = deque()
+            for payload, samples in front:
+                self._spill(seq, payload, samples)
+                seq += 1
+            self.spilled.extend(spilled)
+
+    def _spill(self, seq: int, payload: bytes, samples: int) -> int:
+        with open(self.path(seq, samples), 'wb') as f:
+            f.write(payload)
+        self.spilled.append((seq, len(payload), samples))
+        self.spill_bytes += len(payload)
+
+        dropped = 0
+        while self.spill_bytes > self.max_spill_bytes and len(self.spilled) > 1:
+            old_seq, size, old_samples = self.spilled.popleft()
+            os.remove(self.path(old_seq, old_samples))
+            self.spill_bytes -= size
+            dropped += old_samples
+        return dropped
+
+class RemoteWriteShard:
+    ''' Batches and sends the samples of a share of the routers
+    '''
+    def __init__(self, index: int, writer: 'RemoteWriter', queue: SpillQueue):
+        self.index = index
+        self.writer = writer
+        self.queue = queue
+        self.lock = threading.Lock()
+        self.pending: list[bytes] = []
+        self.in_flight: tuple[bytes, int] | None = None
+        self.session = requests.Session()
+        self.session.headers.update(HEADERS)
+        if writer.auth:
+            self.session.auth = writer.auth
+
+    def add(self, series: list[bytes]):
+        batch_size = self.writer.batch_size
+        with self.lock:
+            self.pending.extend(series)
+            while len(self.pending) >= batch_size:
+                self._cut(batch_size)
+
+    def flush(self):
+        with self.lock:
+            if self.pending:
+                self._cut(len(self.pending))
+
+    def _cut(self, size: int):
+        # Called with the lock held
+        batch = self.pending[:size]
+        del self.pending[:size]
+        dropped = self.queue.put(b''.join(batch), len(batch))
+        if dropped:
+            logging.warning('Remote write: queue of shard %i full, dropped %i samples', self.index, dropped)
+            self.writer.internal_collector.count_remote_write_dropped(self.writer.worker, 'queue_full', dropped)
+
+    def run(self):
+        while not self.writer.stopping.is_set():
+            batch = self.queue.get(1)
+            if batch:
+                self.in_flight = batch
+                self.send(*batch)
+                self.in_flight = None
+
+    def send(self, payload: bytes, samples: int):
+        internal_collector = self.writer.internal_collector
+        worker = self.writer.worker
+        body = snappy.compress(payload)
+        backoff = Backoff(RETRY_DELAY, MAX_RETRY_DELAY, 1)
+        while not self.writer.stopping.is_set():
+            start = perf_counter()
+            try:
+                response = self.session.post(self.writer.url, data=body, timeout=self.writer.timeout)
+                internal_collector.observe_remote_write_send(worker, perf_counter() - start)
+                if response.status_code < 300:
+                    internal_collector.count_remote_write_sent(worker, samples)
+                    return
+                if response.status_code != 429 and response.status_code < 500:
+                    # Retrying a rejected batch does not help, like the Prometheus server drop it
+                    logging.error('Remote write: batch of %i samples rejected with HTTP %i: %s', samples, response.status_code, response.text[:200])
+                    internal_collector.count_remote_write_dropped(worker, 'rejected', samples)
+                    return
+                error = f'HTTP {response.status_code}'
+            except requests.RequestException as exc:
+                error = str(exc)
+
+            internal_collector.count_remote_write_failure(worker)
+            backoff.failure(time())
+            logging.warning('Remote write: send failed (%s), retrying in %.1fs', error, backoff.delay)
+            self.writer.stopping.wait(backoff.delay)
+
+class RemoteWriter:
+    ''' Pushes the samples of the collector loads to a remote write endpoint
+    '''
+    def __init__(self, url: str, shards: int, batch_size: int, flush_interval: float, queue_size: int, spill_dir: str, max_spill_bytes: int,
+                 timeout: float, internal_collector: 'InternalCollector', username: str = '', password: str = '', worker: str = ''):
+        self.url = url
+        self.batch_size = max(batch_size, 1)
+        self.flush_interval = max(flush_interval, 0.1)
+        self.timeout = timeout
+        self.auth = (username, password) if username else None
+        self.internal_collector = internal_collector
+        # Worker process of the writer, its metrics are exported by the supervisor next to the others
+        self.worker = worker
+        self.stopping = threading.Event()
+        self.label_cache: dict[tuple[str, str], bytes] = {}
+        self.family_names: dict[str, bytes] = {}
+
+        self.shards: list[RemoteWriteShard] = []
+        for index in range(max(shards, 1)):
+            shard_dir = os.path.join(spill_dir, f'shard-{index}') if spill_dir else ''
+            queue = SpillQueue(queue_size, shard_dir, max_spill_bytes)
+            self.shards.append(RemoteWriteShard(index, self, queue))
+            internal_collector.track_remote_write_queue(worker, index, lambda q=queue: len(q.memory), lambda q=queue: len(q.spilled))
+
+    def start(self):
+        for shard in self.shards:
+            threading.Thread(target=shard.run, name=f'remote-write-{shard.index}', daemon=True).start()
+        threading.Thread(target=self.flush_loop, name='remote-write-flush', daemon=True).start()
+
+    def stop(self):
+        ''' Stops sending, the unsent batches are spilled to disk if configured
+        '''
+        self.stopping.set()
+        for shard in self.shards:
+            shard.flush()
+            if shard.queue.spill_dir:
+                shard.queue.persist(shard.in_flight)
+
+    def flush_loop(self):
+        while not self.stopping.wait(self.flush_interval):
+            for shard in self.shards:
+                shard.flush()
+
+    def write(self, router_entry: 'RouterEntry | None', collector: 'LoadingCollector'):
+        ''' Queues the samples of a successful collector load
+        '''
+        store = collector.metric_store
+        if not store.ts:
+            return
+
+        timestamp = int(store.ts * 1000)
+        series = []
+        for family in store.families():
+            self.encode_family(family, timestamp, series)
+
+        router_name = router_entry.router_name if router_entry else ''
+        shard = self.shards[zlib.crc32(router_name.encode('utf-8')) % len(self.shards)]
+        shard.add(series)
+
+    def encode_family(self, family: 'SeriesFamily', timestamp: int, series: list[bytes]):
+        name = self.family_names.get(family.sample_name)
+        if name is None:
+            name = self.family_names[family.sample_name] = encode_label('__name__', family.sample_name)
+
+        cache = self.label_cache
+        if len(cache) > LABEL_CACHE_SIZE:
+            cache.clear()
+
+        # Labels sorted by name, __name__ first unless a label name sorts before it
+        before = [(label, i) for label, i in family.label_positions if label < '__name__']
+        after = [(label, i) for label, i in family.label_positions if label >= '__name__']
+        for labels, value in family.samples():
+            encoded = []
+            for part in (before, None, after):
+                if part is None:
+                    encoded.append(name)
+                    continue
+                for label, i in part:
+                    label_value = labels[i]
+                    # Empty values are the same as no label
+                    if not label_value:
+                        continue
+                    key = (label, label_value)
+                    label_bytes = cache.get(key)
+                    if label_bytes is None:
+                        label_bytes = cache[key] = encode_label(label, label_value)
+                    encoded.append(label_bytes)
+            series.append(encode_timeseries(b''.join(encoded), value, timestamp))
@@ -0,0 +1,191 @@
+# coding=utf8
+## Copyright (c) 2020 Arseniy Kuznetsov
+## Copyright (c) 2024 Martti Anttila
+##
+## This program is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License
+## as published by the Free Software Foundation; either version 2
+## of the License, or (at your option) any later version.
+##
+## This program is distributed in the hope that it will be useful,
+## but WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+## GNU General Public License for more details.
+
+import asyncio
+
+from concurrent.futures import Future
+from threading import Lock
+from time import time
+
+from collections.abc import Awaitable, Callable
+
+# Poll cycles a table stays shared without being requested twice in a cycle, so tables shared
+# between the fast and slow collectors stay shared in the cycles between the slow loads
+SHARED_CYCLES = 10
+
+Properties = frozenset[str] | None
+
+class ResponseCache:
+    ''' Per router cache of REST responses, keyed by path and query parameters
+
+        Without a ttl entries live for one poll cycle, until no collector group
+        of the router is loading anymore. Only tables that were requested more
+        than once in a cycle are kept, the others are handed out without a copy.
+        With a ttl every response is kept for ttl seconds.
+
+        The .proplist is not part of the key: a shared table is fetched with the union
+        of the properties its collectors request, or whole if one of them wants all, and
+        every collector gets its own properties. A table not requested twice in a cycle
+        for SHARED_CYCLES cycles is no longer shared.
+        Concurrent requests for the same table share one in-flight request.
+    '''
+    def __init__(self, ttl: int = 0):
+        self.ttl = ttl
+        self.lock = Lock()
+        self.entries: dict[str, tuple[float, Properties, object]] = {}
+        self.in_flight: dict[str, tuple[Future | asyncio.Future, Properties]] = {}
+        # Requests per key in the current cycle, and the union of their properties
+        self.requested: dict[str, tuple[int, Properties]] = {}
+        # Shared keys with the union of the properties requested, and the cycles since they were last shared
+        self.shared: dict[str, Properties] = {}
+        self.idle_cycles: dict[str, int] = {}
+
+    def get(self, key: str, properties: Properties, fetch: Callable[[Properties], object]) -> tuple[object, bool]:
+        ''' Returns (response, hit), calls fetch with the properties to request on a miss
+        '''
+        with self.lock:
+            fetch_properties = self._request(key, properties)
+            found, fetched, response = self._lookup(key, properties)
+            if found:
+                return hand_out(response, fetched, properties), True
+
+            waiter = self.in_flight.get(key)
+            if waiter and covers(waiter[1], properties):
+                future, fetched = waiter
+            else:
+                waiter = None
+                future = Future()
+                self.in_flight.setdefault(key, (future, fetch_properties))
+
+        if waiter:
+            return hand_out(future.result(), fetched, properties), True
+
+        try:
+            response = fetch(fetch_properties)
+            future.set_result(response)
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        finally:
+            with self.lock:
+                if self.in_flight.get(key, (None,))[0] is future:
+                    del self.in_flight[key]
+
+        return self._store(key, fetch_properties, response, properties), False
+
+    async def get_async(self, key: str, properties: Properties, fetch: Callable[[Properties], Awaitable[object]]) -> tuple[object, bool]:
+        ''' asyncio variant of get, only called from the event loop thread
+        '''
+        with self.lock:
+            fetch_properties = self._request(key, properties)
+            found, fetched, response = self._lookup(key, properties)
+        if found:
+            return hand_out(response, fetched, properties), True
+
+        waiter = self.in_flight.get(key)
+        if waiter and covers(waiter[1], properties):
+            future, fetched = waiter
+            return hand_out(await asyncio.shield(future), fetched, properties), True
+
+        future = asyncio.get_running_loop().create_future()
+        self.in_flight.setdefault(key, (future, fetch_properties))
+        try:
+            response = await fetch(fetch_properties)
+            future.set_result(response)
+        except BaseException as exc:
+            future.set_exception(exc)
+            # Mark retrieved, nobody may be waiting for it
+            future.exception()
+            raise
+        finally:
+            if self.in_flight.get(key, (None,))[0] is future:
+                del self.in_flight[key]
+
+        return self._store(key, fetch_properties, response, properties), False
+
+    def end_cycle(self):
+        ''' Called when none of the routers collector groups are loading
+        '''
+        with self.lock:
+            if self.ttl:
+                now = time()
+                self.entries = {k: e for k, e in self.entries.items() if now - e[0] < self.ttl}
+            else:
+                self.entries.clear()
+
+            for key in list(self.shared):
+                if self.requested.get(key, (0,))[0] > 1 or self.ttl and key in self.requested:
+                    self.idle_cycles[key] = 0
+                    continue
+                self.idle_cycles[key] += 1
+                if self.idle_cycles[key] >= SHARED_CYCLES:
+                    del self.shared[key]
+                    del self.idle_cycles[key]
+            self.requested.clear()
+
+    def _request(self, key: str, properties: Properties) -> Properties:
+        ''' Counts a request, returns the properties to fetch on a miss
+        '''
+        count, requested = self.requested.get(key, (0, frozenset()))
+        requested = union(requested, properties)
+        self.requested[key] = (count + 1, requested)
+        if key in self.shared:
+            self.shared[key] = union(self.shared[key], properties)
+        elif count or self.ttl:
+            self.shared[key] = requested
+            self.idle_cycles[key] = 0
+        return self.shared.get(key, properties)
+
+    def _lookup(self, key: str, properties: Properties) -> tuple[bool, Properties, object]:
+        entry = self.entries.get(key)
+        if entry and (not self.ttl or time() - entry[0] < self.ttl) and covers(entry[1], properties):
+            return True, entry[1], entry[2]
+        return False, None, None
+
+    def _store(self, key: str, fetched: Properties, response: object, properties: Properties) -> object:
+        with self.lock:
+            if not self.ttl and key not in self.shared:
+                # Fetched with the properties of the caller, it gets the response itself
+                return response
+
+            entry = self.entries.get(key)
+            # An entry of more properties fetched concurrently stays
+            if not entry or not covers(entry[1], fetched):
+                self.entries[key] = (time(), fetched, response)
+        # Collectors modify the records in place, the cached response has to stay untouched
+        return hand_out(response, fetched, properties)
+
+def union(a: Properties, b: Properties) -> Properties:
+    return None if a is None or b is None else a | b
+
+def covers(fetched: Properties, properties: Properties) -> bool:
+    return fetched is None or (properties is not None and properties <= fetched)
+
+def hand_out(response, fetched: Properties, properties: Properties):
+    ''' Copy of a cached response with the properties of the caller
+    '''
+    if properties is None or properties == fetched:
+        return copy_response(response)
+    if isinstance(response, list):
+        return [{k: v for k, v in r.items() if k in properties} if isinstance(r, dict) else r for r in response]
+    if isinstance(response, dict):
+        return {k: v for k, v in response.items() if k in properties}
+    return response
+
+def copy_response(response):
+    if isinstance(response, list):
+        return [dict(r) if isinstance(r, dict) else r for r in response]
+    if isinstance(response, dict):
+        return dict(response)
+    return response
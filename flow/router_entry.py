@@ -14,16 +14,46 @@
 
 
 from cli.config import config_handler, ConfigKeys
-from flow.router_rest_api import RouterRestAPI
+from flow.label_dictionary import LabelDictionary
+from flow.router_rest_api import DEFAULT_BACKOFF, RouterRestAPI, AsyncRouterRestAPI, ReplayRestAPI
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collector.internal_collector import InternalCollector
 
 class RouterEntry:
     ''' RouterOS Entry
     '''
-    def __init__(self, router_name: str):
+    def __init__(self, router_name: str, async_mode: bool = False, internal_collector: 'InternalCollector | None' = None,
+                 backoff_settings: tuple[int, int, int] = DEFAULT_BACKOFF):
         self.router_name = router_name
         self.config_entry  = config_handler.config_entry(router_name)
-        self.rest_api = RouterRestAPI(router_name, self.config_entry)
+        self.internal_collector = internal_collector
+        if async_mode:
+            self.rest_api = AsyncRouterRestAPI(router_name, self.config_entry, internal_collector, backoff_settings)
+        else:
+            self.rest_api = RouterRestAPI(router_name, self.config_entry, internal_collector, backoff_settings)
         self.router_id = {
             ConfigKeys.ROUTERBOARD_NAME: self.router_name,
             ConfigKeys.ROUTERBOARD_ADDRESS: self.config_entry.hostname
-        }
\ No newline at end of file
+        }
+        self.label_dictionary = LabelDictionary(self.config_entry.label_dictionary_size, self.config_entry.label_dictionary_cycles)
+
+    def end_cycle(self):
+        ''' Called when none of the routers collector groups are loading
+        '''
+        self.rest_api.end_cycle()
+        self.label_dictionary.end_cycle()
+        if self.internal_collector:
+            self.internal_collector.set_label_dictionary_size(self.router_id, len(self.label_dictionary))
+
+class ReplayRouterEntry:
+    ''' RouterOS Entry handed to load_data in asyncio mode
+        Same router, but requests go through a ReplayRestAPI
+    '''
+    def __init__(self, router_entry: RouterEntry):
+        self.router_name = router_entry.router_name
+        self.config_entry = router_entry.config_entry
+        self.router_id = router_entry.router_id
+        self.rest_api = ReplayRestAPI(router_entry.rest_api)
@@ -13,23 +13,49 @@
 ## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
 ## GNU General Public License for more details.
 
+import aiohttp
+import asyncio
+import base64
 import requests
 import json
 import logging
 import time
 
+from urllib.parse import unquote
+
+from cli.config import ConfigKeys
+from flow.backoff import Backoff
+from flow.response_cache import ResponseCache, copy_response
+from utils.json_stream import CHUNK_SIZE, iter_chunks, iter_records
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collector.internal_collector import InternalCollector
+
 # Mikrotik returns everything with latin1 encoding
 mtik_encoding = 'latin1'
 
-class RouterRestAPI:
-    ''' Base wrapper for the routeros rest api
+# Initial delay, maximum delay and the failures per doubling, when not given from the system config
+DEFAULT_BACKOFF = (ConfigKeys.DEFAULT_INITIAL_DELAY, ConfigKeys.DEFAULT_MAX_DELAY, ConfigKeys.DEFAULT_INC_DIV)
+
+class BaseRouterRestAPI:
+    ''' Connection settings, retry state and response cache shared by the blocking and the asyncio api
+
+        Connection errors and timeouts back off the whole router, other failures only the failing endpoint
     '''
-    def __init__(self, router_name: str, config_entry):
+    def __init__(self, router_name: str, config_entry, internal_collector: 'InternalCollector | None' = None,
+                 backoff_settings: tuple[int, int, int] = DEFAULT_BACKOFF):
         self.router_name: str = router_name
         self.config_entry = config_entry
-        self.last_failure_timestamp: float = 0
-        self.successive_failure_count: int = 0
-        self.auth = (config_entry.username, config_entry.password)
+        self.internal_collector = internal_collector
+        self.cache = ResponseCache(config_entry.response_cache_ttl)
+
+        self.backoff_settings = backoff_settings
+        self.backoff = Backoff(*self.backoff_settings)
+        self.endpoint_backoffs: dict[str, Backoff] = {}
+        # Endpoints whose last request was refused with a client error
+        self.rejected_endpoints: set[str] = set()
 
         protocol = 'https' if config_entry.use_ssl else 'http'
         host_url = f'{protocol}://{config_entry.hostname}'
@@ -38,65 +64,424 @@ class RouterRestAPI:
         self.base_url = f'{host_url}/rest'
 
         self.timeout = config_entry.socket_timeout
-        self.retry_timer = time.time()
+
+    def end_cycle(self):
+        self.cache.end_cycle()
+
+    def backed_off(self) -> bool:
+        ''' True while the router is backed off, its loads would not reach it
+        '''
+        return self.backoff.blocked(time.time())
+
+    def blocked(self, path: str) -> bool:
+        now = time.time()
+        endpoint = self.endpoint_backoffs.get(path)
+        return self.backoff.blocked(now) or bool(endpoint and endpoint.blocked(now))
+
+    def rejected(self, path: str) -> bool:
+        ''' True if the router refused the last request of the endpoint (HTTP 4xx), also while it is backed off
+        '''
+        return path in self.rejected_endpoints
+
+    def succeeded(self, path: str):
+        if self.backoff.failures:
+            logging.info('%s: Router reachable again after %i failures', self.router_name, self.backoff.failures)
+            self.backoff.success()
+            self.export_backoff(None, self.backoff)
+        self.rejected_endpoints.discard(path)
+        endpoint = self.endpoint_backoffs.pop(path, None)
+        if endpoint:
+            endpoint.success()
+            self.export_backoff(path, endpoint)
+
+    def router_failed(self, exc: Exception):
+        if not self.backoff.failure(time.time()):
+            return
+        logging.warning('%s: Router failure %i, backing off for %.0fs: %s', self.router_name, self.backoff.failures, self.backoff.delay, exc)
+        self.export_backoff(None, self.backoff)
+
+    def endpoint_failed(self, path: str, exc: Exception):
+        status = http_status(exc)
+        if status is not None and 400 <= status < 500:
+            self.rejected_endpoints.add(path)
+        else:
+            self.rejected_endpoints.discard(path)
+        endpoint = self.endpoint_backoffs.get(path)
+        if not endpoint:
+            endpoint = self.endpoint_backoffs[path] = Backoff(*self.backoff_settings)
+        if not endpoint.failure(time.time()):
+            return
+        logging.warning('%s: %s failure %i, backing off for %.0fs: %s', self.router_name, path, endpoint.failures, endpoint.delay, exc)
+        self.export_backoff(path, endpoint)
+
+    def reset_backoff(self, path: str):
+        ''' Forgets the failures of the endpoint, for a retry before its backoff has passed
+        '''
+        endpoint = self.endpoint_backoffs.pop(path, None)
+        if endpoint:
+            endpoint.success()
+            self.export_backoff(path, endpoint)
+
+    def export_backoff(self, path: str | None, backoff: Backoff):
+        if not self.internal_collector:
+            return
+        if path is None:
+            self.internal_collector.set_router_backoff({ConfigKeys.ROUTERBOARD_NAME: self.router_name, ConfigKeys.ROUTERBOARD_ADDRESS: self.config_entry.hostname},
+                                                       backoff.delay, backoff.failures)
+        else:
+            self.internal_collector.set_endpoint_backoff(self.path_labels(path), backoff.delay, backoff.failures)
+
+    def path_labels(self, path: str) -> dict[str, str]:
+        return {'path': path, ConfigKeys.ROUTERBOARD_NAME: self.router_name, ConfigKeys.ROUTERBOARD_ADDRESS: self.config_entry.hostname}
+
+    def count_cache_lookup(self, path: str, hit: bool):
+        if self.internal_collector:
+            self.internal_collector.count_cache_lookup(self.path_labels(path), hit)
+
+    def decode(self, path: str, content: bytes, request_start: float, strict: bool = True):
+        ''' Decodes a response body, the request and decode time, body size
+            and record count go to the internal collector
+        '''
+        decode_start = time.perf_counter()
+        response = json.loads(content.decode(mtik_encoding), strict = strict)
+        if self.internal_collector:
+            records = len(response) if isinstance(response, list) else 1
+            self.internal_collector.observe_response(self.path_labels(path), decode_start - request_start, time.perf_counter() - decode_start, len(content), records)
+        return response
+
+    def decode_stream(self, path: str, chunks, request_seconds: float, strict: bool = True):
+        ''' Decodes the records of a response body as its chunks arrive, the decode
+            time includes reading the chunks, the body arrives while decoding
+        '''
+        size = 0
+        records = 0
+        decode_seconds = 0.0
+
+        def counted():
+            nonlocal size
+            for chunk in chunks:
+                size += len(chunk)
+                yield chunk
+
+        records_iter = iter_records(counted(), mtik_encoding, strict)
+        while True:
+            decode_start = time.perf_counter()
+            try:
+                record = next(records_iter)
+            except StopIteration:
+                break
+            finally:
+                decode_seconds += time.perf_counter() - decode_start
+            records += 1
+            yield record
+
+        if self.internal_collector:
+            self.internal_collector.observe_response(self.path_labels(path), request_seconds, decode_seconds, size, records)
+
+class RouterRestAPI(BaseRouterRestAPI):
+    ''' Base wrapper for the routeros rest api
+    '''
+    def __init__(self, router_name: str, config_entry, internal_collector: 'InternalCollector | None' = None,
+                 backoff_settings: tuple[int, int, int] = DEFAULT_BACKOFF):
+        super().__init__(router_name, config_entry, internal_collector, backoff_settings)
+        self.auth = (config_entry.username, config_entry.password)
         self.ses = requests.Session()
 
-    def get(self, path, params = {}):
-        if time.time() < self.retry_timer:
+    def get(self, path, params = {}, proplist: str | None = None):
+        params, properties = split_proplist(params, proplist)
+        response, hit = self.cache.get(f'{path} {request_key(params)}', properties, lambda fetched: self._get(path, with_properties(params, fetched)))
+        self.count_cache_lookup(path, hit)
+        return response
+
+    def _get(self, path, params):
+        if self.blocked(path):
             raise Exception("retry_timer_skip")
 
         url = f"{self.base_url}/{path}"
         logging.debug("Hitting %s", url)
         try:
+            start = time.perf_counter()
             resp = self.ses.get(url, auth=self.auth, timeout=self.timeout, params=params)
             resp.raise_for_status()
             logging.debug(f"Done, took: {resp.elapsed.total_seconds()}")
 
-            c = resp.content.decode(mtik_encoding)
-            return json.loads(c, strict = False)
-        except ConnectionError as connection_error:
-            # Connection error, set retry timer to 30s
-            self.retry_timer = time.time() + 30
+            response = self.decode(path, resp.content, start, strict = False)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as connection_error:
+            # Router unreachable or not answering
+            self.router_failed(connection_error)
             raise connection_error
-        except requests.exceptions.HTTPError as http_error:
-            # HTTP Error, no retry timer
-            raise http_error
-        except requests.exceptions.Timeout as timeout_error:
-            # Timeout, set retry timer to 30s
-            self.retry_timer = time.time() + 30
-            raise timeout_error
         except Exception as exc:
-            # Other exception set retry timer to 20s
-            self.retry_timer = time.time() + 20
+            # HTTP errors and unreadable responses, the endpoint fails
+            self.endpoint_failed(path, exc)
             raise exc
-    
+
+        self.succeeded(path)
+        return response
+
+    def get_stream(self, path, params = {}, proplist: str | None = None):
+        ''' Records of a GET response, decoded one at a time while the body is read
+
+            For large tables, the body, its text and all the records are never held at once.
+            Streamed responses bypass the response cache, errors are raised while iterating
+        '''
+        params = with_proplist(params, proplist)
+        if self.blocked(path):
+            raise Exception("retry_timer_skip")
+
+        url = f"{self.base_url}/{path}"
+        logging.debug("Streaming %s", url)
+        resp = None
+        try:
+            start = time.perf_counter()
+            resp = self.ses.get(url, auth=self.auth, timeout=self.timeout, params=params, stream=True)
+            resp.raise_for_status()
+            yield from self.decode_stream(path, resp.iter_content(CHUNK_SIZE), time.perf_counter() - start, strict = False)
+            logging.debug(f"Done, took: {time.perf_counter() - start}")
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as connection_error:
+            # Router unreachable or not answering, also when the body stops arriving
+            self.router_failed(connection_error)
+            raise connection_error
+        except GeneratorExit:
+            # The caller stopped early, the connection is not reused
+            raise
+        except Exception as exc:
+            self.endpoint_failed(path, exc)
+            raise exc
+        finally:
+            if resp is not None:
+                resp.close()
+
+        self.succeeded(path)
+
     def post(self, path, command, data):
-        if time.time() < self.retry_timer:
+        endpoint = f'{path}/{command}'
+        if self.blocked(endpoint):
             return []
 
-        url = f"{self.base_url}/{path}/{command}"
+        url = f"{self.base_url}/{endpoint}"
         logging.debug("Hitting %s", url)
         try:
+            start = time.perf_counter()
             resp = self.ses.post(url, auth=self.auth, timeout=self.timeout, json=data)
             resp.raise_for_status()
             logging.debug(f"Done, took: {resp.elapsed.total_seconds()}")
 
-            c = resp.content.decode(mtik_encoding)
-            return json.loads(c)
-        except ConnectionError as connection_error:
-            # Connection error, set retry timer to 30s
-            self.retry_timer = time.time() + 30
-        except requests.exceptions.HTTPError as http_error:
-            # HTTP Error, no retry timer
-            logging.critical(f'Unsuccesful HTTP Request: {http_error}')
-        except requests.exceptions.Timeout as timeout_error:
-            # Timeout, set retry timer to 30s
-            self.retry_timer = time.time() + 30
-            logging.critical(f'Timeout Occured: {timeout_error}')
+            response = self.decode(endpoint, resp.content, start)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as connection_error:
+            self.router_failed(connection_error)
+            return None
         except Exception as exc:
-            # Other exception set retry timer to 10s
-            self.retry_timer = time.time() + 10
-            logging.critical(f'Got Exception: {exc}')
+            self.endpoint_failed(endpoint, exc)
+            return None
+
+        self.succeeded(endpoint)
+        return response
+    
+
+class AsyncRouterRestAPI(BaseRouterRestAPI):
+    ''' asyncio wrapper for the routeros rest api, mirrors RouterRestAPI
+    '''
+    def __init__(self, router_name: str, config_entry, internal_collector: 'InternalCollector | None' = None,
+                 backoff_settings: tuple[int, int, int] = DEFAULT_BACKOFF):
+        super().__init__(router_name, config_entry, internal_collector, backoff_settings)
+        self.headers = {'Authorization': basic_auth(config_entry.username, config_entry.password)}
+        self.client_timeout = aiohttp.ClientTimeout(total=self.timeout)
+        self.ses: aiohttp.ClientSession | None = None
+
+    def session(self) -> aiohttp.ClientSession:
+        # The session has to be created inside the running event loop
+        if not self.ses or self.ses.closed:
+            self.ses = aiohttp.ClientSession(headers=self.headers, timeout=self.client_timeout)
+        return self.ses
+
+    async def close(self):
+        if self.ses:
+            await self.ses.close()
+
+    async def get(self, path, params = {}, proplist: str | None = None):
+        params, properties = split_proplist(params, proplist)
+        response, hit = await self.cache.get_async(f'{path} {request_key(params)}', properties, lambda fetched: self._get(path, with_properties(params, fetched)))
+        self.count_cache_lookup(path, hit)
+        return response
+
+    async def get_content(self, path, params = {}, proplist: str | None = None) -> tuple[bytes, float]:
+        ''' Body of a GET response and the request time, not decoded, for decode_stream
+            The replay of load_data needs the whole response, the body is the only copy held
+        '''
+        return await self._get(path, with_proplist(params, proplist), decode = False)
+
+    async def _get(self, path, params, decode: bool = True):
+        if self.blocked(path):
+            raise Exception("retry_timer_skip")
+
+        url = f"{self.base_url}/{path}"
+        logging.debug("Hitting %s", url)
+        try:
+            start = time.perf_counter()
+            async with self.session().get(url, params=params) as resp:
+                resp.raise_for_status()
+                content = await resp.read()
+            logging.debug(f"Done, took: {time.perf_counter() - start}")
+
+            if decode:
+                response = self.decode(path, content, start, strict = False)
+            else:
+                response = (content, time.perf_counter() - start)
+        except aiohttp.ClientResponseError as http_error:
+            self.endpoint_failed(path, http_error)
+            raise http_error
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as connection_error:
+            # Router unreachable or not answering
+            self.router_failed(connection_error)
+            raise connection_error
+        except Exception as exc:
+            self.endpoint_failed(path, exc)
+            raise exc
+
+        self.succeeded(path)
+        return response
+
+    async def post(self, path, command, data):
+        endpoint = f'{path}/{command}'
+        if self.blocked(endpoint):
+            return []
+
+        url = f"{self.base_url}/{endpoint}"
+        logging.debug("Hitting %s", url)
+        try:
+            start = time.perf_counter()
+            async with self.session().post(url, json=data) as resp:
+                resp.raise_for_status()
+                content = await resp.read()
+            logging.debug(f"Done, took: {time.perf_counter() - start}")
+
+            response = self.decode(endpoint, content, start)
+        except aiohttp.ClientResponseError as http_error:
+            self.endpoint_failed(endpoint, http_error)
+            return None
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as connection_error:
+            self.router_failed(connection_error)
+            return None
+        except Exception as exc:
+            self.endpoint_failed(endpoint, exc)
+            return None
+
+        self.succeeded(endpoint)
+        return response
+
+class PendingRequest(Exception):
+    ''' Raised by ReplayRestAPI when a response has not been fetched yet
+    '''
+    def __init__(self, key: str, fetch):
+        super().__init__(f'Pending request {key}')
+        self.key = key
+        self.fetch = fetch
+
+class ReplayRestAPI:
+    ''' Blocking facade over AsyncRouterRestAPI for the collectors load_data
+
+        Answers from the responses already fetched on the event loop and raises
+        PendingRequest for anything else, the caller awaits the request and
+        replays load_data from the start
+    '''
+    def __init__(self, rest_api: AsyncRouterRestAPI):
+        self.rest_api = rest_api
+        self.responses: dict[str, tuple[bool, object]] = {}
+
+    def get(self, path, params = {}, proplist: str | None = None):
+        key = f'GET {path} {request_key(with_proplist(params, proplist))}'
+        return self._replay(key, lambda: self.rest_api.get(path, params, proplist))
+
+    def get_stream(self, path, params = {}, proplist: str | None = None):
+        ''' Records of a GET response decoded one at a time, from the body fetched on the event loop
+        '''
+        key = f'STREAM {path} {request_key(with_proplist(params, proplist))}'
+        content, request_seconds = self._replay(key, lambda: self.rest_api.get_content(path, params, proplist))
+        return self.rest_api.decode_stream(path, iter_chunks(content), request_seconds, strict = False)
+
+    def post(self, path, command, data):
+        key = f'POST {path}/{command} {request_key(data)}'
+        return self._replay(key, lambda: self.rest_api.post(path, command, data))
+
+    def reset_backoff(self, path: str):
+        self.rest_api.reset_backoff(path)
+
+    def backed_off(self) -> bool:
+        return self.rest_api.backed_off()
+
+    def rejected(self, path: str) -> bool:
+        return self.rest_api.rejected(path)
+
+    async def fetch(self, pending: PendingRequest):
+        try:
+            self.responses[pending.key] = (True, await pending.fetch())
+        except Exception as exc:
+            self.responses[pending.key] = (False, exc)
+
+    def _replay(self, key: str, fetch):
+        if key not in self.responses:
+            raise PendingRequest(key, fetch)
+
+        ok, response = self.responses[key]
+        if not ok:
+            raise response
+        # Collectors modify the records in place, every replay gets its own copy
+        return copy_response(response)
+
+def basic_auth(username: str, password: str) -> str:
+    ''' Authorization header value, encoded like the requests basic auth of RouterRestAPI
+    '''
+    credentials = f'{username}:{password}'.encode(mtik_encoding)
+    return f'Basic {base64.b64encode(credentials).decode("ascii")}'
+
+def http_status(exc: Exception) -> int | None:
+    ''' HTTP status of a failed request, of either api
+    '''
+    if isinstance(exc, requests.exceptions.HTTPError) and exc.response is not None:
+        return exc.response.status_code
+    if isinstance(exc, aiohttp.ClientResponseError):
+        return exc.status
+    return None
+
+def query_proplist(query: str) -> tuple[str, str | None]:
+    ''' (query string without its .proplist, the .proplist of the query or None)
+    '''
+    parts = query.split('&') if query else []
+    rest = [part for part in parts if not part.startswith('.proplist=')]
+    if len(rest) == len(parts):
+        return query, None
+    proplist = next(part for part in parts if part.startswith('.proplist='))
+    return '&'.join(rest), unquote(proplist[len('.proplist='):])
+
+def with_proplist(params, proplist: str | None):
+    ''' Restrict the returned properties to proplist, unless the caller already did
+    '''
+    if not proplist:
+        return params
+    if isinstance(params, str):
+        if query_proplist(params)[1] is not None:
+            return params
+        return f'{params}&.proplist={proplist}' if params else {'.proplist': proplist}
+    if '.proplist' in params:
+        return params
+    return {**params, '.proplist': proplist}
+
+def split_proplist(params, proplist: str | None):
+    ''' (params without the .proplist, properties to return or None for all), the .proplist of params wins like in with_proplist
+    '''
+    if isinstance(params, str):
+        query, own = query_proplist(params)
+        if own is not None:
+            params, proplist = query or {}, own
+    elif isinstance(params, dict) and '.proplist' in params:
+        params = dict(params)
+        proplist = params.pop('.proplist')
+    return params, frozenset(proplist.split(',')) if proplist else None
+
+def with_properties(params, properties: frozenset[str] | None):
+    return with_proplist(params, ','.join(sorted(properties)) if properties is not None else None)
 
-        return None
-    
\ No newline at end of file
+def request_key(params) -> str:
+    if isinstance(params, str):
+        return params
+    return json.dumps(params, sort_keys=True)
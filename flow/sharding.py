@@ -0,0 +1,49 @@
+# coding=utf8
+## Copyright (c) 2020 Arseniy Kuznetsov
+## Copyright (c) 2024 Martti Anttila
+##
+## This program is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License
+## as published by the Free Software Foundation; either version 2
+## of the License, or (at your option) any later version.
+##
+## This program is distributed in the hope that it will be useful,
+## but WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+## GNU General Public License for more details.
+
+''' Sharding of the routers across exporter instances
+
+    Every router is polled by the shard with the highest hash of the shard and router names
+    (rendezvous hashing). All instances compute the same assignment from the same config, and
+    adding or removing a shard only moves the routers it gains or owned
+'''
+
+import hashlib
+
+def shard_weight(shard: str, router_name: str) -> int:
+    digest = hashlib.blake2b(f'{shard}/{router_name}'.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big')
+
+def shard_owner(router_name: str, shards: list[str]) -> str:
+    return max(shards, key=lambda shard: shard_weight(shard, router_name))
+
+class Sharding:
+    ''' Shards of the instances and the one of this instance
+
+        The shards are either named in members, this instance being member,
+        or numbered 0 to count - 1, this instance being index
+    '''
+    def __init__(self, index: int, count: int, members: list[str] | None = None, member: str = ''):
+        if members:
+            self.shards = [str(m) for m in members]
+            self.shard = str(member)
+        else:
+            self.shards = [str(i) for i in range(max(count, 1))]
+            self.shard = str(index)
+
+        if self.shard not in self.shards:
+            raise ValueError(f'Shard {self.shard} is not one of the shards {", ".join(self.shards)}')
+
+    def owner(self, router_name: str) -> str:
+        return shard_owner(router_name, self.shards)
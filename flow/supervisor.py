@@ -0,0 +1,213 @@
+# coding=utf8
+## Copyright (c) 2020 Arseniy Kuznetsov
+## Copyright (c) 2024 Martti Anttila
+##
+## This program is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License
+## as published by the Free Software Foundation; either version 2
+## of the License, or (at your option) any later version.
+##
+## This program is distributed in the hope that it will be useful,
+## but WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+## GNU General Public License for more details.
+
+''' Multi-process mode
+
+    The routers are split across worker processes, each running its own scheduler and REST sessions.
+    The workers send the snapshots of their collectors to the supervisor through pipes, and the
+    supervisor serves them, next to its own metrics, from one /metrics endpoint
+'''
+
+import logging
+import multiprocessing
+import os
+import threading
+
+from collections.abc import Callable
+from multiprocessing.connection import Connection
+from signal import SIGTERM
+from time import time, sleep
+
+from prometheus_client.core import REGISTRY
+from prometheus_client.exposition import generate_latest
+from prometheus_client.parser import text_string_to_metric_families
+from prometheus_client.registry import Collector
+
+from flow.backoff import Backoff
+from flow.exposition import Snapshot, EMPTY_SNAPSHOT, SYSTEM_GROUP
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from flow.exposition import SnapshotRegistry
+    from collector.internal_collector import InternalCollector
+
+# Seconds between the snapshot updates sent by a worker
+PUBLISH_INTERVAL = 1
+# Key of the internal metrics of a worker
+INTERNAL_KEY = 'internal'
+# Restart delay of a failing worker, doubling up to the maximum
+RESTART_DELAY = 1
+MAX_RESTART_DELAY = 60
+
+def partition(router_names: list[str], count: int) -> list[list[str]]:
+    ''' Splits the routers into count shares, differing in size by one at most
+    '''
+    return [router_names[i::count] for i in range(count)]
+
+class RemoteCollector:
+    ''' Snapshot of a collector of a worker process
+    '''
+    def __init__(self, name: str):
+        self.name = name
+        self.snapshot = EMPTY_SNAPSHOT
+        # Load interval of the collector in the worker
+        self.interval = 0
+
+    def collect(self):
+        # Only the prometheus client fallback (OpenMetrics, name[] filters) needs the metric families
+        yield from text_string_to_metric_families(self.snapshot.text.decode('utf-8'))
+
+class SnapshotPublisher:
+    ''' Sends the changed snapshots of a worker process to the supervisor
+
+        Loaded collectors have a new snapshot object, the unchanged ones are not sent again.
+        The internal metrics of the worker are rendered and sent every time
+    '''
+    def __init__(self, snapshots: 'SnapshotRegistry', conn: Connection, registry: Collector = REGISTRY):
+        self.snapshots = snapshots
+        self.conn = conn
+        self.registry = registry
+        self.sent: dict[int, Snapshot] = {}
+
+    def start(self):
+        t = threading.Thread(target=self.run, daemon=True)
+        t.start()
+
+    def run(self):
+        while True:
+            try:
+                self.publish()
+            except (OSError, EOFError):
+                logging.error('Lost the connection to the supervisor, stopping')
+                os.kill(os.getpid(), SIGTERM)
+                return
+            sleep(PUBLISH_INTERVAL)
+
+    def publish(self):
+        current = {id(c): c for c in self.snapshots.collectors}
+        targets = {id(c): target for target, registry in self.snapshots.targets.items() for c in registry.collectors}
+        groups = {id(c): group for group, registry in self.snapshots.groups.items() for c in registry.collectors}
+        for key in [key for key in self.sent if key not in current]:
+            self.conn.send((key, None, 0, None, None))
+            del self.sent[key]
+
+        for key, collector in current.items():
+            snapshot = collector.snapshot
+            if self.sent.get(key) is not snapshot:
+                self.conn.send((key, snapshot.text, collector.interval, targets.get(key), groups.get(key)))
+                self.sent[key] = snapshot
+
+        self.conn.send((INTERNAL_KEY, generate_latest(self.registry), 0, None, SYSTEM_GROUP))
+
+class Worker:
+    ''' Supervisor side of a worker process
+    '''
+    def __init__(self, index: int, router_names: list[str]):
+        self.index = index
+        self.router_names = router_names
+        self.process: multiprocessing.process.BaseProcess | None = None
+        self.backoff = Backoff(RESTART_DELAY, MAX_RESTART_DELAY, 1)
+        self.started_at: float = 0
+        self.exited = False
+
+class Supervisor:
+    ''' Runs the worker processes and registers their snapshots
+
+        target runs in each worker process, called with the worker index, its routers and the write end of the pipe.
+        A worker that exits is started again, after a delay doubling while it keeps failing
+    '''
+    def __init__(self, target: Callable, router_names: list[str], processes: int, snapshots: 'SnapshotRegistry', internal_collector: 'InternalCollector'):
+        self.target = target
+        self.snapshots = snapshots
+        self.internal_collector = internal_collector
+        # Spawned, forking the supervisor threads and locks is not safe
+        self.context = multiprocessing.get_context('spawn')
+        self.workers = [Worker(index, names) for index, names in enumerate(partition(router_names, processes))]
+        self.stopping = False
+
+    def start(self):
+        for worker in self.workers:
+            self.internal_collector.set_worker_routers(worker.index, len(worker.router_names))
+            self.start_worker(worker)
+        threading.Thread(target=self.supervise, daemon=True).start()
+
+    def stop(self):
+        self.stopping = True
+        for worker in self.workers:
+            if worker.process and worker.process.is_alive():
+                worker.process.terminate()
+        for worker in self.workers:
+            if worker.process:
+                worker.process.join(5)
+
+    def start_worker(self, worker: Worker):
+        logging.info('Starting worker %i for %i routers', worker.index, len(worker.router_names))
+        conn, child_conn = self.context.Pipe(duplex=False)
+        worker.process = self.context.Process(target=self.target, args=(worker.index, worker.router_names, child_conn), name=f'mtik_exporter-worker-{worker.index}', daemon=True)
+        worker.process.start()
+        # The worker holds the only write end, so the pipe closes when it exits
+        child_conn.close()
+        worker.started_at = time()
+        worker.exited = False
+        threading.Thread(target=self.receive, args=(worker, conn), daemon=True).start()
+
+    def receive(self, worker: Worker, conn: Connection):
+        ''' Registers the snapshots of a worker process until it exits, then drops them
+        '''
+        collectors: dict[int | str, RemoteCollector] = {}
+        while True:
+            try:
+                key, text, interval, target, group = conn.recv()
+            except (OSError, EOFError):
+                break
+
+            collector = collectors.get(key)
+            if text is None:
+                if collector:
+                    del collectors[key]
+                    self.snapshots.unregister(collector)
+                continue
+
+            if not collector:
+                collector = collectors[key] = RemoteCollector(f'Worker{worker.index}')
+                self.snapshots.register(collector, target, group)
+            collector.snapshot = Snapshot(text)
+            collector.interval = interval
+
+        conn.close()
+        for collector in collectors.values():
+            self.snapshots.unregister(collector)
+
+    def supervise(self):
+        while not self.stopping:
+            sleep(1)
+            now = time()
+            for worker in self.workers:
+                if self.stopping or not worker.process:
+                    continue
+
+                if worker.process.is_alive():
+                    # A worker running for a while is no longer failing
+                    if worker.backoff.failures and now - worker.started_at > MAX_RESTART_DELAY:
+                        worker.backoff.success()
+                    continue
+
+                if not worker.exited:
+                    worker.exited = True
+                    worker.backoff.failure(now)
+                    logging.warning('Worker %i exited with code %s, restarting in %.0f seconds', worker.index, worker.process.exitcode, worker.backoff.delay)
+                if not worker.backoff.blocked(now):
+                    self.internal_collector.count_worker_restart(worker.index)
+                    self.start_worker(worker)
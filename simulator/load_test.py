@@ -0,0 +1,195 @@
+# coding=utf8
+## Copyright (c) 2020 Arseniy Kuznetsov
+## Copyright (c) 2024 Martti Anttila
+##
+## This program is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License
+## as published by the Free Software Foundation; either version 2
+## of the License, or (at your option) any later version.
+##
+## This program is distributed in the hope that it will be useful,
+## but WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+## GNU General Public License for more details.
+
+''' Fleet load test: export.py against simulated fleets of growing size
+
+    python -m simulator.load_test --fleet 10,100,500 [--duration 120] [--warmup 30] [--scale 0.05]
+        [--polling-interval 10] [--async-mode] [--worker-processes 4] [--latency 0.05 --jitter 0.02 --error-rate 0.01] [--output results.json]
+
+    per fleet size: scrape latency (p50, p95, max) and size, loads, loads skipped because the previous load
+    of the router was still running (cycle overrun), load errors, load time and the exporter resident memory
+'''
+
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import yaml
+
+from argparse import ArgumentParser
+from urllib import request
+
+from cli.config import ConfigKeys
+from simulator.routeros import DEFAULT_COLLECTORS, DEFAULT_SLOW_COLLECTORS, collector_list, fleet_config
+
+# Samples of the exporter's own metrics: result key
+OWN_METRICS = {
+    'mtik_exporter_data_load_count_total': 'loads',
+    'mtik_exporter_skipped_loads_total': 'skipped_loads',
+    'mtik_exporter_data_load_errors_total': 'load_errors',
+    'mtik_exporter_data_load_time_total': 'load_seconds',
+    'process_resident_memory_bytes': 'rss_bytes',
+}
+OWN_METRIC_PREFIXES = ('mtik_exporter_data_load', 'mtik_exporter_skipped_loads', 'process_resident_memory_bytes')
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def wait_for_port(port: int, timeout: float):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise TimeoutError(f'nothing listening on port {port}')
+
+def scrape(port: int) -> tuple[float, bytes]:
+    start = time.perf_counter()
+    with request.urlopen(f'http://127.0.0.1:{port}/metrics', timeout=60) as response:
+        body = response.read()
+    return time.perf_counter() - start, body
+
+def totals(body: bytes) -> dict[str, float]:
+    ''' Sums over all series of the exporter's own metrics
+    '''
+    result = dict.fromkeys(OWN_METRICS.values(), 0.0)
+    # The collector metrics are most of the body, only the samples of the exporter's own are read
+    for line in body.decode('utf-8').splitlines():
+        if line.startswith(OWN_METRIC_PREFIXES):
+            key = OWN_METRICS.get(line.split('{', 1)[0].split(' ', 1)[0])
+            if key:
+                result[key] += float(line.rsplit(' ', 1)[1])
+    return result
+
+def percentile(values: list[float], p: float) -> float:
+    values = sorted(values)
+    return values[min(int(len(values) * p), len(values) - 1)] if values else 0
+
+def run_fleet(routers: int, args, workdir: str) -> dict:
+    base_port = args.base_port
+    export_port = free_port()
+    system = {ConfigKeys.EXPORTER_PORT: export_port, ConfigKeys.EXPORTER_ADDR: '127.0.0.1',
+              ConfigKeys.MAX_WORKERS_KEY: args.max_workers, ConfigKeys.ASYNC_MODE_KEY: args.async_mode,
+              ConfigKeys.WORKER_PROCESSES_KEY: args.worker_processes}
+    config = fleet_config(routers, '127.0.0.1', base_port, args.paths, collector_list(args.collectors), collector_list(args.slow_collectors),
+                          args.polling_interval, args.slow_polling_interval, system)
+    cfg_file = os.path.join(workdir, f'fleet-{routers}.yml')
+    with open(cfg_file, 'w') as f:
+        yaml.safe_dump(config, f, sort_keys=False)
+
+    simulator_cmd = [sys.executable, '-m', 'simulator.routeros', 'serve', '--routers', str(routers), '--base-port', str(base_port),
+                     '--scale', str(args.scale), '--latency', str(args.latency), '--jitter', str(args.jitter), '--error-rate', str(args.error_rate),
+                     '--drip-rate', str(args.drip_rate), '--drip-delay', str(args.drip_delay)]
+    if args.paths:
+        simulator_cmd.append('--paths')
+    if args.size:
+        simulator_cmd += ['--size', args.size]
+
+    processes = []
+    try:
+        processes.append(subprocess.Popen(simulator_cmd, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+        wait_for_port(base_port + (0 if args.paths else routers - 1), 60)
+        processes.append(subprocess.Popen([sys.executable, 'export.py', '--cfg-file', cfg_file], cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+        wait_for_port(export_port, 60)
+
+        time.sleep(args.warmup)
+        _, body = scrape(export_port)
+        before = totals(body)
+
+        latencies = []
+        sizes = []
+        rss = 0.0
+        end = time.time() + args.duration
+        while time.time() < end:
+            latency, body = scrape(export_port)
+            latencies.append(latency)
+            sizes.append(len(body))
+            rss = max(rss, totals(body)['rss_bytes'])
+            time.sleep(max(args.scrape_interval - latency, 0))
+        after = totals(body)
+    finally:
+        for p in reversed(processes):
+            p.terminate()
+            try:
+                p.wait(10)
+            except subprocess.TimeoutExpired:
+                # Loads stuck on slow-drip responses keep the exporter from exiting
+                p.kill()
+                p.wait()
+
+    return {
+        'routers': routers,
+        'scrapes': len(latencies),
+        'scrape_p50_seconds': percentile(latencies, 0.5),
+        'scrape_p95_seconds': percentile(latencies, 0.95),
+        'scrape_max_seconds': max(latencies, default=0),
+        'scrape_bytes': max(sizes, default=0),
+        # Counters over the measured period, the warm up excluded
+        'loads': after['loads'] - before['loads'],
+        'skipped_loads': after['skipped_loads'] - before['skipped_loads'],
+        'load_errors': after['load_errors'] - before['load_errors'],
+        'load_seconds': after['load_seconds'] - before['load_seconds'],
+        'rss_bytes': rss,
+    }
+
+def main():
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument('--fleet', default='10,100', help='comma separated fleet sizes')
+    parser.add_argument('--duration', type=float, default=120, help='measured seconds per fleet size')
+    parser.add_argument('--warmup', type=float, default=30, help='seconds before measuring, at least a slow polling interval')
+    parser.add_argument('--scrape-interval', type=float, default=5)
+    parser.add_argument('--base-port', type=int, default=18000)
+    parser.add_argument('--paths', action='store_true', help='all virtual routers on one port')
+    parser.add_argument('--scale', type=float, default=0.05, help='factor on the table sizes of benchmark.fixtures.DEFAULT_SIZES')
+    parser.add_argument('--size', default='', help='table sizes by collector key, e.g. dhcp=500,route=10000')
+    parser.add_argument('--collectors', default=','.join(DEFAULT_COLLECTORS))
+    parser.add_argument('--slow-collectors', default=','.join(DEFAULT_SLOW_COLLECTORS))
+    parser.add_argument('--polling-interval', type=int, default=ConfigKeys.DEFAULT_POLLING_INTERVAL)
+    parser.add_argument('--slow-polling-interval', type=int, default=ConfigKeys.DEFAULT_SLOW_POLLING_INTERVAL)
+    parser.add_argument('--max-workers', type=int, default=ConfigKeys.DEFAULT_MAX_WORKERS)
+    parser.add_argument('--async-mode', action='store_true')
+    parser.add_argument('--worker-processes', type=int, default=ConfigKeys.DEFAULT_WORKER_PROCESSES, help='resident memory is of the supervisor process only')
+    parser.add_argument('--latency', type=float, default=0)
+    parser.add_argument('--jitter', type=float, default=0)
+    parser.add_argument('--error-rate', type=float, default=0)
+    parser.add_argument('--drip-rate', type=float, default=0)
+    parser.add_argument('--drip-delay', type=float, default=0.5)
+    parser.add_argument('--output', default='', help='write the results as JSON to this file')
+    args = parser.parse_args()
+
+    results = []
+    print(f'{"routers":>8} {"scrapes":>8} {"p50 ms":>8} {"p95 ms":>8} {"max ms":>8} {"MB":>7} {"loads":>7} {"skipped":>8} {"errors":>7} {"RSS MB":>7}')
+    with tempfile.TemporaryDirectory() as workdir:
+        for routers in [int(n) for n in args.fleet.split(',') if n]:
+            r = run_fleet(routers, args, workdir)
+            results.append(r)
+            print(f'{r["routers"]:>8} {r["scrapes"]:>8} {r["scrape_p50_seconds"] * 1000:>8.1f} {r["scrape_p95_seconds"] * 1000:>8.1f}'
+                  f' {r["scrape_max_seconds"] * 1000:>8.1f} {r["scrape_bytes"] / 1e6:>7.2f} {r["loads"]:>7.0f} {r["skipped_loads"]:>8.0f}'
+                  f' {r["load_errors"]:>7.0f} {r["rss_bytes"] / 1e6:>7.1f}')
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'args': vars(args), 'results': results}, f, indent=2)
+
+if __name__ == '__main__':
+    sys.exit(main())
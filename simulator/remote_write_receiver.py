@@ -0,0 +1,144 @@
+# coding=utf8
+## Copyright (c) 2020 Arseniy Kuznetsov
+## Copyright (c) 2024 Martti Anttila
+##
+## This program is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License
+## as published by the Free Software Foundation; either version 2
+## of the License, or (at your option) any later version.
+##
+## This program is distributed in the hope that it will be useful,
+## but WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+## GNU General Public License for more details.
+
+''' Stand-in Prometheus remote write receiver, for testing the exporter push mode
+
+    python -m simulator.remote_write_receiver --port 19291 [--latency 0.05] [--error-rate 0.1] [--status 503]
+
+    Point the exporter at http://127.0.0.1:19291/api/v1/write, GET /stats returns the received
+    requests, samples, series and out of order samples as JSON
+'''
+
+import json
+import logging
+import random
+import sys
+import threading
+import time
+
+from argparse import ArgumentParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from utils import snappy
+from utils.prompb import decode_write_request
+
+class ReceiverStats:
+    ''' Received samples, and the last timestamp of every series to spot samples out of order
+    '''
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.failed_requests = 0
+        self.bytes = 0
+        self.samples = 0
+        self.out_of_order = 0
+        self.last_timestamps: dict[tuple, int] = {}
+
+    def add(self, size: int, timeseries: list[tuple[dict[str, str], list[tuple[float, int]]]]):
+        with self.lock:
+            self.requests += 1
+            self.bytes += size
+            for labels, samples in timeseries:
+                key = tuple(sorted(labels.items()))
+                for _, timestamp in samples:
+                    self.samples += 1
+                    if timestamp < self.last_timestamps.get(key, 0):
+                        self.out_of_order += 1
+                    else:
+                        self.last_timestamps[key] = timestamp
+
+    def as_dict(self) -> dict[str, int]:
+        with self.lock:
+            return {
+                'requests': self.requests,
+                'failed_requests': self.failed_requests,
+                'bytes': self.bytes,
+                'samples': self.samples,
+                'series': len(self.last_timestamps),
+                'out_of_order': self.out_of_order,
+            }
+
+class ReceiverHandler(BaseHTTPRequestHandler):
+    ''' POST /api/v1/write and GET /stats
+    '''
+    protocol_version = 'HTTP/1.1'
+    server: 'ReceiverServer'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path != '/stats':
+            return self.reply(404, b'Not Found')
+        self.reply(200, json.dumps(self.server.stats.as_dict()).encode('utf-8'), 'application/json')
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if self.path != '/api/v1/write':
+            return self.reply(404, b'Not Found')
+
+        time.sleep(self.server.latency)
+        if random.random() < self.server.error_rate:
+            with self.server.stats.lock:
+                self.server.stats.failed_requests += 1
+            return self.reply(self.server.status, b'Injected failure')
+
+        if self.headers.get('Content-Encoding') != 'snappy':
+            return self.reply(400, b'Expected a snappy body')
+        try:
+            timeseries = decode_write_request(snappy.decompress(body))
+        except (ValueError, IndexError) as exc:
+            return self.reply(400, f'Invalid write request: {exc}'.encode('utf-8'))
+
+        self.server.stats.add(len(body), timeseries)
+        self.reply(204, b'')
+
+    def reply(self, code: int, body: bytes, content_type: str = 'text/plain'):
+        self.send_response(code)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+class ReceiverServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str, int], latency: float = 0, error_rate: float = 0, status: int = 503):
+        self.stats = ReceiverStats()
+        self.latency = latency
+        self.error_rate = error_rate
+        self.status = status
+        super().__init__(address, ReceiverHandler)
+
+def main():
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=19291)
+    parser.add_argument('--latency', type=float, default=0, help='response delay in seconds')
+    parser.add_argument('--error-rate', type=float, default=0, help='share of requests answered with --status')
+    parser.add_argument('--status', type=int, default=503, help='status of the failed requests')
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    logging.basicConfig(format='%(levelname)s %(message)s', level=logging.INFO)
+    random.seed(args.seed)
+    server = ReceiverServer((args.host, args.port), args.latency, args.error_rate, args.status)
+    logging.info('Receiving remote writes on http://%s:%i/api/v1/write', args.host, args.port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+if __name__ == '__main__':
+    sys.exit(main())
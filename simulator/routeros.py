@@ -0,0 +1,334 @@
+# coding=utf8
+## Copyright (c) 2020 Arseniy Kuznetsov
+## Copyright (c) 2024 Martti Anttila
+##
+## This program is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License
+## as published by the Free Software Foundation; either version 2
+## of the License, or (at your option) any later version.
+##
+## This program is distributed in the hope that it will be useful,
+## but WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+## GNU General Public License for more details.
+
+''' RouterOS REST API simulator, a fleet of virtual routers for load testing the exporter
+
+    Serve 100 routers on ports 18000-18099, tables at a tenth of the benchmark sizes:
+    python -m simulator.routeros serve --routers 100 --base-port 18000 --scale 0.1 [--latency 0.05 --jitter 0.02]
+        [--error-rate 0.01] [--drip-rate 0.01 --drip-delay 0.5] [--paths]
+
+    Write the matching exporter config:
+    python -m simulator.routeros config --routers 100 --base-port 18000 -o fleet.yml [--paths]
+
+    With --paths all routers share one port and are told apart by the first path segment, /<router>/rest/...
+'''
+
+import json
+import logging
+import random
+import sys
+import threading
+import time
+import yaml
+
+from argparse import ArgumentParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+from benchmark.fixtures import COLLECTOR_PATHS, DEFAULT_SIZES, RESPONSES, response_sizes, select
+from cli.config import ConfigKeys
+
+# RouterOS responses are latin1
+ROUTEROS_ENCODING = 'latin1'
+
+DEFAULT_COLLECTORS = ['dhcp', 'system_resource', 'health', 'interface', 'firewall_filter', 'firewall_mangle', 'ipv6_firewall_filter',
+                      'ipv6_firewall_mangle', 'ipv6_neighbor', 'wifi_clients', 'netwatch', 'arp', 'user', 'queue_simple', 'queue_tree', 'wireguard_peers']
+DEFAULT_SLOW_COLLECTORS = ['route', 'ipv6_route']
+
+def router_name(i: int) -> str:
+    return f'router-{i:04}'
+
+class Faults:
+    ''' Response latency, failures and slow-drip bodies of the virtual routers
+    '''
+    def __init__(self, latency: float = 0, jitter: float = 0, error_rate: float = 0, drip_rate: float = 0, drip_delay: float = 0.5, drip_chunk: int = 1024):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.drip_rate = drip_rate
+        self.drip_delay = drip_delay
+        self.drip_chunk = max(drip_chunk, 1)
+
+    def delay(self) -> float:
+        return max(self.latency + random.uniform(-self.jitter, self.jitter), 0)
+
+    def fail(self) -> bool:
+        return random.random() < self.error_rate
+
+    def drip(self) -> bool:
+        return random.random() < self.drip_rate
+
+class Tables:
+    ''' RouterOS tables shared by all virtual routers, generated on first use
+        Response bodies are encoded once per request and reused
+    '''
+    def __init__(self, sizes: dict[str, int]):
+        self.sizes = sizes
+        self.tables: dict[str, object] = {}
+        self.bodies: dict[tuple, bytes] = {}
+        self.lock = threading.Lock()
+
+    def table(self, path: str):
+        table = self.tables.get(path)
+        if table is None:
+            with self.lock:
+                table = self.tables.get(path)
+                if table is None:
+                    table = self.tables[path] = RESPONSES[path](self.sizes.get(path, 1))
+        return table
+
+    def get(self, path: str, query: str) -> bytes | None:
+        key = (path, query)
+        body = self.bodies.get(key)
+        if body is None:
+            if path not in RESPONSES:
+                return None
+            params = dict(parse_qsl(query, keep_blank_values=True))
+            proplist = params.pop('.proplist', None)
+            body = self.bodies[key] = encode(select(self.table(path), params, proplist))
+        return body
+
+    def monitor(self, path: str, ids: str) -> bytes | None:
+        monitor_path = f'{path}/monitor'
+        if monitor_path not in RESPONSES:
+            return None
+        table = self.table(monitor_path)
+        records = []
+        for i in filter(None, ids.split(',')):
+            # RouterOS ids are *<hex>, the tables number them from *1
+            try:
+                records.append(table[(int(i.lstrip('*'), 16) - 1) % len(table)])
+            except (ValueError, ZeroDivisionError):
+                continue
+        return encode(records)
+
+    def count(self, path: str, query: list[str]) -> bytes | None:
+        ''' Answer of a count-only print, the records matching all the .query words
+        '''
+        if path not in RESPONSES:
+            return None
+        words = [word.partition('=') for word in query]
+        # Flags a record does not have are false on the router
+        count = sum(1 for r in self.table(path) if all(str(r.get(key, 'false')) == value for key, _, value in words))
+        return encode({'ret': str(count)})
+
+def encode(response) -> bytes:
+    return json.dumps(response).encode(ROUTEROS_ENCODING)
+
+class RouterOSHandler(BaseHTTPRequestHandler):
+    ''' /rest GET, and monitor and count-only print POST of the virtual routers
+    '''
+    protocol_version = 'HTTP/1.1'
+    server: 'RouterOSServer'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        router, path, query = self.route()
+        if path is None:
+            return self.send_error_json(404, 'Not Found')
+        if self.server.faults.fail():
+            return self.send_error_json(500, 'Internal Server Error')
+
+        if path == 'system/identity':
+            body = encode({'name': router})
+        else:
+            body = self.server.tables.get(path, query)
+        if body is None:
+            return self.send_error_json(404, 'Not Found')
+        self.send_json(body)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        data = json.loads(self.rfile.read(length) or b'{}')
+        _, path, _ = self.route()
+        if path is None or not (path.endswith('/monitor') or path.endswith('/print') and 'count-only' in data):
+            return self.send_error_json(400, 'Bad Request')
+        if self.server.faults.fail():
+            return self.send_error_json(500, 'Internal Server Error')
+
+        if path.endswith('/print'):
+            body = self.server.tables.count(path[:-len('/print')], list(data.get('.query', [])))
+        else:
+            body = self.server.tables.monitor(path[:-len('/monitor')], str(data.get('.id', '')))
+        if body is None:
+            return self.send_error_json(404, 'Not Found')
+        self.send_json(body)
+
+    def route(self) -> tuple[str, str | None, str]:
+        ''' (router, REST path, query) of the request
+        '''
+        url = urlsplit(self.path)
+        prefix, sep, path = url.path.lstrip('/').partition('rest/')
+        if not sep:
+            return '', None, ''
+        router = prefix.strip('/') or self.server.router
+        if router not in self.server.routers:
+            return router, None, ''
+        return router, path.strip('/'), url.query
+
+    def send_json(self, body: bytes):
+        faults = self.server.faults
+        time.sleep(faults.delay())
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if not faults.drip():
+            self.wfile.write(body)
+            return
+
+        for i in range(0, len(body), faults.drip_chunk):
+            self.wfile.write(body[i:i + faults.drip_chunk])
+            self.wfile.flush()
+            time.sleep(faults.drip_delay)
+
+    def send_error_json(self, code: int, message: str):
+        body = encode({'error': code, 'message': message})
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+class RouterOSServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, address: tuple[str, int], routers: set[str], tables: Tables, faults: Faults):
+        # The router of the port, when the routers are not told apart by path
+        self.router = next(iter(routers)) if len(routers) == 1 else ''
+        self.routers = routers
+        self.tables = tables
+        self.faults = faults
+        super().__init__(address, RouterOSHandler)
+
+def serve(routers: int, host: str, base_port: int, paths: bool, tables: Tables, faults: Faults) -> list[RouterOSServer]:
+    ''' Starts the servers of the fleet, one per router or one for all routers with paths
+    '''
+    names = [router_name(i) for i in range(routers)]
+    if paths:
+        servers = [RouterOSServer((host, base_port), set(names), tables, faults)]
+    else:
+        servers = [RouterOSServer((host, base_port + i), {name}, tables, faults) for i, name in enumerate(names)]
+
+    for server in servers:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    return servers
+
+def fleet_config(routers: int, host: str, base_port: int, paths: bool, collectors: list[str], slow_collectors: list[str],
+                 polling_interval: int, slow_polling_interval: int, system: dict) -> dict:
+    ''' Exporter config of the simulated fleet
+    '''
+    config = {ConfigKeys.SYSTEM_CONFIG_ENTRY_NAME: {ConfigKeys.CHECK_FOR_UPDATES_KEY: False, **system}}
+    for i in range(routers):
+        name = router_name(i)
+        entry = {
+            ConfigKeys.ENABLED_KEY: True,
+            ConfigKeys.USER_KEY: 'simulator',
+            ConfigKeys.PASSWD_KEY: 'simulator',
+            ConfigKeys.POLLING_INTERVAL_KEY: polling_interval,
+            ConfigKeys.SLOW_POLLING_INTERVAL_KEY: slow_polling_interval,
+            ConfigKeys.FAST_POLLING_KEYS: list(collectors),
+            ConfigKeys.SLOW_POLLING_KEYS: list(slow_collectors),
+        }
+        if paths:
+            # RouterRestAPI appends /rest to the hostname
+            entry[ConfigKeys.HOST_KEY] = f'{host}:{base_port}/{name}'
+        else:
+            entry[ConfigKeys.HOST_KEY] = host
+            entry[ConfigKeys.PORT_KEY] = base_port + i
+        config[name] = entry
+    return config
+
+def parse_sizes(arg: str, scale: float) -> dict[str, int]:
+    ''' Table size per request from DEFAULT_SIZES, scaled, and the key=size overrides of arg
+    '''
+    sizes = {key: max(int(size * scale), 1) for key, size in DEFAULT_SIZES.items()}
+    for item in filter(None, arg.split(',')):
+        key, _, size = item.partition('=')
+        sizes[key.strip()] = int(size)
+    return response_sizes(sizes)
+
+def collector_list(arg: str) -> list[str]:
+    keys = [k.strip() for k in arg.split(',') if k.strip()]
+    unknown = [k for k in keys if k not in COLLECTOR_PATHS]
+    if unknown:
+        raise ValueError(f'unknown collectors: {", ".join(unknown)}')
+    return keys
+
+def main():
+    parser = ArgumentParser(description=__doc__)
+    commands = parser.add_subparsers(dest='command', required=True)
+    for command in ('serve', 'config'):
+        sub = commands.add_parser(command)
+        sub.add_argument('--routers', type=int, default=10)
+        sub.add_argument('--host', default='127.0.0.1')
+        sub.add_argument('--base-port', type=int, default=18000)
+        sub.add_argument('--paths', action='store_true', help='one port for all routers, /<router>/rest/...')
+
+    serve_parser = commands.choices['serve']
+    serve_parser.add_argument('--scale', type=float, default=1, help='factor on the table sizes of benchmark.fixtures.DEFAULT_SIZES')
+    serve_parser.add_argument('--size', default='', help='table sizes by collector key, e.g. dhcp=500,route=10000')
+    serve_parser.add_argument('--latency', type=float, default=0, help='response delay in seconds')
+    serve_parser.add_argument('--jitter', type=float, default=0, help='random +- seconds on the response delay')
+    serve_parser.add_argument('--error-rate', type=float, default=0, help='share of requests answered with HTTP 500')
+    serve_parser.add_argument('--drip-rate', type=float, default=0, help='share of responses sent in slow chunks')
+    serve_parser.add_argument('--drip-delay', type=float, default=0.5, help='seconds between the chunks of a slow response')
+    serve_parser.add_argument('--drip-chunk', type=int, default=1024, help='bytes per chunk of a slow response')
+    serve_parser.add_argument('--seed', type=int, default=None)
+
+    config_parser = commands.choices['config']
+    config_parser.add_argument('-o', '--output', default='-', help='config file to write, default stdout')
+    config_parser.add_argument('--collectors', default=','.join(DEFAULT_COLLECTORS))
+    config_parser.add_argument('--slow-collectors', default=','.join(DEFAULT_SLOW_COLLECTORS))
+    config_parser.add_argument('--polling-interval', type=int, default=ConfigKeys.DEFAULT_POLLING_INTERVAL)
+    config_parser.add_argument('--slow-polling-interval', type=int, default=ConfigKeys.DEFAULT_SLOW_POLLING_INTERVAL)
+    config_parser.add_argument('--export-port', type=int, default=ConfigKeys.DEFAULT_EXPORT_PORT)
+    config_parser.add_argument('--max-workers', type=int, default=ConfigKeys.DEFAULT_MAX_WORKERS)
+    config_parser.add_argument('--async-mode', action='store_true')
+    args = parser.parse_args()
+
+    if args.command == 'config':
+        system = {ConfigKeys.EXPORTER_PORT: args.export_port, ConfigKeys.MAX_WORKERS_KEY: args.max_workers, ConfigKeys.ASYNC_MODE_KEY: args.async_mode}
+        try:
+            config = fleet_config(args.routers, args.host, args.base_port, args.paths, collector_list(args.collectors),
+                                  collector_list(args.slow_collectors), args.polling_interval, args.slow_polling_interval, system)
+        except ValueError as exc:
+            parser.error(str(exc))
+        text = yaml.safe_dump(config, sort_keys=False)
+        if args.output == '-':
+            sys.stdout.write(text)
+        else:
+            with open(args.output, 'w') as f:
+                f.write(text)
+        return
+
+    logging.basicConfig(format='%(levelname)s %(message)s', level=logging.INFO)
+    random.seed(args.seed)
+    tables = Tables(parse_sizes(args.size, args.scale))
+    faults = Faults(args.latency, args.jitter, args.error_rate, args.drip_rate, args.drip_delay, args.drip_chunk)
+    servers = serve(args.routers, args.host, args.base_port, args.paths, tables, faults)
+    ports = f'port {args.base_port}' if args.paths else f'ports {args.base_port}-{args.base_port + args.routers - 1}'
+    logging.info('Serving %i virtual routers on %s %s', args.routers, args.host, ports)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        for server in servers:
+            server.shutdown()
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,54 @@
+# coding=utf8
+## Copyright (c) 2020 Arseniy Kuznetsov
+## Copyright (c) 2024 Martti Anttila
+##
+## This program is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License
+## as published by the Free Software Foundation; either version 2
+## of the License, or (at your option) any later version.
+##
+## This program is distributed in the hope that it will be useful,
+## but WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+## GNU General Public License for more details.
+
+from collector.metric_store import MetricStore, LoadingCollector
+from flow.adaptive_interval import AdaptiveInterval
+
+ROUTER_ID = {'routerboard_name': 'test', 'routerboard_address': '192.0.2.1'}
+
+class LeaseCollector(LoadingCollector):
+    volatile_metrics = frozenset({'lease_expiry'})
+
+    def __init__(self):
+        self.name = 'LeaseCollector'
+        self.records = []
+        self.metric_store = MetricStore(ROUTER_ID, ['address'], ['expires', 'rate'])
+        self.metric_store.create_info_metric('lease', 'Leases')
+        self.metric_store.create_gauge_metric('lease_expiry', 'Lease expiry', 'expires')
+        self.metric_store.create_gauge_metric('lease_rate', 'Lease rate', 'rate')
+
+    def load_data(self, router_entry):
+        self.metric_store.set_metrics(self.records)
+
+def checksum(collector: LeaseCollector, records: list[dict]) -> int:
+    collector.records = records
+    collector.load(None)
+    return collector.change_checksum()
+
+def test_volatile_values_are_no_change():
+    collector = LeaseCollector()
+    first = checksum(collector, [{'address': '10.0.0.1', 'expires': 600, 'rate': 1}])
+    assert checksum(collector, [{'address': '10.0.0.1', 'expires': 590, 'rate': 1}]) == first
+    assert checksum(collector, [{'address': '10.0.0.1', 'expires': 590, 'rate': 2}]) != first
+    assert checksum(collector, [{'address': '10.0.0.2', 'expires': 590, 'rate': 1}]) != first
+
+def test_unchanged_series_stretch_the_interval():
+    collector = LeaseCollector()
+    interval = AdaptiveInterval(10, 0, 600)
+    for expires in (600, 590, 580):
+        interval.update(0, checksum(collector, [{'address': '10.0.0.1', 'expires': expires, 'rate': 1}]))
+    assert interval.interval == 40
+
+    interval.update(0, checksum(collector, [{'address': '10.0.0.2', 'expires': 570, 'rate': 1}]))
+    assert interval.interval == 20
@@ -0,0 +1,120 @@
+# coding=utf8
+## Copyright (c) 2020 Arseniy Kuznetsov
+## Copyright (c) 2024 Martti Anttila
+##
+## This program is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License
+## as published by the Free Software Foundation; either version 2
+## of the License, or (at your option) any later version.
+##
+## This program is distributed in the hope that it will be useful,
+## but WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+## GNU General Public License for more details.
+
+''' The collectors load the same series in the threaded and asyncio modes, against the RouterOS simulator
+
+    python -m pytest tests
+'''
+
+import asyncio
+import threading
+import pytest
+import yaml
+
+from benchmark.fixtures import COLLECTOR_PATHS, routes
+from cli.config import config_handler, ConfigKeys
+from collector.capability_probe import CapabilityProbe
+from flow.collector_registry import CollectorRegistry
+from flow.router_entry import RouterEntry
+from simulator.routeros import Faults, RouterOSServer, Tables, fleet_config, parse_sizes
+
+# Config options of the routers, one simulated router each
+ROUTERS = {
+    'router-0000': {},
+    'router-0001': {ConfigKeys.ROUTE_SUMMARY_KEY: True, ConfigKeys.ROUTE_DETAIL_PREFIXES_KEY: [routes(2)[1]['dst-address']]},
+    'router-0002': {ConfigKeys.ROUTE_SUMMARY_KEY: True, ConfigKeys.ROUTE_COUNT_ONLY_KEY: True,
+                    ConfigKeys.ROUTE_DETAIL_PREFIXES_KEY: [routes(2)[1]['dst-address']]},
+}
+ROUTE_COLLECTORS = ['route', 'ipv6_route']
+
+@pytest.fixture(scope='module', autouse=True)
+def simulator(tmp_path_factory):
+    tables = Tables(parse_sizes('', 0.1))
+    config = fleet_config(0, '127.0.0.1', 0, False, [], [], 10, 60, {})
+    servers = []
+    for router, options in ROUTERS.items():
+        server = RouterOSServer(('127.0.0.1', 0), {router}, tables, Faults())
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        config[router] = {
+            ConfigKeys.ENABLED_KEY: True,
+            ConfigKeys.HOST_KEY: '127.0.0.1',
+            ConfigKeys.PORT_KEY: server.server_address[1],
+            ConfigKeys.USER_KEY: 'simulator',
+            ConfigKeys.PASSWD_KEY: 'simulator',
+            **options
+        }
+
+    path = tmp_path_factory.mktemp('config') / 'config.yml'
+    path.write_text(yaml.safe_dump(config))
+    config_handler(str(path))
+    yield
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+def load_sync(router: str, create):
+    entry = RouterEntry(router)
+    collector = create(entry)
+    collector.load(entry)
+    return collector
+
+def load_async(router: str, create):
+    async def load():
+        entry = RouterEntry(router, async_mode=True)
+        collector = create(entry)
+        try:
+            await collector.load_async(entry)
+        finally:
+            await entry.rest_api.close()
+        return collector
+    return asyncio.run(load())
+
+def assert_same_series(router: str, create):
+    threaded = load_sync(router, create)
+    asyncio_mode = load_async(router, create)
+    assert threaded.metric_store.series_count() > 0
+    assert asyncio_mode.render() == threaded.render()
+
+@pytest.mark.parametrize('key', sorted(COLLECTOR_PATHS))
+def test_collector(key):
+    assert_same_series('router-0000', lambda entry: CollectorRegistry.collector_mapping[key](entry.router_id))
+
+@pytest.mark.parametrize('router', ['router-0001', 'router-0002'])
+@pytest.mark.parametrize('key', ROUTE_COLLECTORS)
+def test_route_summary(router, key):
+    assert_same_series(router, lambda entry: CollectorRegistry.collector_mapping[key](entry.router_id))
+
+def test_route_count_only():
+    # Summed by protocol, the count-only and streamed counts agree
+    def totals(router):
+        collector = load_sync(router, lambda entry: CollectorRegistry.collector_mapping['route'](entry.router_id))
+        counts = {}
+        for family in collector.summary_store.families():
+            if family.name.endswith('route_count'):
+                protocol = dict(family.label_positions)['protocol']
+                for labels, value in family.samples():
+                    counts[labels[protocol]] = counts.get(labels[protocol], 0) + value
+        return counts
+
+    counts = totals('router-0002')
+    assert counts
+    assert counts == totals('router-0001')
+
+def test_capability_probe():
+    paths = sorted({path for paths in COLLECTOR_PATHS.values() for path in paths if not path.endswith('/monitor')}) + ['missing/path']
+    found = []
+    assert_same_series('router-0000', lambda entry: CapabilityProbe(entry.router_id, paths, 3600, found.append))
+    assert found[0] == found[1]
+    assert found[0]['missing/path'] is False
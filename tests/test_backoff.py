@@ -0,0 +1,80 @@
+# coding=utf8
+## Copyright (c) 2020 Arseniy Kuznetsov
+## Copyright (c) 2024 Martti Anttila
+##
+## This program is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License
+## as published by the Free Software Foundation; either version 2
+## of the License, or (at your option) any later version.
+##
+## This program is distributed in the hope that it will be useful,
+## but WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+## GNU General Public License for more details.
+
+import random
+
+import pytest
+
+from flow import backoff
+from flow.backoff import Backoff
+
+@pytest.fixture
+def no_jitter(monkeypatch):
+    monkeypatch.setattr(backoff.random, 'uniform', lambda low, high: 1)
+
+def fail(b: Backoff, now: float) -> float:
+    ''' Fails once the previous delay is over, returns the time of the failure
+    '''
+    now = max(now, b.retry_at)
+    assert b.failure(now)
+    return now
+
+def test_delay_doubles_every_inc_div_failures(no_jitter):
+    b = Backoff(5, 300, 2)
+    now = 0.0
+    delays = []
+    for _ in range(8):
+        now = fail(b, now)
+        delays.append(b.delay)
+    assert delays == pytest.approx([5 * 2 ** (i / 2) for i in range(8)])
+    assert b.failures == 8
+
+def test_delay_is_capped(no_jitter):
+    b = Backoff(10, 60, 1)
+    now = 0.0
+    for _ in range(10):
+        now = fail(b, now)
+    assert b.delay == 60
+    # A maximum below the initial delay is raised to it
+    assert Backoff(10, 5, 1).max_delay == 10
+
+def test_jitter_stays_within_bounds():
+    random.seed(1)
+    for failures in range(1, 7):
+        for _ in range(50):
+            b = Backoff(4, 100, 1)
+            now = 0.0
+            for _ in range(failures):
+                now = fail(b, now)
+            expected = min(4 * 2 ** (failures - 1), 100)
+            assert expected * (1 - backoff.JITTER) <= b.delay <= min(expected * (1 + backoff.JITTER), 100)
+
+def test_concurrent_failures_count_once(no_jitter):
+    b = Backoff(5, 300, 1)
+    assert b.failure(100)
+    assert b.retry_at == 105
+    assert b.blocked(104)
+    assert not b.failure(104)
+    assert b.failures == 1
+    assert not b.blocked(105)
+
+def test_success_resets(no_jitter):
+    b = Backoff(5, 300, 1)
+    fail(b, 0)
+    fail(b, 0)
+    b.success()
+    assert (b.failures, b.delay, b.retry_at) == (0, 0, 0)
+    assert not b.blocked(0)
+    fail(b, 0)
+    assert b.delay == 5
@@ -0,0 +1,98 @@
+# coding=utf8
+## Copyright (c) 2020 Arseniy Kuznetsov
+## Copyright (c) 2024 Martti Anttila
+##
+## This program is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License
+## as published by the Free Software Foundation; either version 2
+## of the License, or (at your option) any later version.
+##
+## This program is distributed in the hope that it will be useful,
+## but WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+## GNU General Public License for more details.
+
+import gzip
+
+from prometheus_client import CollectorRegistry, Gauge
+from prometheus_client.exposition import generate_latest
+from wsgiref.util import setup_testing_defaults
+
+from collector.metric_store import LoadingCollector, MetricStore
+from flow.exposition import SnapshotRegistry, make_snapshot_app
+
+class InterfaceCollector(LoadingCollector):
+    def __init__(self, router: str, interfaces: int):
+        self.name = f'InterfaceCollector {router}'
+        self.router_id = {'routerboard_name': router, 'routerboard_address': '192.0.2.1'}
+        self.interfaces = interfaces
+        self.metric_store = MetricStore(self.router_id, ['name', 'comment'], ['rx_byte'])
+        self.metric_store.create_info_metric('interface', 'Interfaces')
+        self.metric_store.create_counter_metric('interface_rx_byte', 'Received bytes', 'rx_byte')
+
+    def load_data(self, router_entry):
+        self.metric_store.set_metrics([{'name': f'ether{i}', 'comment': 'say "hi"\\', 'rx-byte': str(i * 1000)} for i in range(self.interfaces)])
+
+def live_registry() -> CollectorRegistry:
+    registry = CollectorRegistry()
+    Gauge('mtik_exporter_live', 'Live metric', registry=registry).set(1)
+    return registry
+
+def loaded(router: str, interfaces: int = 3) -> InterfaceCollector:
+    collector = InterfaceCollector(router, interfaces)
+    collector.load(None)
+    return collector
+
+class Response:
+    def __init__(self, app, path: str = '/metrics', query: str = '', **headers):
+        environ = {'PATH_INFO': path, 'QUERY_STRING': query, **{f'HTTP_{k.upper()}': v for k, v in headers.items()}}
+        setup_testing_defaults(environ)
+        self.body = b''.join(app(environ, self.start_response))
+
+    def start_response(self, status, headers):
+        self.status = status
+        self.headers = dict(headers)
+
+def test_snapshot_is_the_client_exposition():
+    collector = loaded('router')
+    assert collector.snapshot.text == generate_latest(collector)
+
+def test_render_joins_the_snapshots():
+    live = live_registry()
+    registry = SnapshotRegistry(live)
+    collectors = [loaded('router-a'), loaded('router-b', 0), loaded('router-c', 5)]
+    for collector in collectors:
+        registry.register(collector)
+
+    snapshots = b''.join(generate_latest(c) for c in collectors)
+    assert registry.render() == generate_latest(live) + snapshots
+    # The compressed snapshot streams come first, the live metrics finish the gzip member
+    assert gzip.decompress(registry.render(gzip=True)) == snapshots + generate_latest(live)
+
+def test_app_serves_the_snapshots():
+    registry = SnapshotRegistry(live_registry())
+    registry.register(loaded('router'))
+    app = make_snapshot_app(registry)
+
+    response = Response(app)
+    assert response.status == '200 OK'
+    assert response.body == registry.render()
+
+    response = Response(app, accept_encoding='gzip')
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(response.body) == gzip.decompress(registry.render(gzip=True))
+
+def test_app_falls_back_to_the_client():
+    registry = SnapshotRegistry(live_registry())
+    registry.register(loaded('router'))
+    app = make_snapshot_app(registry)
+
+    response = Response(app, query='name[]=mtik_exporter_interface_rx_byte_total')
+    assert response.status == '200 OK'
+    assert b'mtik_exporter_interface_rx_byte_total{' in response.body
+    assert b'mtik_exporter_interface_info' not in response.body
+    assert b'mtik_exporter_live' not in response.body
+
+    response = Response(app, accept='application/openmetrics-text; version=1.0.0')
+    assert response.headers['Content-Type'].startswith('application/openmetrics-text')
+    assert response.body.endswith(b'# EOF\n')
@@ -0,0 +1,53 @@
+# coding=utf8
+## Copyright (c) 2020 Arseniy Kuznetsov
+## Copyright (c) 2024 Martti Anttila
+##
+## This program is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License
+## as published by the Free Software Foundation; either version 2
+## of the License, or (at your option) any later version.
+##
+## This program is distributed in the hope that it will be useful,
+## but WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+## GNU General Public License for more details.
+
+import json
+import pytest
+
+from utils.json_stream import JSONStreamError, iter_chunks, iter_records
+
+DOCUMENTS = [
+    b'[1.5, 1e3, -12, 0.25E-2, 100]',
+    b'[true, false, null, 7]',
+    b' [ "a,b]", "esc \\" ]", "\\u00e9" , "" ] ',
+    b'[{".id": "*1", "name": "ether1", "mtu": 1500, "running": true}, {".id": "*2", "comment": "x]y"}, [1, [2]]]',
+    b'[]',
+    b'{"ret": "42"}',
+    b'12.5',
+]
+
+def split(document: bytes, at: int) -> list[bytes]:
+    return [document[:at], document[at:]]
+
+@pytest.mark.parametrize('document', DOCUMENTS)
+def test_every_split(document):
+    expected = json.loads(document)
+    if not isinstance(expected, list):
+        expected = [expected]
+    for at in range(len(document) + 1):
+        assert list(iter_records(split(document, at))) == expected, split(document, at)
+    assert list(iter_records(iter_chunks(document, 1))) == expected
+
+@pytest.mark.parametrize('chunks', [[b'[1.', b'5]'], [b'[1e', b'3]'], [b'[1', b'2, 3]'], [b'[tr', b'ue]'], [b'[nu', b'll]'], [b'["a', b'b"]']])
+def test_scalar_across_chunks(chunks):
+    assert list(iter_records(chunks)) == json.loads(b''.join(chunks))
+
+@pytest.mark.parametrize('document', [b'', b'[1, 2', b'[1 2]', b'[1.]', b'[1, 2] 3'])
+def test_invalid(document):
+    with pytest.raises(ValueError):
+        list(iter_records(split(document, len(document) // 2)))
+
+def test_invalid_is_stream_error():
+    with pytest.raises(JSONStreamError):
+        list(iter_records([b'[1 2]']))
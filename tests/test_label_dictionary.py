@@ -0,0 +1,76 @@
+# coding=utf8
+## Copyright (c) 2020 Arseniy Kuznetsov
+## Copyright (c) 2024 Martti Anttila
+##
+## This program is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License
+## as published by the Free Software Foundation; either version 2
+## of the License, or (at your option) any later version.
+##
+## This program is distributed in the hope that it will be useful,
+## but WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+## GNU General Public License for more details.
+
+import threading
+
+from collector.arp_collector import ARPCollector
+from flow.label_dictionary import LabelDictionary
+
+def value(text: str) -> str:
+    # A str equal to text but not the same object
+    return ''.join(list(text))
+
+def test_values_are_shared():
+    labels = LabelDictionary()
+    first = labels.intern(value('ether1'))
+    assert labels.intern(value('ether1')) is first
+    assert len(labels) == 1
+
+def test_unseen_values_age_out():
+    labels = LabelDictionary(max_cycles=2)
+    labels.intern('kept')
+    labels.intern('dropped')
+    labels.end_cycle()
+    labels.intern('kept')
+    assert len(labels) == 2
+    labels.end_cycle()
+    assert len(labels) == 1
+    assert labels.intern(value('kept')) == 'kept'
+    assert len(labels) == 1
+
+def test_max_size():
+    labels = LabelDictionary(max_size=2)
+    for text in ('a', 'b', 'c'):
+        labels.intern(text)
+    assert len(labels) == 2
+    c = value('c')
+    assert labels.intern(c) is c
+
+def test_concurrent_interning():
+    labels = LabelDictionary(max_cycles=3)
+    texts = [f'aa:bb:cc:00:00:{i:02x}' for i in range(256)]
+    labels.intern(texts[0])
+    labels.end_cycle()
+    interned = []
+
+    def load():
+        interned.append([labels.intern(value(text)) for text in texts])
+
+    threads = [threading.Thread(target=load) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(labels) == len(texts)
+    assert sum(len(generation) for generation in labels.generations) == len(texts)
+    for values in interned[1:]:
+        assert all(a is b for a, b in zip(values, interned[0]))
+
+def test_collectors_use_the_router_dictionary():
+    labels = LabelDictionary()
+    collector = ARPCollector({'routerboard_name': 'router', 'routerboard_address': '192.0.2.1'})
+    assert collector.metric_store.label_dictionary is None
+    collector.use_label_dictionary(labels)
+    assert collector.metric_store.label_dictionary is labels
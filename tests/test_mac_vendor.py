@@ -0,0 +1,90 @@
+# coding=utf8
+## Copyright (c) 2020 Arseniy Kuznetsov
+## Copyright (c) 2024 Martti Anttila
+##
+## This program is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License
+## as published by the Free Software Foundation; either version 2
+## of the License, or (at your option) any later version.
+##
+## This program is distributed in the hope that it will be useful,
+## but WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+## GNU General Public License for more details.
+
+import pytest
+
+from utils.mac_vendor import MacVendorResolver, OUIIndex
+
+# IEEE csv files of the three assignment sizes, the MA-M and MA-S blocks lie in MA-L blocks
+MA_L = '''Registry,Assignment,Organization Name,Organization Address
+MA-L,001A2B,Ayecom Technology Co.,"Taipei, TW"
+MA-L,70B3D5,IEEE Registration Authority,"Piscataway, US"
+MA-L,B827EB,Raspberry Pi Foundation,"Cambridge, GB"
+'''
+MA_M = '''Registry,Assignment,Organization Name,Organization Address
+MA-M,70B3D51,Mid Block Vendör,"Oslo, NO"
+'''
+MA_S = '''Registry,Assignment,Organization Name,Organization Address
+MA-S,70B3D5123,Small Block Vendor,"Espoo, FI"
+'''
+OUI_TXT = '''OUI/MA-L                                                    Organization
+company_id                                                  Organization
+                                                            Address
+
+DC-A6-32   (hex)                Raspberry Pi Trading Ltd
+DCA632     (base 16)            Raspberry Pi Trading Ltd
+'''
+MAC_VENDORS = '''48A98A:Routerboard.com
+F09FC2:Ubiquiti Inc
+'''
+
+LOOKUPS = {
+    '00:1A:2B:3C:4D:5E': 'Ayecom Technology Co.',
+    '70:B3:D5:12:34:56': 'Small Block Vendor',
+    '70:B3:D5:1F:FF:FF': 'Mid Block Vendör',
+    '70:B3:D5:20:00:00': 'IEEE Registration Authority',
+    'b8-27-eb-00-00-01': 'Raspberry Pi Foundation',
+    'dca6.3200.0001': 'Raspberry Pi Trading Ltd',
+    '48:A9:8A:00:00:01': 'Routerboard.com',
+    'F0:9F:C2': 'Ubiquiti Inc',
+    '02:00:00:00:00:01': '',
+    'not a mac': '',
+    '': '',
+}
+
+@pytest.fixture
+def files(tmp_path):
+    paths = []
+    for name, content in (('oui.csv', MA_L), ('mam.csv', MA_M), ('oui36.csv', MA_S), ('oui.txt', OUI_TXT), ('mac-vendors.txt', MAC_VENDORS)):
+        path = tmp_path / name
+        path.write_text(content, encoding='utf-8')
+        paths.append(str(path))
+    return paths
+
+def test_lookup_longest_prefix(files):
+    index = OUIIndex.from_files(files)
+    assert len(index) == 8
+    for mac, vendor in LOOKUPS.items():
+        assert index.lookup(mac) == vendor, mac
+
+def test_write_and_load(files, tmp_path):
+    path = str(tmp_path / 'oui.idx')
+    OUIIndex.from_files(files).write(path)
+    index = OUIIndex.load(path)
+    assert [(bits, len(prefixes)) for bits, prefixes, _ in index.tables] == [(36, 1), (28, 1), (24, 6)]
+    for mac, vendor in LOOKUPS.items():
+        assert index.lookup(mac) == vendor, mac
+
+def test_not_an_index(tmp_path):
+    path = tmp_path / 'oui.idx'
+    path.write_bytes(b'\0' * 64)
+    with pytest.raises(ValueError):
+        OUIIndex.load(str(path))
+
+def test_resolver_loads_the_index_file(files, tmp_path):
+    path = str(tmp_path / 'oui.idx')
+    OUIIndex.from_files(files).write(path)
+    resolver = MacVendorResolver(path)
+    assert resolver.lookup('70:B3:D5:12:34:56') == 'Small Block Vendor'
+    assert resolver.index.source == path
@@ -0,0 +1,127 @@
+# coding=utf8
+## Copyright (c) 2020 Arseniy Kuznetsov
+## Copyright (c) 2024 Martti Anttila
+##
+## This program is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License
+## as published by the Free Software Foundation; either version 2
+## of the License, or (at your option) any later version.
+##
+## This program is distributed in the hope that it will be useful,
+## but WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+## GNU General Public License for more details.
+
+import gzip
+
+from prometheus_client import CollectorRegistry, Gauge
+from prometheus_client.exposition import generate_latest
+from wsgiref.util import setup_testing_defaults
+
+from flow.exposition import Snapshot, SnapshotRegistry, make_snapshot_app, scrape_etag
+
+class Response:
+    def __init__(self, app, path: str, query: str = '', **headers):
+        environ = {'PATH_INFO': path, 'QUERY_STRING': query, **{f'HTTP_{k.upper()}': v for k, v in headers.items()}}
+        setup_testing_defaults(environ)
+        self.body = b''.join(app(environ, self.start_response))
+
+    def start_response(self, status, headers):
+        self.status = status
+        self.headers = dict(headers)
+
+class Collector:
+    ''' Loaded collector stand-in
+    '''
+    def __init__(self, metric: str, interval: int):
+        self.name = metric
+        self.interval = interval
+        self.snapshot = Snapshot(f'{metric} 1.0\n'.encode('utf-8'))
+
+def exporter() -> tuple[SnapshotRegistry, CollectorRegistry, dict[str, Collector]]:
+    live = CollectorRegistry()
+    Gauge('mtik_exporter_live', 'Live metric', registry=live).set(1)
+    registry = SnapshotRegistry(live)
+    collectors = {
+        'fast': Collector('mtik_exporter_interface', 30),
+        'slow': Collector('mtik_exporter_route', 300),
+        'system': Collector('mtik_exporter_system', 30),
+    }
+    for group, c in collectors.items():
+        registry.register(c, 'R1' if group != 'system' else None, group)
+    return registry, live, collectors
+
+def test_etag_follows_the_loads():
+    snapshots = [Snapshot(b'a'), Snapshot(b'b')]
+    etag = scrape_etag(snapshots, False)
+    assert etag == scrape_etag(list(snapshots), False)
+    assert etag != scrape_etag(snapshots, True)
+    snapshots[1].created += 1
+    assert etag != scrape_etag(snapshots, False)
+
+def test_group_endpoints():
+    registry, live, collectors = exporter()
+    app = make_snapshot_app(registry)
+
+    for group, c in collectors.items():
+        response = Response(app, f'/metrics/{group}')
+        assert response.status == '200 OK'
+        assert response.headers['Vary'] == 'Accept-Encoding'
+        if group == 'system':
+            assert response.body == generate_latest(live) + c.snapshot.text
+        else:
+            assert response.body == c.snapshot.text
+
+    response = Response(app, '/metrics/other')
+    assert response.status == '404 Not Found'
+
+def test_etag_and_max_age():
+    registry, _, collectors = exporter()
+    app = make_snapshot_app(registry)
+
+    response = Response(app, '/metrics/slow')
+    etag = response.headers['ETag']
+    max_age = int(response.headers['Cache-Control'][len('max-age='):])
+    assert 295 <= max_age <= 300
+
+    for if_none_match in (etag, f'"other", {etag}', '*'):
+        response = Response(app, '/metrics/slow', if_none_match=if_none_match)
+        assert response.status == '304 Not Modified'
+        assert response.body == b''
+        assert response.headers['ETag'] == etag
+
+    # The gzip body has its own ETag
+    response = Response(app, '/metrics/slow', accept_encoding='gzip', if_none_match=etag)
+    assert response.status == '200 OK'
+    assert gzip.decompress(response.body) == collectors['slow'].snapshot.text
+
+    # A new load changes the ETag
+    collectors['slow'].snapshot = Snapshot(b'mtik_exporter_route 2.0\n')
+    collectors['slow'].snapshot.created += 1
+    response = Response(app, '/metrics/slow', if_none_match=etag)
+    assert response.status == '200 OK'
+    assert response.headers['ETag'] != etag
+    assert response.body == b'mtik_exporter_route 2.0\n'
+
+def test_no_cache_when_a_load_is_due():
+    registry, _, collectors = exporter()
+    app = make_snapshot_app(registry)
+
+    collectors['fast'].snapshot.created -= 60 * 10**9
+    assert Response(app, '/metrics/fast').headers['Cache-Control'] == 'no-cache'
+    collectors['fast'].interval = 0
+    collectors['fast'].snapshot = Snapshot(collectors['fast'].snapshot.text)
+    assert Response(app, '/metrics/fast').headers['Cache-Control'] == 'no-cache'
+
+def test_live_metrics_are_not_cached():
+    registry, live, collectors = exporter()
+    app = make_snapshot_app(registry)
+
+    for path in ('/metrics', '/metrics/system'):
+        response = Response(app, path, if_none_match='*')
+        assert response.status == '200 OK'
+        assert 'ETag' not in response.headers
+        assert response.headers['Cache-Control'] == 'no-cache'
+
+    response = Response(app, '/metrics')
+    assert response.body == generate_latest(live) + b''.join(c.snapshot.text for c in collectors.values())
@@ -0,0 +1,129 @@
+# coding=utf8
+## Copyright (c) 2020 Arseniy Kuznetsov
+## Copyright (c) 2024 Martti Anttila
+##
+## This program is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License
+## as published by the Free Software Foundation; either version 2
+## of the License, or (at your option) any later version.
+##
+## This program is distributed in the hope that it will be useful,
+## but WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+## GNU General Public License for more details.
+
+import threading
+import time
+
+from types import SimpleNamespace
+
+from flow.on_demand import OnDemandLoader
+
+class RestAPI:
+    def __init__(self):
+        self.backing_off = False
+
+    def backed_off(self) -> bool:
+        return self.backing_off
+
+def router(name: str) -> SimpleNamespace:
+    return SimpleNamespace(router_name=name, router_id={'routerboard_name': name, 'routerboard_address': '192.0.2.1'}, rest_api=RestAPI())
+
+def collector(name: str) -> SimpleNamespace:
+    return SimpleNamespace(name=name, adaptive_interval=None)
+
+class Scheduler:
+    ''' Runs each submitted load on a thread, finishing once released
+    '''
+    def __init__(self):
+        self.release = threading.Event()
+        self.loads: list[tuple[str, int]] = []
+        self.accept = True
+
+    def submit(self, router_entry, collectors, group, done):
+        self.loads.append((router_entry.router_name, group))
+        if not self.accept:
+            return False
+        def load():
+            self.release.wait(5)
+            done()
+        threading.Thread(target=load, daemon=True).start()
+        return True
+
+class InternalCollector:
+    def __init__(self):
+        self.exceeded: list[str] = []
+
+    def count_deadline_exceeded(self, router_id):
+        self.exceeded.append(router_id['routerboard_name'])
+
+def test_scrapes_load_the_stale_groups():
+    scheduler = Scheduler()
+    scheduler.release.set()
+    internal = InternalCollector()
+    loader = OnDemandLoader(scheduler.submit, 5, internal)
+    r1, r2 = router('R1'), router('R2')
+    loader.add_group(r1, [collector('fast')], 60, 1)
+    loader.add_group(r1, [collector('slow')], 300, 2)
+    loader.add_group(r2, [collector('fast')], 60, 1)
+
+    loader.refresh()
+    assert sorted(scheduler.loads) == [('R1', 1), ('R1', 2), ('R2', 1)]
+    # Loaded within the TTL: a second scrape serves the snapshots
+    loader.refresh()
+    assert len(scheduler.loads) == 3
+    # Past the TTL of the fast groups only
+    for g in loader.groups:
+        g.loaded_at -= 61
+    loader.refresh()
+    assert sorted(scheduler.loads[3:]) == [('R1', 1), ('R2', 1)]
+    assert not internal.exceeded
+
+def test_concurrent_scrapes_share_the_load():
+    scheduler = Scheduler()
+    loader = OnDemandLoader(scheduler.submit, 5, InternalCollector())
+    loader.add_group(router('R1'), [collector('fast')], 60, 1)
+
+    scrapes = [threading.Thread(target=loader.refresh) for _ in range(4)]
+    for scrape in scrapes:
+        scrape.start()
+    time.sleep(0.05)
+    assert all(scrape.is_alive() for scrape in scrapes)
+    scheduler.release.set()
+    for scrape in scrapes:
+        scrape.join(5)
+    assert not any(scrape.is_alive() for scrape in scrapes)
+    assert scheduler.loads == [('R1', 1)]
+
+def test_deadline_serves_the_previous_metrics():
+    scheduler = Scheduler()
+    internal = InternalCollector()
+    loader = OnDemandLoader(scheduler.submit, 0.05, internal)
+    loader.add_group(router('R1'), [collector('fast')], 60, 1)
+    try:
+        start = time.monotonic()
+        loader.refresh()
+        assert time.monotonic() - start < 1
+        assert internal.exceeded == ['R1']
+        # Still loading: the next scrape waits for the same load
+        loader.refresh()
+        assert scheduler.loads == [('R1', 1)]
+        assert internal.exceeded == ['R1', 'R1']
+    finally:
+        scheduler.release.set()
+
+def test_skipped_and_backed_off_groups():
+    scheduler = Scheduler()
+    internal = InternalCollector()
+    loader = OnDemandLoader(scheduler.submit, 5, internal)
+    backed_off = router('R1')
+    backed_off.rest_api.backing_off = True
+    loader.add_group(backed_off, [collector('fast')], 60, 1)
+    loader.add_group(router('R2'), [collector('fast')], 60, 1)
+
+    # A group the executor is still loading is not waited for
+    scheduler.accept = False
+    loader.refresh()
+    assert scheduler.loads == [('R2', 1)]
+    assert not any(g.loading for g in loader.groups)
+    assert not internal.exceeded
@@ -0,0 +1,63 @@
+# coding=utf8
+## Copyright (c) 2020 Arseniy Kuznetsov
+## Copyright (c) 2024 Martti Anttila
+##
+## This program is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License
+## as published by the Free Software Foundation; either version 2
+## of the License, or (at your option) any later version.
+##
+## This program is distributed in the hope that it will be useful,
+## but WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+## GNU General Public License for more details.
+
+import pytest
+
+from utils.parsers import match_duration, parse_column, parse_rates, parse_ros_version, parse_timedelta, scan_duration
+
+DURATIONS = [
+    '30s', '1d2h', '1w2d3h4m5s', '5m', '150ms', '1s150ms', '20us', '1m30s', '2h30m', '0s',
+    # Prefix semantics: the match stops at the first token out of order or unknown
+    '5s3m', '1h1h', '3x', '12', '1d 2h', 's', '1m1ms', '4mb', '7min', '1u', '10us5ms',
+    '9999999999w',
+]
+
+@pytest.mark.parametrize('time', DURATIONS)
+def test_scan_duration_is_the_regex(time):
+    scanned = scan_duration(time)
+    if scanned is None:
+        with pytest.raises(OverflowError):
+            match_duration(time)
+    else:
+        assert scanned == match_duration(time)
+
+def test_parse_timedelta():
+    assert parse_timedelta('1w2d3h4m5s') == 7 * 86400 + 2 * 86400 + 3 * 3600 + 4 * 60 + 5
+    assert parse_timedelta('1s150ms') == 1.15
+    assert parse_timedelta('20us') == 0.00002
+    assert parse_timedelta('') is None
+    assert parse_timedelta(None) is None
+    # Non ASCII input skips the scanner
+    assert parse_timedelta('٣s') == match_duration('٣s')
+
+def test_parse_rates():
+    assert parse_rates('100Mbps') == 100e6
+    assert parse_rates('1.5Gbps') == 1.5e9
+    assert parse_rates('54kbps') == 54e3
+    assert parse_rates('866.7Mbps-80MHz/2S/SGI') == 866.7e6
+    assert parse_rates('100') == -1
+    assert parse_rates(None) == 0
+
+def test_parse_ros_version():
+    assert parse_ros_version('7.15.3 (stable)') == ('7.15.3', 'stable')
+    assert parse_ros_version('7.16beta2 (testing)') == ('7.16beta2', 'testing')
+
+def test_parse_column_parses_each_value_once():
+    calls = []
+    def parser(value):
+        calls.append(value)
+        return parse_timedelta(value)
+
+    assert parse_column(['30s', '1m', '30s', '', '1m'], parser) == [30, 60, 30, None, 60]
+    assert calls == ['30s', '1m', '']
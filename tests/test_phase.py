@@ -0,0 +1,49 @@
+# coding=utf8
+## Copyright (c) 2020 Arseniy Kuznetsov
+## Copyright (c) 2024 Martti Anttila
+##
+## This program is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License
+## as published by the Free Software Foundation; either version 2
+## of the License, or (at your option) any later version.
+##
+## This program is distributed in the hope that it will be useful,
+## but WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+## GNU General Public License for more details.
+
+from flow.phase import WARMUP_WINDOW, phase_fraction, phase_start, warmup_time
+
+ROUTERS = [f'R{i}' for i in range(1, 101)]
+
+def test_phase_is_stable():
+    # The same value in every process, a restart keeps the phases
+    assert phase_fraction('R1', 1) == phase_fraction('R1', 1)
+    assert phase_fraction('R1', 1) != phase_fraction('R1', 2)
+    for router in ROUTERS:
+        assert 0 <= phase_fraction(router, 1) < 1
+
+def test_near_identical_names_are_spread():
+    # 100 routers over 10 slots of the interval: no slot holds a third of them
+    slots = [0] * 10
+    for router in ROUTERS:
+        slots[int(phase_fraction(router, 1) * 10)] += 1
+    assert max(slots) < 34
+    assert len({round(phase_fraction(router, 1), 3) for router in ROUTERS}) > 90
+
+def test_phase_start_is_aligned_to_the_epoch():
+    interval = 30
+    offset = phase_fraction('R1', 1) * interval
+    for now in (1_700_000_000.0, 1_700_000_007.5, 1_700_000_029.9):
+        start = phase_start('R1', 1, interval, now)
+        assert now - interval < start <= now
+        cycles = (start - offset) / interval
+        assert abs(cycles - round(cycles)) < 1e-6
+        # Runs at the same points of the interval, whenever the exporter started
+        assert abs(phase_start('R1', 1, interval, now + 3 * interval) - (start + 3 * interval)) < 1e-6
+
+def test_warmup_is_within_the_window():
+    now = 1_700_000_000.0
+    times = [warmup_time(router, 1, now) for router in ROUTERS]
+    assert all(now <= t < now + WARMUP_WINDOW for t in times)
+    assert max(times) - min(times) > WARMUP_WINDOW / 2
@@ -0,0 +1,123 @@
+# coding=utf8
+## Copyright (c) 2020 Arseniy Kuznetsov
+## Copyright (c) 2024 Martti Anttila
+##
+## This program is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License
+## as published by the Free Software Foundation; either version 2
+## of the License, or (at your option) any later version.
+##
+## This program is distributed in the hope that it will be useful,
+## but WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+## GNU General Public License for more details.
+
+import threading
+import time
+
+from contextlib import nullcontext
+from types import SimpleNamespace
+
+from flow.poll_executor import PollExecutor
+
+class InternalCollector:
+    ''' Internal collector stand-in, accepts every accounting call
+    '''
+    def time(self, labels):
+        return nullcontext()
+
+    def count_exceptions(self, labels):
+        return nullcontext()
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+class RestAPI:
+    def backed_off(self) -> bool:
+        return False
+
+class Router:
+    ''' RouterEntry stand-in, counting the loads running on the router at once
+    '''
+    def __init__(self, name: str, max_workers_per_router: int):
+        self.router_name = name
+        self.router_id = {'routerboard_name': name, 'routerboard_address': '192.0.2.1'}
+        self.config_entry = SimpleNamespace(max_workers_per_router=max_workers_per_router)
+        self.rest_api = RestAPI()
+        self.lock = threading.Lock()
+        self.running = 0
+        self.max_running = 0
+        self.loaded = 0
+
+    def end_cycle(self):
+        pass
+
+class Collector:
+    ''' Collector whose load waits for release
+    '''
+    adaptive_interval = None
+    render_time = 0
+
+    def __init__(self, name: str, release: threading.Event):
+        self.name = name
+        self.release = release
+        self.metric_store = SimpleNamespace(set_metrics_time=0, series_count=lambda: 0)
+
+    def load(self, router: Router):
+        with router.lock:
+            router.running += 1
+            router.max_running = max(router.max_running, router.running)
+        self.release.wait(5)
+        with router.lock:
+            router.running -= 1
+            router.loaded += 1
+
+def wait_for(condition, timeout: float = 5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+
+def test_per_router_limit():
+    executor = PollExecutor(InternalCollector(), 8)
+    release = threading.Event()
+    slow = Router('slow', 2)
+    other = Router('other', 2)
+    try:
+        assert executor.submit(slow, [Collector(f'slow-{i}', release) for i in range(5)], 1)
+        wait_for(lambda: slow.running == 2)
+
+        # The slow router holds two workers, the other router still gets its own
+        other_release = threading.Event()
+        other_release.set()
+        assert executor.submit(other, [Collector(f'other-{i}', other_release) for i in range(3)], 1)
+        wait_for(lambda: other.loaded == 3)
+        assert slow.running == 2
+
+        release.set()
+        wait_for(lambda: slow.loaded == 5)
+        assert slow.max_running == 2
+    finally:
+        release.set()
+        executor.shutdown()
+
+def test_overlapping_group_is_skipped():
+    executor = PollExecutor(InternalCollector(), 4)
+    release = threading.Event()
+    router = Router('router', 2)
+    try:
+        assert executor.submit(router, [Collector('fast', release)], 1)
+        wait_for(lambda: router.running == 1)
+        # Same group still loading: skipped, another group runs
+        assert not executor.submit(router, [Collector('fast', release)], 1)
+        assert executor.submit(router, [Collector('slow', release)], 2)
+        wait_for(lambda: router.running == 2)
+
+        release.set()
+        wait_for(lambda: router.loaded == 2)
+        wait_for(lambda: not executor.running_batches)
+        assert executor.submit(router, [Collector('fast', release)], 1)
+        wait_for(lambda: router.loaded == 3)
+    finally:
+        release.set()
+        executor.shutdown()
@@ -0,0 +1,106 @@
+# coding=utf8
+## Copyright (c) 2020 Arseniy Kuznetsov
+## Copyright (c) 2024 Martti Anttila
+##
+## This program is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License
+## as published by the Free Software Foundation; either version 2
+## of the License, or (at your option) any later version.
+##
+## This program is distributed in the hope that it will be useful,
+## but WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+## GNU General Public License for more details.
+
+import gzip
+
+from prometheus_client import CollectorRegistry, Gauge
+from prometheus_client.parser import text_string_to_metric_families
+from wsgiref.util import setup_testing_defaults
+
+from flow.exposition import Snapshot, SnapshotRegistry, make_snapshot_app
+
+class Response:
+    def __init__(self, app, path: str = '/probe', query: str = '', **headers):
+        environ = {'PATH_INFO': path, 'QUERY_STRING': query, **{f'HTTP_{k.upper()}': v for k, v in headers.items()}}
+        setup_testing_defaults(environ)
+        self.body = b''.join(app(environ, self.start_response))
+
+    def start_response(self, status, headers):
+        self.status = status
+        self.headers = dict(headers)
+
+class OnDemand:
+    def __init__(self):
+        self.targets = []
+
+    def refresh(self, target=None, *args):
+        self.targets.append(target)
+
+class Collector:
+    ''' Loaded collector stand-in, its metric families are parsed from the snapshot
+    '''
+    interval = 30
+
+    def __init__(self, name: str, snapshot: Snapshot):
+        self.name = name
+        self.snapshot = snapshot
+
+    def collect(self):
+        yield from text_string_to_metric_families(self.snapshot.text.decode('utf-8'))
+
+def collector(router: str, metric: str) -> Collector:
+    return Collector(f'InterfaceCollector {router}', Snapshot(f'# HELP {metric} Metric\n# TYPE {metric} gauge\n{metric}{{routerboard_name="{router}"}} 1.0\n'.encode('utf-8')))
+
+def fleet() -> tuple[SnapshotRegistry, dict[str, list[Collector]]]:
+    live = CollectorRegistry()
+    Gauge('mtik_exporter_live', 'Live metric', registry=live).set(1)
+    registry = SnapshotRegistry(live)
+    routers = {router: [collector(router, 'mtik_exporter_interface'), collector(router, 'mtik_exporter_route')] for router in ('R1', 'R2')}
+    for router, collectors in routers.items():
+        for c in collectors:
+            registry.register(c, router)
+    # System collectors have no target
+    registry.register(collector('system', 'mtik_exporter_system'))
+    return registry, routers
+
+def test_probe_serves_the_target():
+    registry, routers = fleet()
+    registry.on_demand = OnDemand()
+    app = make_snapshot_app(registry)
+
+    response = Response(app, query='target=R1')
+    assert response.status == '200 OK'
+    assert response.body == b''.join(c.snapshot.text for c in routers['R1'])
+    assert registry.on_demand.targets == ['R1']
+
+    response = Response(app, query='target=R2', accept_encoding='gzip')
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(response.body) == b''.join(c.snapshot.text for c in routers['R2'])
+
+def test_probe_falls_back_for_the_target():
+    registry, _ = fleet()
+    app = make_snapshot_app(registry)
+    response = Response(app, query='target=R1&name[]=mtik_exporter_route')
+    assert response.status == '200 OK'
+    assert b'mtik_exporter_route{routerboard_name="R1"} 1.0' in response.body
+    assert b'R2' not in response.body
+    assert b'mtik_exporter_interface' not in response.body
+    assert b'mtik_exporter_live' not in response.body
+
+def test_unknown_and_missing_targets():
+    registry, _ = fleet()
+    registry.on_demand = OnDemand()
+    app = make_snapshot_app(registry)
+
+    response = Response(app, query='target=R3')
+    assert response.status == '404 Not Found'
+    assert response.body == b'Unknown target "R3"\n'
+    # The system collectors are not a target
+    assert Response(app, query='target=system').status == '404 Not Found'
+
+    response = Response(app)
+    assert response.status == '400 Bad Request'
+    assert Response(app, query='target=').status == '400 Bad Request'
+    # Nothing is loaded for a target that is not served
+    assert registry.on_demand.targets == []
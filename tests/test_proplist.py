@@ -0,0 +1,79 @@
+# coding=utf8
+## Copyright (c) 2020 Arseniy Kuznetsov
+## Copyright (c) 2024 Martti Anttila
+##
+## This program is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License
+## as published by the Free Software Foundation; either version 2
+## of the License, or (at your option) any later version.
+##
+## This program is distributed in the hope that it will be useful,
+## but WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+## GNU General Public License for more details.
+
+import pytest
+
+from collector.metric_store import MetricStore, ros_property
+from flow.collector_registry import CollectorRegistry
+
+ROUTER_ID = {'routerboard_name': 'router', 'routerboard_address': '192.0.2.1'}
+
+def interface_store() -> MetricStore:
+    store = MetricStore(ROUTER_ID, ['id', 'name', 'comment', 'running'], ['rx_byte', 'tx_byte'],
+                        translation_table={'running': lambda value: '1' if value == 'true' else '0', 'tx_queue_drop': lambda value: value or '0'},
+                        extra_properties=['slave'], derived_properties=['comment'])
+    store.create_info_metric('interface', 'Interfaces')
+    store.create_counter_metric('interface_rx_byte', 'Received bytes', 'rx_byte')
+    store.create_counter_metric('interface_tx_byte', 'Sent bytes', 'tx_byte')
+    store.create_gauge_metric('interface_fp_rx_packet', 'Fast path packets', 'fp_rx_packet', ['name'])
+    return store
+
+def test_proplist_of_the_schema():
+    # Labels, values, translated and per metric keys by their RouterOS names, without the router
+    # labels and derived fields, the extra properties and the disabled flag set_metrics filters on
+    assert interface_store().proplist() == '.id,disabled,fp-rx-packet,name,running,rx-byte,slave,tx-byte,tx-queue-drop'
+
+def test_mac_vendor_needs_the_mac_address():
+    store = MetricStore(ROUTER_ID, ['mac_address', 'mac_vendor', 'host_name'], resolve_mac_vendor=True)
+    store.create_info_metric('dhcp', 'Leases')
+    assert store.proplist() == 'disabled,host-name,mac-address'
+
+def test_proplist_keeps_the_samples():
+    records = [
+        {'.id': '*1', 'name': 'ether1', 'running': 'true', 'rx-byte': '10', 'tx-byte': '20', 'fp-rx-packet': '3', 'mtu': '1500', 'type': 'ether'},
+        {'.id': '*2', 'name': 'ether2', 'running': 'false', 'rx-byte': '30', 'tx-byte': '40', 'fp-rx-packet': '0', 'disabled': 'false', 'mac-address': '00:11:22:33:44:55'},
+        {'.id': '*3', 'name': 'ether3', 'running': 'true', 'rx-byte': '1', 'tx-byte': '1', 'fp-rx-packet': '1', 'disabled': 'true'},
+    ]
+    full = interface_store()
+    full.set_metrics([dict(record) for record in records])
+
+    selected = interface_store()
+    properties = set(selected.proplist().split(','))
+    selected.set_metrics([{key: value for key, value in record.items() if key in properties} for record in records])
+
+    def samples(store):
+        return [(sample.name, sample.labels, sample.value) for metric in store.get_metrics() for sample in metric.samples]
+
+    assert samples(selected) == samples(full)
+    assert len(samples(full)) == 8
+
+def stores(collector):
+    for store in vars(collector).values():
+        if isinstance(store, MetricStore):
+            yield store
+
+@pytest.mark.parametrize('key', sorted(CollectorRegistry.collector_mapping))
+def test_collector_stores(key):
+    # Every key a metric of the collector reads is requested
+    collector = CollectorRegistry.collector_mapping[key](ROUTER_ID)
+    for store in stores(collector):
+        properties = set(store.proplist().split(','))
+        assert 'disabled' in properties
+        assert not properties & set(ROUTER_ID)
+        assert set(store.extra_properties) <= properties
+        skipped = set(ROUTER_ID) | set(store.derived_properties) | ({'mac_vendor'} if store.resolve_mac_vendor else set())
+        for _, labels, value in store.metrics:
+            for name in set(labels) | {value} - {None}:
+                if name not in skipped:
+                    assert ros_property(name) in properties, f'{key}: {name}'
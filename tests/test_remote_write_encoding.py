@@ -0,0 +1,85 @@
+# coding=utf8
+## Copyright (c) 2020 Arseniy Kuznetsov
+## Copyright (c) 2024 Martti Anttila
+##
+## This program is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License
+## as published by the Free Software Foundation; either version 2
+## of the License, or (at your option) any later version.
+##
+## This program is distributed in the hope that it will be useful,
+## but WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+## GNU General Public License for more details.
+
+import random
+
+import pytest
+
+from utils import snappy
+from utils.prompb import decode_write_request, encode_label, encode_timeseries
+
+def exposition(lines: int) -> bytes:
+    return ''.join(f'mtik_exporter_interface_rx_byte_total{{routerboard_name="R{i % 7}",name="ether{i}"}} {i * 1234}\n' for i in range(lines)).encode('utf-8')
+
+def payloads() -> list[bytes]:
+    rnd = random.Random(1)
+    noise = bytes(rnd.getrandbits(8) for _ in range(70000))
+    return [
+        b'',
+        b'a',
+        b'abc',
+        b'abcd' * 2,
+        # Overlapping copies of a short run, copies longer than 64 bytes
+        b'a' * 1000,
+        b'ab' * 333 + b'c',
+        exposition(2000),
+        # Literals of every length encoding, up to one over 65536 bytes
+        noise[:60], noise[:61], noise[:256], noise[:257], noise,
+        # A match farther than 2048 bytes back, and one past MAX_OFFSET
+        noise[:5000] + noise[:100],
+        noise[:65500] + noise[:4000],
+    ]
+
+@pytest.mark.parametrize('data', payloads(), ids=lambda data: str(len(data)))
+def test_snappy_round_trip(data):
+    compressed = snappy.compress(data)
+    assert snappy.decompress(compressed) == data
+
+def test_snappy_compresses_expositions():
+    data = exposition(2000)
+    assert len(snappy.compress(data)) < len(data) / 3
+
+def test_snappy_reference_block():
+    # Length 13, a 4 byte literal, a 1 byte offset copy of 4, then an overlapping 2 byte offset copy of 5
+    block = bytes([13, 3 << 2]) + b'abcd' + bytes([0x01, 4]) + bytes([0x02 | (4 << 2), 2, 0])
+    assert snappy.decompress(block) == b'abcdabcdcdcdc'
+
+def test_snappy_rejects_corrupt_blocks():
+    with pytest.raises(ValueError):
+        snappy.decompress(bytes([4, 0x01, 1]))
+    with pytest.raises(ValueError):
+        snappy.decompress(bytes([5, 3 << 2]) + b'abcd')
+
+def test_varint():
+    assert snappy.varint(0) == b'\x00'
+    assert snappy.varint(127) == b'\x7f'
+    assert snappy.varint(300) == b'\xac\x02'
+    assert snappy.varint(2**35 + 1) == b'\x81\x80\x80\x80\x80\x01'
+
+def test_timeseries_encoding():
+    encoded = encode_timeseries(encode_label('a', 'b'), 1.0, 1000)
+    label = b'\x0a\x06\x0a\x01a\x12\x01b'
+    sample = b'\x12\x0c\x09' + b'\x00\x00\x00\x00\x00\x00\xf0\x3f' + b'\x10\xe8\x07'
+    assert encoded == b'\x0a' + bytes([len(label) + len(sample)]) + label + sample
+
+def test_write_request_round_trip():
+    series = [
+        ({'__name__': 'mtik_exporter_interface_rx_byte_total', 'name': 'ether1', 'routerboard_name': 'R1'}, 1234.5, 1_700_000_000_123),
+        ({'__name__': 'mtik_exporter_system_uptime', 'routerboard_name': 'Röuter'}, 0.0, 1_700_000_000_456),
+        ({'__name__': 'mtik_exporter_up'}, float('inf'), 0),
+    ]
+    # The timeseries of separate loads join into one request
+    request = b''.join(encode_timeseries(b''.join(encode_label(k, v) for k, v in sorted(labels.items())), value, ts) for labels, value, ts in series)
+    decoded = decode_write_request(snappy.decompress(snappy.compress(request)))
+    assert decoded == [(labels, [(value, ts)]) for labels, value, ts in series]
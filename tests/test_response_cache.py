@@ -0,0 +1,81 @@
+# coding=utf8
+## Copyright (c) 2020 Arseniy Kuznetsov
+## Copyright (c) 2024 Martti Anttila
+##
+## This program is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License
+## as published by the Free Software Foundation; either version 2
+## of the License, or (at your option) any later version.
+##
+## This program is distributed in the hope that it will be useful,
+## but WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+## GNU General Public License for more details.
+
+from flow.response_cache import ResponseCache, SHARED_CYCLES
+
+TABLE = [{'.id': '*1', 'name': 'routeros', 'version': '7.16', 'disabled': 'false'}]
+
+class Table:
+    ''' Fetch of a table, the properties of every request recorded
+    '''
+    def __init__(self):
+        self.requests = []
+
+    def __call__(self, properties):
+        self.requests.append(properties)
+        return [{k: v for k, v in r.items() if properties is None or k in properties} for r in TABLE]
+
+def props(proplist: str):
+    return frozenset(proplist.split(','))
+
+def test_shared_table_fetched_once_with_union():
+    cache = ResponseCache()
+    fetch = Table()
+    # First cycle: the table turns out to be shared
+    cache.get('system/package {}', props('name,version,disabled'), fetch)
+    cache.get('system/package {}', props('name,version'), fetch)
+    cache.end_cycle()
+    fetch.requests.clear()
+
+    response, hit = cache.get('system/package {}', props('name,version'), fetch)
+    assert not hit
+    assert response == [{'name': 'routeros', 'version': '7.16'}]
+    response, hit = cache.get('system/package {}', props('name,version,disabled'), fetch)
+    assert hit
+    assert response == [{'name': 'routeros', 'version': '7.16', 'disabled': 'false'}]
+    assert fetch.requests == [props('name,version,disabled')]
+
+def test_unfiltered_request_covers_all():
+    cache = ResponseCache()
+    fetch = Table()
+    cache.get('system/package {}', None, fetch)
+    cache.get('system/package {}', props('name'), fetch)
+    response, hit = cache.get('system/package {}', props('.id'), fetch)
+    assert hit
+    assert response == [{'.id': '*1'}]
+    assert fetch.requests == [None, None]
+
+def test_cached_response_is_not_modified():
+    cache = ResponseCache()
+    fetch = Table()
+    cache.get('system/package {}', None, fetch)
+    first, _ = cache.get('system/package {}', None, fetch)
+    first[0]['name'] = 'changed'
+    second, hit = cache.get('system/package {}', None, fetch)
+    assert hit
+    assert second[0]['name'] == 'routeros'
+
+def test_shared_keys_age_out():
+    cache = ResponseCache()
+    fetch = Table()
+    cache.get('system/package {}', None, fetch)
+    cache.get('system/package {}', None, fetch)
+    cache.end_cycle()
+    assert 'system/package {}' in cache.shared
+
+    for _ in range(SHARED_CYCLES):
+        cache.get('system/package {}', None, fetch)
+        cache.end_cycle()
+    assert 'system/package {}' not in cache.shared
+    assert not cache.entries
@@ -0,0 +1,85 @@
+# coding=utf8
+## Copyright (c) 2020 Arseniy Kuznetsov
+## Copyright (c) 2024 Martti Anttila
+##
+## This program is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License
+## as published by the Free Software Foundation; either version 2
+## of the License, or (at your option) any later version.
+##
+## This program is distributed in the hope that it will be useful,
+## but WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+## GNU General Public License for more details.
+
+import io
+import json
+import requests
+
+from types import SimpleNamespace
+
+from collector.route_collector import RouteCollector
+from flow.router_rest_api import RouterRestAPI
+
+CONFIG = SimpleNamespace(response_cache_ttl=0, use_ssl=False, hostname='192.0.2.1', port='', socket_timeout=1,
+                         username='admin', password='', route_summary=True, route_count_only=True, route_detail_prefixes=[])
+ROUTES = [{'dst-address': '10.0.0.0/24', 'gateway': 'ether1', 'static': 'true', 'active': 'true', 'disabled': 'false'}]
+
+def response(status: int, body) -> requests.Response:
+    resp = requests.Response()
+    resp.status_code = status
+    resp.url = 'http://192.0.2.1/rest/ip/route'
+    resp.raw = io.BytesIO(json.dumps(body).encode())
+    return resp
+
+class Session:
+    ''' requests.Session answering every POST with the same status, GETs with the routes
+    '''
+    def __init__(self, post_status: int):
+        self.post_status = post_status
+        self.posts = 0
+
+    def post(self, url, **kwargs):
+        self.posts += 1
+        return response(self.post_status, {'error': self.post_status, 'message': 'Bad Request'})
+
+    def get(self, url, **kwargs):
+        return response(200, ROUTES)
+
+def router_entry(post_status: int) -> SimpleNamespace:
+    rest_api = RouterRestAPI('router', CONFIG)
+    rest_api.ses = Session(post_status)
+    return SimpleNamespace(router_name='router', config_entry=CONFIG, rest_api=rest_api)
+
+def route_count(collector: RouteCollector) -> int:
+    return sum(value for family in collector.summary_store.families() if family.name.endswith('route_count') for _, value in family.samples())
+
+def test_refused_count_only_falls_back():
+    entry = router_entry(400)
+    collector = RouteCollector({'routerboard_name': 'router', 'routerboard_address': '192.0.2.1'})
+    collector.load(entry)
+    assert not collector.count_only
+    assert route_count(collector) == 1
+
+def test_backed_off_endpoint_falls_back():
+    # The refused endpoint is backed off, its prints answer [] without a request
+    entry = router_entry(400)
+    first = RouteCollector({'routerboard_name': 'router', 'routerboard_address': '192.0.2.1'})
+    assert not first.load_counts(entry)
+    posts = entry.rest_api.ses.posts
+
+    collector = RouteCollector({'routerboard_name': 'router', 'routerboard_address': '192.0.2.1'})
+    assert not collector.load_counts(entry)
+    assert entry.rest_api.ses.posts == posts
+
+def test_transient_failures_keep_count_only():
+    entry = router_entry(500)
+    collector = RouteCollector({'routerboard_name': 'router', 'routerboard_address': '192.0.2.1'})
+    assert collector.load_counts(entry)
+
+    entry = router_entry(400)
+    entry.rest_api.router_failed(requests.exceptions.ConnectTimeout('timeout'))
+    assert collector.load_counts(entry)
+    assert entry.rest_api.ses.posts == 0
+    collector.load(entry)
+    assert collector.count_only
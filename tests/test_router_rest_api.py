@@ -0,0 +1,41 @@
+# coding=utf8
+## Copyright (c) 2020 Arseniy Kuznetsov
+## Copyright (c) 2024 Martti Anttila
+##
+## This program is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License
+## as published by the Free Software Foundation; either version 2
+## of the License, or (at your option) any later version.
+##
+## This program is distributed in the hope that it will be useful,
+## but WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+## GNU General Public License for more details.
+
+import pytest
+import requests
+
+from flow.router_rest_api import basic_auth, request_key, split_proplist, with_properties, with_proplist
+
+@pytest.mark.parametrize('username, password', [('admin', ''), ('admin', 'secret:with:colons'), ('usér', 'pässwörd')])
+def test_basic_auth_matches_requests(username, password):
+    prepared = requests.Request('GET', 'http://192.0.2.1/rest/system/identity', auth=(username, password)).prepare()
+    assert basic_auth(username, password) == prepared.headers['Authorization']
+
+@pytest.mark.parametrize('params', ['status=reachable&.proplist=address,interface', '.proplist=interface,address&status=reachable'])
+def test_query_string_proplist_is_kept(params):
+    assert with_proplist(params, 'address') == params
+    query, properties = split_proplist(params, 'address')
+    assert query == 'status=reachable'
+    assert properties == frozenset({'address', 'interface'})
+
+def test_query_string_proplist_keys_the_same_request():
+    dict_params = split_proplist({'.proplist': 'address,interface'}, None)
+    string_params = split_proplist('.proplist=address%2Cinterface', None)
+    assert dict_params == string_params
+    assert request_key(with_properties(*string_params)) == request_key(with_properties(*dict_params))
+
+def test_proplist_is_added():
+    assert with_proplist('status=reachable', 'address') == 'status=reachable&.proplist=address'
+    assert with_proplist({'status': 'reachable'}, 'address') == {'status': 'reachable', '.proplist': 'address'}
+    assert split_proplist('status=reachable', 'interface,address') == ('status=reachable', frozenset({'address', 'interface'}))
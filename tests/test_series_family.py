@@ -0,0 +1,81 @@
+# coding=utf8
+## Copyright (c) 2020 Arseniy Kuznetsov
+## Copyright (c) 2024 Martti Anttila
+##
+## This program is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License
+## as published by the Free Software Foundation; either version 2
+## of the License, or (at your option) any later version.
+##
+## This program is distributed in the hope that it will be useful,
+## but WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+## GNU General Public License for more details.
+
+import sys
+import threading
+
+from collector.metric_store import SeriesFamily
+
+def load(family: SeriesFamily, count: int, offset: int = 0):
+    family.clear()
+    for i in range(offset, offset + count):
+        family.add((str(i),), i)
+
+def rendered(family: SeriesFamily) -> str:
+    output = []
+    family.render(output)
+    return ''.join(output)
+
+def test_values_overwritten_in_place():
+    family = SeriesFamily('mtik_exporter_test', 'Test', 'gauge', ['name'])
+    load(family, 3)
+    rendered(family)
+    series = family.series
+    load(family, 3)
+    assert family.pending is None
+    assert rendered(family).endswith('mtik_exporter_test{name="2"} 2.0\n')
+    assert family.series is series
+
+def test_changed_series_settle():
+    family = SeriesFamily('mtik_exporter_test', 'Test', 'gauge', ['name'])
+    load(family, 3)
+    rendered(family)
+    load(family, 2, 1)
+    assert list(family.samples()) == [(('1',), 1.0), (('2',), 2.0)]
+    rendered(family)
+    load(family, 1)
+    assert list(family.samples()) == [(('0',), 0.0)]
+    assert rendered(family).count('\n') == 3
+
+def test_samples_while_loading():
+    # Loads, settles and reads race, every sample read has the value of its labels
+    family = SeriesFamily('mtik_exporter_test', 'Test', 'gauge', ['name'])
+    stop = threading.Event()
+    errors = []
+
+    def read():
+        while not stop.is_set():
+            try:
+                for labels, value in family.samples():
+                    if float(labels[0]) != value:
+                        errors.append((labels, value))
+            except Exception as exc:
+                errors.append(exc)
+
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    readers = [threading.Thread(target=read) for _ in range(2)]
+    try:
+        for reader in readers:
+            reader.start()
+        for i in range(2000):
+            load(family, 1 + i % 7, i % 3)
+            if i % 2:
+                rendered(family)
+    finally:
+        stop.set()
+        for reader in readers:
+            reader.join()
+        sys.setswitchinterval(switch_interval)
+    assert not errors
@@ -0,0 +1,93 @@
+# coding=utf8
+## Copyright (c) 2020 Arseniy Kuznetsov
+## Copyright (c) 2024 Martti Anttila
+##
+## This program is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License
+## as published by the Free Software Foundation; either version 2
+## of the License, or (at your option) any later version.
+##
+## This program is distributed in the hope that it will be useful,
+## but WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+## GNU General Public License for more details.
+
+''' set_metrics gives the samples of the record by record implementation it replaced
+'''
+
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily, InfoMetricFamily
+
+from benchmark.fixtures import routes
+from collector.metric_store import MetricStore
+from collector.route_collector import RouteCollector
+
+ROUTER_ID = {'routerboard_name': 'router', 'routerboard_address': '192.0.2.1'}
+FAMILIES = {'info': InfoMetricFamily, 'gauge': GaugeMetricFamily, 'counter': CounterMetricFamily}
+
+def reference(store: MetricStore, records: list[dict]) -> list:
+    ''' Samples of the records, normalized, translated and labeled one record at a time
+    '''
+    families = [(FAMILIES[family.type](family.name, family.documentation, labels=labels), labels, value) for family, labels, value in store.metrics]
+    for record in records:
+        if record.get('disabled', 'false') == 'true':
+            continue
+
+        translated = {}
+        for key, value in record.items():
+            k = key
+            if key.startswith(('.', '_', '-')):
+                k = k[1:]
+            if k.endswith(('.', '_', '-')):
+                k = k[:-1]
+            translated[k.replace('.', '_').replace('-', '_')] = value
+        translated.update(store.router_id)
+
+        for key, func in store.translation_table.items():
+            value = func(str(translated.get(key)) if key in translated else None)
+            if value != None:
+                translated[key] = value
+
+        for family, labels, value in families:
+            if value:
+                v = translated.get(value)
+                if v == None:
+                    continue
+            else:
+                v = {}
+            family.add_metric([str(translated.get(label, '')) for label in labels], v)
+
+    return [(sample.name, sample.labels, float(sample.value)) for family, _, _ in families for sample in family.samples]
+
+def samples(store: MetricStore, records: list[dict]) -> list:
+    store.set_metrics([dict(record) for record in records])
+    return [(sample.name, sample.labels, float(sample.value)) for metric in store.get_metrics() for sample in metric.samples]
+
+def test_route_store():
+    records = routes(200)
+    collector = RouteCollector(ROUTER_ID)
+    # The route store, once the collector has a summary store as well
+    store = getattr(collector, 'route_store', collector.metric_store)
+    assert samples(store, records) == reference(store, records)
+
+def test_translations_and_missing_fields():
+    def store() -> MetricStore:
+        store = MetricStore(ROUTER_ID, ['name', 'comment', 'running'], ['rx_byte', 'uptime'],
+                            translation_table={'running': lambda value: '1' if value == 'true' else '0',
+                                               'uptime': lambda value: float(value[:-1]) if value else None,
+                                               'rx_byte': lambda value: value if value else 0})
+        store.create_info_metric('interface', 'Interfaces')
+        store.create_gauge_metric('interface_running', 'Running', 'running')
+        store.create_counter_metric('interface_rx_byte', 'Received bytes', 'rx_byte')
+        store.create_gauge_metric('interface_uptime', 'Uptime', 'uptime', ['name'])
+        store.create_gauge_metric('interface_rx_drop', 'Dropped', 'rx_drop')
+        return store
+
+    records = [
+        {'.id': '*1', 'name': 'ether1', 'running': 'true', 'rx-byte': '10', 'uptime': '5s', 'rx-drop': '1'},
+        # Missing fields, and a record field named like a router label
+        {'name': 'ether2', 'comment': 'uplink', 'routerboard-name': 'other'},
+        {'name': 'ether3', 'running': 'false', 'disabled': 'true'},
+        {'name': 'ether4', 'running': 'false', 'disabled': 'false', 'uptime': '7s', '.nextid': '*5'},
+    ]
+    assert samples(store(), records) == reference(store(), records)
+    assert samples(store(), []) == []
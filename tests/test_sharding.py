@@ -0,0 +1,54 @@
+# coding=utf8
+## Copyright (c) 2020 Arseniy Kuznetsov
+## Copyright (c) 2024 Martti Anttila
+##
+## This program is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License
+## as published by the Free Software Foundation; either version 2
+## of the License, or (at your option) any later version.
+##
+## This program is distributed in the hope that it will be useful,
+## but WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+## GNU General Public License for more details.
+
+import pytest
+
+from flow.sharding import Sharding
+
+ROUTERS = [f'router-{i:04d}' for i in range(1000)]
+
+def assignment(members: list[str]) -> dict[str, str]:
+    sharding = Sharding(0, 0, members, members[0])
+    return {router: sharding.owner(router) for router in ROUTERS}
+
+def test_every_instance_agrees():
+    members = ['exporter-a', 'exporter-b', 'exporter-c']
+    owners = [{router: Sharding(0, 0, members, member).owner(router) for router in ROUTERS} for member in members]
+    assert owners[0] == owners[1] == owners[2]
+    # Roughly even spread
+    for member in members:
+        assert 250 < list(owners[0].values()).count(member) < 420
+
+def test_adding_a_member_moves_only_its_routers():
+    before = assignment(['exporter-a', 'exporter-b', 'exporter-c'])
+    after = assignment(['exporter-a', 'exporter-b', 'exporter-c', 'exporter-d'])
+    moved = [router for router in ROUTERS if before[router] != after[router]]
+    assert moved
+    assert all(after[router] == 'exporter-d' for router in moved)
+
+def test_removing_a_member_moves_only_its_routers():
+    before = assignment(['exporter-a', 'exporter-b', 'exporter-c'])
+    after = assignment(['exporter-a', 'exporter-c'])
+    for router in ROUTERS:
+        if before[router] != 'exporter-b':
+            assert after[router] == before[router]
+
+def test_numbered_shards():
+    sharding = Sharding(1, 3)
+    assert sharding.shards == ['0', '1', '2']
+    assert sharding.shard == '1'
+    with pytest.raises(ValueError):
+        Sharding(3, 3)
+    with pytest.raises(ValueError):
+        Sharding(0, 0, ['exporter-a'], 'exporter-b')
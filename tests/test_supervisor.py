@@ -0,0 +1,90 @@
+# coding=utf8
+## Copyright (c) 2020 Arseniy Kuznetsov
+## Copyright (c) 2024 Martti Anttila
+##
+## This program is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License
+## as published by the Free Software Foundation; either version 2
+## of the License, or (at your option) any later version.
+##
+## This program is distributed in the hope that it will be useful,
+## but WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+## GNU General Public License for more details.
+
+import multiprocessing
+import threading
+import time
+
+from prometheus_client import CollectorRegistry, Gauge
+from prometheus_client.exposition import generate_latest
+
+from flow.exposition import Snapshot, SnapshotRegistry
+from flow.supervisor import SnapshotPublisher, Supervisor, partition
+
+class Collector:
+    ''' Loaded collector stand-in of a worker process
+    '''
+    interval = 30
+
+    def __init__(self, name: str, text: bytes):
+        self.name = name
+        self.snapshot = Snapshot(text)
+
+class InternalCollector:
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+def registry(name: str) -> CollectorRegistry:
+    registry = CollectorRegistry()
+    Gauge(name, 'Live metric', registry=registry).set(1)
+    return registry
+
+def wait_for(condition, timeout: float = 5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+
+def test_partition():
+    routers = [f'R{i}' for i in range(7)]
+    shares = partition(routers, 3)
+    assert sorted(r for share in shares for r in share) == sorted(routers)
+    assert [len(share) for share in shares] == [3, 2, 2]
+    assert partition(routers[:2], 3) == [['R0'], ['R1'], []]
+
+def test_snapshots_reach_the_supervisor():
+    worker_registry = registry('mtik_exporter_worker')
+    worker_snapshots = SnapshotRegistry(worker_registry)
+    a = Collector('a', b'mtik_exporter_a 1.0\n')
+    b = Collector('b', b'mtik_exporter_b 2.0\n')
+    worker_snapshots.register(a)
+    worker_snapshots.register(b)
+
+    live = registry('mtik_exporter_supervisor')
+    snapshots = SnapshotRegistry(live)
+    supervisor = Supervisor(None, ['R1'], 1, snapshots, InternalCollector())
+    conn, child_conn = multiprocessing.Pipe(duplex=False)
+    receiver = threading.Thread(target=supervisor.receive, args=(supervisor.workers[0], conn), daemon=True)
+    receiver.start()
+
+    publisher = SnapshotPublisher(worker_snapshots, child_conn, worker_registry)
+    publisher.publish()
+    internal = generate_latest(worker_registry)
+    expected = generate_latest(live) + a.snapshot.text + b.snapshot.text + internal
+    wait_for(lambda: snapshots.render() == expected)
+
+    # Only new snapshots are sent again, a dropped collector is dropped in the supervisor
+    sent = dict(publisher.sent)
+    a.snapshot = Snapshot(b'mtik_exporter_a 3.0\n')
+    worker_snapshots.unregister(b)
+    publisher.publish()
+    assert publisher.sent[id(a)] is a.snapshot and id(b) not in publisher.sent and len(sent) == 2
+    expected = generate_latest(live) + a.snapshot.text + internal
+    wait_for(lambda: snapshots.render() == expected)
+
+    # An exited worker closes the pipe, its snapshots go away
+    child_conn.close()
+    receiver.join(5)
+    assert not receiver.is_alive()
+    assert snapshots.render() == generate_latest(live)
@@ -0,0 +1,118 @@
+# coding=utf8
+## Copyright (c) 2020 Arseniy Kuznetsov
+## Copyright (c) 2024 Martti Anttila
+##
+## This program is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License
+## as published by the Free Software Foundation; either version 2
+## of the License, or (at your option) any later version.
+##
+## This program is distributed in the hope that it will be useful,
+## but WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+## GNU General Public License for more details.
+
+''' Incremental decoding of the JSON arrays of RouterOS REST responses
+
+    The records are decoded one at a time from the chunks of the body as they arrive, so only
+    the current chunk and record are held instead of the body, its text and all the records
+'''
+
+import json
+
+from collections.abc import Iterable, Iterator
+
+WHITESPACE = ' \t\n\r'
+# Bytes decoded at a time from a body already in memory
+CHUNK_SIZE = 64 * 1024
+
+class JSONStreamError(ValueError):
+    pass
+
+def iter_chunks(content: bytes, size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    view = memoryview(content)
+    for i in range(0, len(content), size):
+        yield view[i:i + size]
+
+def iter_records(chunks: Iterable[bytes], encoding: str = 'latin1', strict: bool = True) -> Iterator:
+    ''' Elements of the JSON array in chunks, or the value itself if it is not an array
+
+        Needs a single byte encoding, latin1 for RouterOS, so a chunk can be decoded on its own
+    '''
+    raw_decode = json.JSONDecoder(strict=strict).raw_decode
+    chunks = iter(chunks)
+    buf = ''
+    pos = 0
+    eof = False
+
+    def more() -> bool:
+        nonlocal buf, pos, eof
+        for chunk in chunks:
+            if chunk:
+                buf = buf[pos:] + bytes(chunk).decode(encoding)
+                pos = 0
+                return True
+        eof = True
+        return False
+
+    def skip_whitespace() -> bool:
+        # True when a non whitespace character is at pos
+        nonlocal pos
+        while True:
+            end = len(buf)
+            while pos < end and buf[pos] in WHITESPACE:
+                pos += 1
+            if pos < end or not more():
+                return pos < len(buf)
+
+    def delimited(end: int) -> bool:
+        # True when the , or ] after the value at end is buffered
+        while end < len(buf) and buf[end] in WHITESPACE:
+            end += 1
+        return end < len(buf) and buf[end] in ',]'
+
+    if not skip_whitespace():
+        raise JSONStreamError('Empty JSON document')
+
+    if buf[pos] != '[':
+        # A single object, decoded whole
+        while more():
+            pass
+        value, end = raw_decode(buf, pos)
+        if buf[end:].strip(WHITESPACE):
+            raise JSONStreamError(f'Extra data after the JSON value at {end}')
+        yield value
+        return
+
+    pos += 1
+    first = True
+    while True:
+        if not skip_whitespace():
+            raise JSONStreamError('Unterminated JSON array')
+        if buf[pos] == ']':
+            pos += 1
+            break
+        if not first:
+            if buf[pos] != ',':
+                raise JSONStreamError(f'Expecting , delimiter in the JSON array, got {buf[pos]!r}')
+            pos += 1
+            if not skip_whitespace():
+                raise JSONStreamError('Unterminated JSON array')
+        first = False
+
+        while True:
+            try:
+                value, end = raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                # The element continues in the next chunk
+                if not more():
+                    raise
+                continue
+            # A number or literal is whole only once its delimiter has arrived, 1 is also the start of 1.5 or 1e3
+            if isinstance(value, (dict, list, str)) or delimited(end) or eof or not more():
+                break
+        pos = end
+        yield value
+
+    if skip_whitespace():
+        raise JSONStreamError(f'Extra data after the JSON array: {buf[pos:pos + 20]!r}')
@@ -0,0 +1,263 @@
+# coding=utf8
+## Copyright (c) 2020 Arseniy Kuznetsov
+## Copyright (c) 2024 Martti Anttila
+##
+## This program is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License
+## as published by the Free Software Foundation; either version 2
+## of the License, or (at your option) any later version.
+##
+## This program is distributed in the hope that it will be useful,
+## but WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+## GNU General Public License for more details.
+
+''' MAC vendor resolution from a compact OUI prefix index
+
+    Build an index from local OUI files (mac-vendors.txt, IEEE oui.txt or the IEEE MA-L/MA-M/MA-S csv files):
+    python -m utils.mac_vendor build oui.csv mam.csv oui36.csv -o oui.idx
+
+    Look up MAC addresses:
+    python -m utils.mac_vendor lookup [-i oui.idx] 00:1A:2B:3C:4D:5E
+'''
+
+import csv
+import logging
+import mmap
+import struct
+import sys
+
+from argparse import ArgumentParser
+from array import array
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from threading import Lock
+
+from mac_vendor_lookup import BaseMacLookup, MacLookup
+
+# Assignment sizes in bits, longest first: MA-S, MA-M, MA-L
+PREFIX_BITS = (36, 28, 24)
+
+# File layout, little endian:
+#   header: magic, vendor count, vendor blob size, prefix count per PREFIX_BITS entry
+#   vendor offsets (uint32, vendor count + 1), vendor blob (utf-8), padded to 8 bytes
+#   per PREFIX_BITS entry: sorted prefixes (uint64), vendor ids (uint32), padded to 8 bytes
+INDEX_MAGIC = b'MTXOUI1\0'
+INDEX_HEADER = struct.Struct(f'<8sII{len(PREFIX_BITS)}I')
+
+MEMO_SIZE = 65536
+
+class OUIIndex:
+    ''' Sorted prefix tables per assignment size, a lookup is a bisect per table, longest prefix first
+        The tables are arrays when built in memory and views into the file when loaded from an index file
+    '''
+    def __init__(self, tables, offsets, blob, source: str = ''):
+        self.tables: list[tuple[int, 'array | memoryview', 'array | memoryview']] = tables
+        self.offsets = offsets
+        self.blob = blob
+        self.source = source
+        self.vendors: dict[int, str] = {}
+
+    def __len__(self) -> int:
+        return sum(len(prefixes) for _, prefixes, _ in self.tables)
+
+    def lookup(self, mac: str) -> str:
+        ''' Vendor of the MAC address, empty string when the MAC is invalid or not assigned
+        '''
+        digits = mac.replace(':', '').replace('-', '').replace('.', '')
+        if not 6 <= len(digits) <= 12:
+            return ''
+        try:
+            value = int(digits, 16)
+        except ValueError:
+            return ''
+
+        width = len(digits) * 4
+        for bits, prefixes, ids in self.tables:
+            if bits > width:
+                continue
+            prefix = value >> (width - bits)
+            i = bisect_left(prefixes, prefix)
+            if i < len(prefixes) and prefixes[i] == prefix:
+                return self.vendor(ids[i])
+        return ''
+
+    def vendor(self, vendor_id: int) -> str:
+        vendor = self.vendors.get(vendor_id)
+        if vendor is None:
+            vendor = bytes(self.blob[self.offsets[vendor_id]:self.offsets[vendor_id + 1]]).decode('utf-8')
+            self.vendors[vendor_id] = vendor
+        return vendor
+
+    @classmethod
+    def from_assignments(cls, assignments: dict[int, dict[int, str]], source: str = '') -> 'OUIIndex':
+        ''' In memory index from {bits: {prefix: vendor}}
+        '''
+        vendor_ids: dict[str, int] = {}
+        tables = []
+        for bits in PREFIX_BITS:
+            table = assignments.get(bits, {})
+            prefixes = array('Q', sorted(table))
+            ids = array('I', (vendor_ids.setdefault(table[p], len(vendor_ids)) for p in prefixes))
+            tables.append((bits, prefixes, ids))
+
+        encoded = [v.encode('utf-8') for v in vendor_ids]
+        offsets = array('I', [0])
+        for v in encoded:
+            offsets.append(offsets[-1] + len(v))
+        return cls(tables, offsets, b''.join(encoded), source)
+
+    @classmethod
+    def from_files(cls, paths: list[str]) -> 'OUIIndex':
+        assignments: dict[int, dict[int, str]] = {}
+        for path in paths:
+            for bits, prefix, vendor in read_assignments(path):
+                assignments.setdefault(bits, {})[prefix] = vendor
+        return cls.from_assignments(assignments, ', '.join(paths))
+
+    @classmethod
+    def load(cls, path: str) -> 'OUIIndex':
+        ''' Maps an index file built by write, the pages are only read as lookups touch them
+        '''
+        with open(path, 'rb') as f:
+            data = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+        magic, vendor_count, blob_size, *counts = INDEX_HEADER.unpack_from(data)
+        if magic != INDEX_MAGIC:
+            raise ValueError(f'{path} is not an OUI index')
+
+        pos = INDEX_HEADER.size
+        offsets = data[pos:pos + 4 * (vendor_count + 1)].cast('I')
+        pos += 4 * (vendor_count + 1)
+        blob = data[pos:pos + blob_size]
+        pos = align(pos + blob_size)
+
+        tables = []
+        for bits, count in zip(PREFIX_BITS, counts):
+            prefixes = data[pos:pos + 8 * count].cast('Q')
+            pos += 8 * count
+            ids = data[pos:pos + 4 * count].cast('I')
+            pos = align(pos + 4 * count)
+            tables.append((bits, prefixes, ids))
+        return cls(tables, offsets, blob, path)
+
+    def write(self, path: str):
+        with open(path, 'wb') as f:
+            f.write(INDEX_HEADER.pack(INDEX_MAGIC, len(self.offsets) - 1, len(self.blob), *(len(p) for _, p, _ in self.tables)))
+            f.write(bytes(self.offsets))
+            f.write(self.blob)
+            pad(f)
+            for _, prefixes, ids in self.tables:
+                f.write(bytes(prefixes))
+                f.write(bytes(ids))
+                pad(f)
+
+class MacVendorResolver:
+    ''' Memoized MAC vendor lookups
+        The OUI index is loaded on the first lookup: from the index file if one is set,
+        else from the vendor list of mac_vendor_lookup, which is downloaded when missing
+    '''
+    def __init__(self, index_path: str = ''):
+        self.index_path = index_path
+        self.index: OUIIndex | None = None
+        self.lock = Lock()
+        self.lookup = lru_cache(maxsize=MEMO_SIZE)(self._lookup)
+
+    def set_index_path(self, index_path: str):
+        with self.lock:
+            self.index_path = index_path
+            self.index = None
+            self.lookup.cache_clear()
+
+    def _lookup(self, mac: str) -> str:
+        index = self.index if self.index is not None else self._load()
+        return index.lookup(mac)
+
+    def _load(self) -> OUIIndex:
+        with self.lock:
+            if self.index is None:
+                if self.index_path:
+                    self.index = OUIIndex.load(self.index_path)
+                else:
+                    self.index = OUIIndex.from_files([vendor_list_path()])
+                logging.info('Loaded %i OUI prefixes from %s', len(self.index), self.index.source)
+            return self.index
+
+def vendor_list_path() -> str:
+    ''' The vendor list of mac_vendor_lookup, downloaded from IEEE when missing
+    '''
+    path = BaseMacLookup().find_vendors_list()
+    if not path:
+        logging.warning('MAC vendor list not found, downloading it')
+        # MacLookup runs its own asyncio loop, which can not be nested in the running one
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            executor.submit(lambda: MacLookup().update_vendors()).result()
+        path = BaseMacLookup.cache_path
+    return path
+
+def read_assignments(path: str):
+    ''' (bits, prefix, vendor) of the assignments in an OUI file
+        mac-vendors.txt (PREFIX:Vendor), IEEE oui.txt or IEEE csv (Registry,Assignment,Organization Name,...)
+    '''
+    with open(path, encoding='utf-8', errors='replace', newline='') as f:
+        first = f.readline()
+        f.seek(0)
+        if first.startswith('Registry,'):
+            reader = csv.reader(f)
+            next(reader)
+            for row in reader:
+                if len(row) >= 3:
+                    yield from assignment(row[1], row[2])
+        elif '(hex)' in first or 'OUI/' in first or not first.strip():
+            for line in f:
+                if '(base 16)' in line:
+                    prefix, vendor = line.split('(base 16)', 1)
+                    yield from assignment(prefix, vendor)
+        else:
+            for line in f:
+                prefix, _, vendor = line.partition(':')
+                yield from assignment(prefix, vendor)
+
+def assignment(prefix: str, vendor: str):
+    prefix = prefix.strip().replace('-', '').replace(':', '')
+    vendor = vendor.strip()
+    bits = len(prefix) * 4
+    if bits in PREFIX_BITS and vendor:
+        try:
+            yield bits, int(prefix, 16), vendor
+        except ValueError:
+            pass
+
+def align(pos: int) -> int:
+    return (pos + 7) & ~7
+
+def pad(f):
+    f.write(b'\0' * (align(f.tell()) - f.tell()))
+
+# Process wide resolver, used by get_mac_vendor
+mac_vendors = MacVendorResolver()
+
+def main():
+    parser = ArgumentParser(description=__doc__)
+    commands = parser.add_subparsers(dest='command', required=True)
+    build = commands.add_parser('build', help='build an OUI index from local OUI files')
+    build.add_argument('files', nargs='+', help='mac-vendors.txt, IEEE oui.txt or IEEE csv files, later files win')
+    build.add_argument('-o', '--output', required=True, help='index file to write')
+    lookup = commands.add_parser('lookup', help='look up MAC addresses')
+    lookup.add_argument('-i', '--index', default='', help='index file, default is the mac_vendor_lookup vendor list')
+    lookup.add_argument('macs', nargs='+')
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        index = OUIIndex.from_files(args.files)
+        index.write(args.output)
+        counts = ', '.join(f'{len(p)} /{bits}' for bits, p, _ in index.tables)
+        print(f'{args.output}: {counts} prefixes, {len(index.offsets) - 1} vendors')
+    else:
+        resolver = MacVendorResolver(args.index)
+        for mac in args.macs:
+            print(f'{mac} {resolver.lookup(mac)}')
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,163 @@
+# coding=utf8
+## Copyright (c) 2020 Arseniy Kuznetsov
+## Copyright (c) 2024 Martti Anttila
+##
+## This program is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License
+## as published by the Free Software Foundation; either version 2
+## of the License, or (at your option) any later version.
+##
+## This program is distributed in the hope that it will be useful,
+## but WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+## GNU General Public License for more details.
+
+''' Parsers for RouterOS values: durations, rates, timestamps and versions
+
+    RouterOS returns a small set of recurring strings (30s, 1d2h, 100Mbps), the parsers are memoized
+'''
+
+import re
+
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Callable, Iterable, TypeVar
+
+T = TypeVar('T')
+
+# Distinct values kept per parser
+PARSE_CACHE_SIZE = 8192
+
+ROS_VERSION_RGX = re.compile(r'(.+)\s[\[|\(]?([a-z]+)?[\]|\)]?')
+
+DURATION_RGX = re.compile(r'((?P<weeks>\d+)w)?'
+                          r'((?P<days>\d+)d)?'
+                          r'((?P<hours>\d+)h)?'
+                          r'((?P<minutes>\d+)m(?![a-z]))?' # Should not match with ms
+                          r'((?P<seconds>\d+)s)?'
+                          r'((?P<milliseconds>\d+)ms)?'
+                          r'((?P<microseconds>\d+)us)?')
+
+RATES_RGX = re.compile(r'(\d*(?:\.\d*)?)([GgMmKk]?)bps')
+SI_TABLE = {
+    'G': 9,
+    'g': 9,
+    'M': 6,
+    'm': 6,
+    'K': 3,
+    'k': 3,
+    '': -1,
+}
+
+# Duration units in DURATION_RGX order: (unit, microseconds)
+DURATION_UNITS = (('w', 604800_000000), ('d', 86400_000000), ('h', 3600_000000), ('m', 60_000000), ('s', 1_000000), ('ms', 1000), ('us', 1))
+UNIT_INDEX = {unit: i for i, (unit, _) in enumerate(DURATION_UNITS)}
+DIGITS = frozenset('0123456789')
+LOWERCASE = frozenset('abcdefghijklmnopqrstuvwxyz')
+# Largest duration timedelta accepts, longer ones go to the regex parser to fail the same way
+MAX_DURATION_US = (timedelta.max.days + 1) * 86400_000000
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_ros_version(ver: str) -> tuple[str, str]:
+    """Parse the version returned from the /system/resource command.
+    Returns a tuple: (<version>, <channel>).
+
+    >>> parse_ros_version('1.2.3 (stable)')
+    1.2.3, stable
+    """
+    version, channel = ROS_VERSION_RGX.findall(ver)[0]
+
+    return version, channel
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_timedelta(time: str) -> float | None:
+    if not time:
+        return None
+
+    if type(time) is str and time.isascii():
+        seconds = scan_duration(time)
+        if seconds is not None:
+            return seconds
+    return match_duration(time)
+
+def scan_duration(time: str) -> float | None:
+    ''' Hand written DURATION_RGX: <digits><unit> tokens with units in w, d, h, m, s, ms, us order
+        Stops at the first token that does not follow, same as the regex match does
+    '''
+    total = 0
+    last = -1
+    pos = 0
+    end = len(time)
+    while pos < end:
+        start = pos
+        while pos < end and time[pos] in DIGITS:
+            pos += 1
+        if pos == start or pos == end:
+            break
+
+        unit = time[pos]
+        following = time[pos + 1] if pos + 1 < end else ''
+        if unit == 'm' or unit == 'u':
+            if following == 's':
+                unit += 's'
+            elif unit == 'u' or following in LOWERCASE:
+                break
+        idx = UNIT_INDEX.get(unit, -1)
+        if idx <= last:
+            break
+
+        total += int(time[start:pos]) * DURATION_UNITS[idx][1]
+        last = idx
+        pos += len(unit)
+
+    if total >= MAX_DURATION_US:
+        return None
+    # Same arithmetic as timedelta.total_seconds
+    return total / 10**6
+
+def match_duration(time: str) -> float:
+    time_dict: dict[str, str] = {}
+    try:
+        match_res = DURATION_RGX.match(time)
+        if match_res:
+            time_dict = match_res.groupdict()
+    except Exception as e:
+        print(f'Cannot parse {time}, {e}')
+        return -1
+
+    return timedelta(**{key: int(value) for key, value in time_dict.items() if value}).total_seconds()
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_datetime(dt: str) -> float | None:
+    if not dt:
+        return None
+
+    try:
+        dtime = datetime.fromisoformat(dt)
+        if not dtime.tzinfo:
+            dtime = dtime.replace(tzinfo=timezone.utc)
+
+        return dtime.timestamp()
+    except Exception as e:
+        print(f'Cannot parse datetime {dt}, {e}')
+        return -1
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_rates(rate: str | None) -> float:
+    if rate is None:
+        return 0
+
+    rc = RATES_RGX.search(rate)
+    return float(rc[1]) * 10 ** SI_TABLE.get(rc[2], -1) if rc else -1
+
+def parse_column(values: Iterable[str], parser: Callable[[str], T]) -> list[T]:
+    ''' Parses a column of values, each distinct value once
+    '''
+    parsed: dict[str, T] = {}
+    result = []
+    for value in values:
+        v = parsed.get(value, parsed)
+        if v is parsed:
+            v = parsed[value] = parser(value)
+        result.append(v)
+    return result
@@ -0,0 +1,101 @@
+# coding=utf8
+## Copyright (c) 2020 Arseniy Kuznetsov
+## Copyright (c) 2024 Martti Anttila
+##
+## This program is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License
+## as published by the Free Software Foundation; either version 2
+## of the License, or (at your option) any later version.
+##
+## This program is distributed in the hope that it will be useful,
+## but WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+## GNU General Public License for more details.
+
+''' Protobuf wire format of the Prometheus remote write 1.0 WriteRequest
+
+    message WriteRequest { repeated TimeSeries timeseries = 1; }
+    message TimeSeries { repeated Label labels = 1; repeated Sample samples = 2; }
+    message Label { string name = 1; string value = 2; }
+    message Sample { double value = 1; int64 timestamp = 2; }
+
+    A WriteRequest is its timeseries fields one after the other, so the encoded
+    timeseries of several loads are joined into a request without decoding them
+'''
+
+import struct
+
+from utils.snappy import varint
+
+# Field tags: field number << 3 | wire type (0 varint, 1 64-bit, 2 length delimited)
+TIMESERIES_TAG = b'\x0a'
+LABEL_TAG = b'\x0a'
+SAMPLE_TAG = b'\x12'
+NAME_TAG = b'\x0a'
+VALUE_TAG = b'\x12'
+SAMPLE_VALUE_TAG = b'\x09'
+SAMPLE_TIMESTAMP_TAG = b'\x10'
+
+def _field(tag: bytes, payload: bytes) -> bytes:
+    return tag + varint(len(payload)) + payload
+
+def encode_label(name: str, value: str) -> bytes:
+    return _field(LABEL_TAG, _field(NAME_TAG, name.encode('utf-8')) + _field(VALUE_TAG, value.encode('utf-8')))
+
+def encode_timeseries(labels: bytes, value: float, timestamp_ms: int) -> bytes:
+    ''' A WriteRequest timeseries field of one sample, labels are the encoded labels sorted by name
+    '''
+    sample = SAMPLE_VALUE_TAG + struct.pack('<d', value) + SAMPLE_TIMESTAMP_TAG + varint(timestamp_ms)
+    return _field(TIMESERIES_TAG, labels + _field(SAMPLE_TAG, sample))
+
+def _read_varint(data: bytes, pos: int) -> tuple[int, int]:
+    result = 0
+    shift = 0
+    while True:
+        b = data[pos]
+        pos += 1
+        result |= (b & 0x7f) << shift
+        shift += 7
+        if b < 0x80:
+            return result, pos
+
+def _fields(data: bytes):
+    pos = 0
+    end = len(data)
+    while pos < end:
+        key, pos = _read_varint(data, pos)
+        number, wire_type = key >> 3, key & 0x07
+        if wire_type == 0:
+            value, pos = _read_varint(data, pos)
+        elif wire_type == 1:
+            value = data[pos:pos + 8]
+            pos += 8
+        elif wire_type == 2:
+            size, pos = _read_varint(data, pos)
+            value = data[pos:pos + size]
+            pos += size
+        elif wire_type == 5:
+            value = data[pos:pos + 4]
+            pos += 4
+        else:
+            raise ValueError(f'Unsupported protobuf wire type {wire_type}')
+        yield number, value
+
+def decode_write_request(data: bytes) -> list[tuple[dict[str, str], list[tuple[float, int]]]]:
+    ''' Labels and (value, timestamp) samples of the timeseries of a WriteRequest
+    '''
+    timeseries = []
+    for number, series in _fields(data):
+        if number != 1:
+            continue
+        labels = {}
+        samples = []
+        for field, value in _fields(series):
+            if field == 1:
+                label = dict(_fields(value))
+                labels[label.get(1, b'').decode('utf-8')] = label.get(2, b'').decode('utf-8')
+            elif field == 2:
+                sample = dict(_fields(value))
+                samples.append((struct.unpack('<d', sample.get(1, bytes(8)))[0], sample.get(2, 0)))
+        timeseries.append((labels, samples))
+    return timeseries
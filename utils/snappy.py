@@ -0,0 +1,149 @@
+# coding=utf8
+## Copyright (c) 2020 Arseniy Kuznetsov
+## Copyright (c) 2024 Martti Anttila
+##
+## This program is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License
+## as published by the Free Software Foundation; either version 2
+## of the License, or (at your option) any later version.
+##
+## This program is distributed in the hope that it will be useful,
+## but WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+## GNU General Public License for more details.
+
+''' Snappy block format, as used by the Prometheus remote write protocol
+
+    Greedy matching of 4 byte sequences, skipping ahead faster through data that does not match.
+    Exposition payloads repeat their label names and values, so most of the input is copied
+'''
+
+# Longest copy element, and the farthest offset of a 2 byte offset copy
+MAX_COPY = 64
+MAX_OFFSET = 65535
+# Matches are extended this many bytes at a time before comparing single bytes
+CHUNK = 32
+
+def varint(n: int) -> bytes:
+    out = bytearray()
+    while n >= 0x80:
+        out.append((n & 0x7f) | 0x80)
+        n >>= 7
+    out.append(n)
+    return bytes(out)
+
+def _literal(out: bytearray, data: bytes, start: int, end: int):
+    while start < end:
+        n = min(end - start, 65536)
+        if n <= 60:
+            out.append((n - 1) << 2)
+        elif n <= 0x100:
+            out.append(60 << 2)
+            out.append(n - 1)
+        else:
+            out.append(61 << 2)
+            out += (n - 1).to_bytes(2, 'little')
+        out += data[start:start + n]
+        start += n
+
+def _copy(out: bytearray, offset: int, length: int):
+    while length > 0:
+        # A copy of 64 bytes would leave less than 4 for the next element
+        n = min(length, MAX_COPY if length - MAX_COPY >= 4 or length <= MAX_COPY else 60)
+        if 4 <= n <= 11 and offset < 2048:
+            out.append(0x01 | ((n - 4) << 2) | ((offset >> 8) << 5))
+            out.append(offset & 0xff)
+        else:
+            out.append(0x02 | ((n - 1) << 2))
+            out += offset.to_bytes(2, 'little')
+        length -= n
+
+def compress(data: bytes) -> bytes:
+    n = len(data)
+    out = bytearray(varint(n))
+    table: dict[bytes, int] = {}
+    literal_start = 0
+    i = 0
+    misses = 0
+    limit = n - 4
+    while i <= limit:
+        key = data[i:i + 4]
+        candidate = table.get(key)
+        table[key] = i
+        if candidate is None or i - candidate > MAX_OFFSET:
+            misses += 1
+            i += 1 + (misses >> 5)
+            continue
+
+        misses = 0
+        length = 4
+        remaining = n - i
+        while length + CHUNK <= remaining and data[candidate + length:candidate + length + CHUNK] == data[i + length:i + length + CHUNK]:
+            length += CHUNK
+        while length < remaining and data[candidate + length] == data[i + length]:
+            length += 1
+
+        _literal(out, data, literal_start, i)
+        _copy(out, i - candidate, length)
+        i += length
+        literal_start = i
+
+    _literal(out, data, literal_start, n)
+    return bytes(out)
+
+def decompress(data: bytes) -> bytes:
+    # Uncompressed length
+    length = 0
+    shift = 0
+    pos = 0
+    while True:
+        b = data[pos]
+        pos += 1
+        length |= (b & 0x7f) << shift
+        shift += 7
+        if b < 0x80:
+            break
+
+    out = bytearray()
+    end = len(data)
+    while pos < end:
+        tag = data[pos]
+        pos += 1
+        kind = tag & 0x03
+        if kind == 0:
+            n = tag >> 2
+            if n >= 60:
+                size = n - 59
+                n = int.from_bytes(data[pos:pos + size], 'little')
+                pos += size
+            n += 1
+            out += data[pos:pos + n]
+            pos += n
+            continue
+
+        if kind == 1:
+            n = ((tag >> 2) & 0x07) + 4
+            offset = ((tag >> 5) << 8) | data[pos]
+            pos += 1
+        elif kind == 2:
+            n = (tag >> 2) + 1
+            offset = int.from_bytes(data[pos:pos + 2], 'little')
+            pos += 2
+        else:
+            n = (tag >> 2) + 1
+            offset = int.from_bytes(data[pos:pos + 4], 'little')
+            pos += 4
+
+        if offset <= 0 or offset > len(out):
+            raise ValueError('Invalid snappy copy offset')
+        start = len(out) - offset
+        if offset >= n:
+            out += out[start:start + n]
+        else:
+            # Overlapping copy, repeats the last offset bytes
+            for k in range(n):
+                out.append(out[start + k])
+
+    if len(out) != length:
+        raise ValueError(f'Snappy length mismatch: {len(out)} != {length}')
+    return bytes(out)